@@ -0,0 +1,54 @@
+"""
+Account helpers shared by the login, landing and main app pages.
+
+Usernames are resolved through the record store's username index, so
+login and signup cost stays flat as the number of users grows. New user ids
+come from the store's persistent id sequence, so concurrent signups from
+any page never share an id and ids of removed users are never reused. The
+record store (records.py) only uses the standard library, so the login
+page never has to import pandas.
+"""
+
+import hashlib
+
+from records import get_records
+
+def hash_password(password):
+    """Hash password using SHA-256"""
+    return hashlib.sha256(password.encode('utf-8')).hexdigest()
+
+def verify_password(password, hashed):
+    """Verify password against hash"""
+    return hash_password(password) == hashed
+
+def authenticate_user(username, password):
+    """
+    Authenticate user credentials.
+
+    Args:
+        username (str): The username entered on the login form
+        password (str): The plain-text password
+
+    Returns:
+        tuple: (success, user_id), with user_id None on failure
+    """
+    user = get_records().find_user(username)
+    if user is None or not verify_password(password, user['password_hash']):
+        return False, None
+    return True, user['user_id']
+
+def create_user(username, password):
+    """
+    Create a new user account.
+
+    Args:
+        username (str): The requested username
+        password (str): The plain-text password
+
+    Returns:
+        tuple: (success, new user_id or error message)
+    """
+    user_id = get_records().add_user(username, hash_password(password))
+    if user_id is None:
+        return False, "Username already exists"
+    return True, user_id
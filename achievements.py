@@ -1,140 +1,18 @@
 import streamlit as st
-import pandas as pd
-import os
-from datetime import datetime, timedelta
+
+from badges import ACHIEVEMENTS, ALL_EVENTS, UserFacts, evaluate, progress
+from storage import begin_rerun, get_user_achievements, prefetch_user_data
+from timing import PageTimer, show_timings
 
 # --- Badge System Functions ---
 
 def get_achievements():
     """Define all available achievements and their requirements"""
-    return {
-        "first_day": {
-            "name": "🌱 Digital Seedling",
-            "description": "Complete your first day of tracking",
-            "requirement": 1,
-            "type": "days_logged"
-        },
-        "week_warrior": {
-            "name": "🗓️ Week Warrior", 
-            "description": "Track for 7 consecutive days",
-            "requirement": 7,
-            "type": "days_logged"
-        },
-        "mindful_month": {
-            "name": "🌙 Mindful Month",
-            "description": "Track for 30 days",
-            "requirement": 30,
-            "type": "days_logged"
-        },
-        "screen_reducer": {
-            "name": "📉 Screen Reducer",
-            "description": "Reduce daily screen time by 2+ hours",
-            "requirement": 2.0,
-            "type": "screen_reduction"
-        },
-        "balance_master": {
-            "name": "⚖️ Balance Master",
-            "description": "Maintain under 4 hours daily for a week",
-            "requirement": 4.0,
-            "type": "weekly_average"
-        },
-        "mood_stabilizer": {
-            "name": "😌 Mood Stabilizer",
-            "description": "Log 'Peaceful' or 'Focused' mood 5 times",
-            "requirement": 5,
-            "type": "positive_moods"
-        },
-        "early_bird": {
-            "name": "🌅 Early Bird",
-            "description": "Log data before 9 AM three times",
-            "requirement": 3,
-            "type": "early_logging"
-        },
-        "consistent_tracker": {
-            "name": "🎯 Consistent Tracker",
-            "description": "No missed days in 2 weeks",
-            "requirement": 14,
-            "type": "consecutive_days"
-        }
-    }
+    return ACHIEVEMENTS
 
-def init_achievements_file():
-    """Initialize achievements CSV file if it doesn't exist"""
-    file_path = "user_achievements.csv"
-    if not os.path.exists(file_path):
-        df = pd.DataFrame(columns=['user_id', 'achievement_id', 'earned_date', 'achievement_name'])
-        df.to_csv(file_path, index=False)
-
-def check_achievements(user_id, user_data, profile):
-    """Check which achievements user has earned"""
-    init_achievements_file()
-    achievements = get_achievements()
-    earned_achievements = get_user_achievements(user_id)
-    earned_ids = set(earned_achievements['achievement_id'].tolist())
-    
-    new_achievements = []
-    
-    for achievement_id, achievement in achievements.items():
-        if achievement_id in earned_ids:
-            continue  # Already earned
-            
-        earned = False
-        
-        if achievement['type'] == 'days_logged':
-            earned = len(user_data) >= achievement['requirement']
-            
-        elif achievement['type'] == 'screen_reduction':
-            if len(user_data) >= 2:
-                first_day = user_data.iloc[0]['total_screen']
-                recent_avg = user_data.tail(3)['total_screen'].mean()
-                reduction = first_day - recent_avg
-                earned = reduction >= achievement['requirement']
-                
-        elif achievement['type'] == 'weekly_average':
-            if len(user_data) >= 7:
-                week_avg = user_data.tail(7)['total_screen'].mean()
-                earned = week_avg <= achievement['requirement']
-                
-        elif achievement['type'] == 'positive_moods':
-            positive_moods = user_data[user_data['mood'].str.contains('Peaceful|Focused', na=False)]
-            earned = len(positive_moods) >= achievement['requirement']
-            
-        elif achievement['type'] == 'early_logging':
-            # This would need timestamp data - simplified for now
-            earned = len(user_data) >= achievement['requirement']
-            
-        elif achievement['type'] == 'consecutive_days':
-            if len(user_data) >= achievement['requirement']:
-                # Check if dates are consecutive
-                dates = pd.to_datetime(user_data['date']).sort_values()
-                consecutive = all((dates.iloc[i] - dates.iloc[i-1]).days == 1 
-                                for i in range(1, len(dates)))
-                earned = consecutive
-        
-        if earned:
-            award_achievement(user_id, achievement_id, achievement['name'])
-            new_achievements.append(achievement)
-    
-    return new_achievements
-
-def award_achievement(user_id, achievement_id, achievement_name):
-    """Award an achievement to a user"""
-    achievements_df = pd.read_csv("user_achievements.csv")
-    new_achievement = pd.DataFrame([{
-        'user_id': user_id,
-        'achievement_id': achievement_id,
-        'earned_date': datetime.now().strftime("%Y-%m-%d"),
-        'achievement_name': achievement_name
-    }])
-    achievements_df = pd.concat([achievements_df, new_achievement], ignore_index=True)
-    achievements_df.to_csv("user_achievements.csv", index=False)
-
-def get_user_achievements(user_id):
-    """Get all achievements for a specific user"""
-    if not os.path.exists("user_achievements.csv"):
-        return pd.DataFrame()
-    achievements_df = pd.read_csv("user_achievements.csv")
-    return achievements_df[achievements_df['user_id'] == user_id]
+def check_achievements(user_id, history=None, profile=None):
+    """Check every achievement after a change of unknown kind; pages that know the event call badges.evaluate()"""
+    return evaluate(user_id, *ALL_EVENTS)
 
 def display_achievements_page():
     """Display the achievements page"""
@@ -184,12 +62,8 @@ def display_achievements_page():
     user_achievements = get_user_achievements(user_id)
     all_achievements = get_achievements()
     
-    # Load user data for progress calculation
-    if os.path.exists("daily_screen_time.csv"):
-        screen_data = pd.read_csv("daily_screen_time.csv")
-        user_data = screen_data[screen_data['user_id'] == user_id]
-    else:
-        user_data = pd.DataFrame()
+    # Facts for progress calculation, read only as far as the locked badges need
+    facts = UserFacts(user_id)
     
     st.markdown("### 🌟 Earned Badges")
     
@@ -213,19 +87,9 @@ def display_achievements_page():
         
         if not is_earned:
             # Calculate progress
-            progress = 0
-            if achievement['type'] == 'days_logged':
-                progress = min(len(user_data) / achievement['requirement'], 1.0)
-            elif achievement['type'] == 'screen_reduction' and len(user_data) >= 2:
-                first_day = float(user_data.iloc[0]['total_screen'])
-                recent_avg = float(user_data.tail(3)['total_screen'].mean())
-                reduction = max(0, first_day - recent_avg)
-                progress = min(reduction / achievement['requirement'], 1.0)
-            elif achievement['type'] == 'positive_moods':
-                positive_count = len(user_data[user_data['mood'].str.contains('Peaceful|Focused', na=False)])
-                progress = min(positive_count / achievement['requirement'], 1.0)
+            achievement_progress = progress(facts, achievement)
             
-            progress_percent = int(progress * 100)
+            progress_percent = int(achievement_progress * 100)
             
             st.markdown(f"""
             <div class="achievement-locked">
@@ -240,4 +104,10 @@ def display_achievements_page():
 
 # --- Main App Logic ---
 if __name__ == "__main__":
+    timer = PageTimer("achievements")
+    begin_rerun()
+    prefetch_user_data(st.session_state.get('user_id'), ('achievements', 'aggregates'))
     display_achievements_page()
+    timer.mark("rendered")
+    if show_timings():
+        st.caption(timer.summary())
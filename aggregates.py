@@ -0,0 +1,403 @@
+"""
+Per-user running aggregates of the screen time table.
+
+All-time totals (days tracked, usage per device, mood frequencies) and the
+calendar of logged days (a daybits.DayBitmap, for streaks) only need
+counts, sums and one bit per day, so the storage backends keep those per
+user and update them whenever a check-in is saved instead of recomputing
+them from the whole history on every rerun:
+- CSVBackend keeps an AggregateFile next to each screen time table (or
+  partition): a JSON snapshot ("<table>.agg.json") plus an append-only
+  journal of the check-ins applied since ("<table>.agg.json.journal"),
+  which is appended to under the sidecar's lock together with the rows
+- SQLiteBackend keeps a user_aggregates table and updates it in the same
+  transaction as the upsert
+
+Saving a day that was already logged replaces that day's contribution, so
+overwrites never count a day twice. Check-ins are only ever added or
+replaced, never removed, so the first and last dates only move outward.
+
+Like records.py, this module only uses the standard library.
+"""
+
+import json
+import os
+import threading
+
+from cache import file_stamp
+from daybits import DayBitmap
+from locks import atomic_write, file_lock
+
+AGGREGATE_SUFFIX = ".agg.json"
+AGGREGATE_JOURNAL_SUFFIX = AGGREGATE_SUFFIX + ".journal"
+AGGREGATE_COMPACT_THRESHOLD = 1000
+DEVICE_FIELDS = ('phone_min', 'laptop_min', 'tablet_min')
+
+
+def aggregate_row(entry):
+    """The fields of a check-in the aggregates count, as plain JSON values (mood None when missing)."""
+    row = {'date': str(entry['date'])[:10]}
+    for field in DEVICE_FIELDS:
+        row[field] = int(entry[field])
+    mood = entry.get('mood')
+    row['mood'] = mood if isinstance(mood, str) and mood else None
+    return row
+
+
+class UserAggregates:
+    """
+    Counts and sums over one user's check-ins, one row per day.
+
+    Rows are dicts with date ("YYYY-MM-DD"), phone_min, laptop_min,
+    tablet_min and mood, like the entries save_daily_entry() writes.
+    """
+
+    __slots__ = ('user_id', 'days', 'phone_min', 'laptop_min', 'tablet_min', 'moods', 'first_date', 'last_date',
+                 'calendar')
+
+    def __init__(self, user_id, days=0, phone_min=0, laptop_min=0, tablet_min=0, moods=None,
+                 first_date=None, last_date=None, calendar=None):
+        self.user_id = int(user_id)
+        self.days = days
+        self.phone_min = phone_min
+        self.laptop_min = laptop_min
+        self.tablet_min = tablet_min
+        self.moods = dict(moods or {})
+        self.first_date = first_date
+        self.last_date = last_date
+        self.calendar = calendar if calendar is not None else DayBitmap()
+
+    @classmethod
+    def from_rows(cls, user_id, rows):
+        """Aggregate a user's rows from scratch (one row per date)."""
+        totals = cls(user_id)
+        for row in rows:
+            totals.add(row)
+        return totals
+
+    def add(self, row):
+        """Count a newly logged day."""
+        self.days += 1
+        for field in DEVICE_FIELDS:
+            setattr(self, field, getattr(self, field) + int(row[field]))
+        if row.get('mood'):
+            self.moods[row['mood']] = self.moods.get(row['mood'], 0) + 1
+        day = row['date']
+        if self.first_date is None or day < self.first_date:
+            self.first_date = day
+        if self.last_date is None or day > self.last_date:
+            self.last_date = day
+        self.calendar.add(day)
+
+    def replace(self, old, new):
+        """
+        Apply a check-in, taking back the earlier check-in for that day if any.
+
+        Args:
+            old (dict): The row previously stored for the day, or None
+            new (dict): The row being saved
+        """
+        if old is not None:
+            self.days -= 1
+            for field in DEVICE_FIELDS:
+                setattr(self, field, getattr(self, field) - int(old[field]))
+            if old.get('mood'):
+                # The old mood can be missing from counts rebuilt without its row; never go below zero
+                count = self.moods.get(old['mood'], 0) - 1
+                if count > 0:
+                    self.moods[old['mood']] = count
+                else:
+                    self.moods.pop(old['mood'], None)
+        self.add(new)
+
+    def copy(self):
+        return UserAggregates(self.user_id, self.days, self.phone_min, self.laptop_min, self.tablet_min, self.moods,
+                              self.first_date, self.last_date, DayBitmap(self.calendar.origin, self.calendar.bits))
+
+    @property
+    def empty(self):
+        return self.days == 0
+
+    def total_hours(self, device):
+        """
+        Total hours logged for a device.
+
+        Args:
+            device (str): phone, laptop, tablet or total_screen
+
+        Returns:
+            float: Hours summed over every logged day
+        """
+        if device == 'total_screen':
+            minutes = self.phone_min + self.laptop_min + self.tablet_min
+        else:
+            minutes = getattr(self, device + '_min')
+        return minutes / 60
+
+    def mean_hours(self, device):
+        """Average hours per logged day for a device, or NaN before the first check-in."""
+        return self.total_hours(device) / self.days if self.days else float('nan')
+
+    def dominant_mood(self, default=None):
+        """Most frequent mood; ties go to the alphabetically first, as with Series.mode()."""
+        if not self.moods:
+            return default
+        return min(self.moods, key=lambda mood: (-self.moods[mood], mood))
+
+    def to_record(self):
+        return {
+            'days': self.days,
+            'phone_min': self.phone_min,
+            'laptop_min': self.laptop_min,
+            'tablet_min': self.tablet_min,
+            'moods': self.moods,
+            'first_date': self.first_date,
+            'last_date': self.last_date,
+            'calendar': self.calendar.to_hex(),
+        }
+
+    @classmethod
+    def from_record(cls, user_id, record):
+        record = dict(record)
+        calendar = DayBitmap.from_hex(record['first_date'], record.pop('calendar', None))
+        return cls(user_id, calendar=calendar, **record)
+
+    @property
+    def complete(self):
+        """False for aggregates stored before the calendar was kept; those are rebuilt from the rows."""
+        return self.days == len(self.calendar)
+
+    def __eq__(self, other):
+        return (isinstance(other, UserAggregates) and self.user_id == other.user_id
+                and self.to_record() == other.to_record())
+
+    def __repr__(self):
+        return f"UserAggregates(user_id={self.user_id}, {self.to_record()})"
+
+
+class AggregateFile:
+    """
+    Aggregates of every user in one screen time table, kept as a JSON
+    snapshot plus an append-only journal of the check-ins applied since.
+
+    A write appends one line per check-in (the user, the row it replaces
+    and the new row) to the journal, so its cost does not depend on how
+    many users the table holds. Each process keeps the parsed snapshot in
+    memory and only replays the journal lines added since it last looked.
+    Once the journal passes AGGREGATE_COMPACT_THRESHOLD lines a background
+    thread folds it into a new snapshot.
+
+    The snapshot carries a generation number and each journal starts with
+    the generation of the snapshot it will be folded into, so a journal
+    the snapshot already includes (e.g. when a process stopped between
+    the two steps of a fold) is never applied twice.
+
+    Readers share the sidecar's lock; writers hold it exclusively around
+    the table write, so rows and aggregates always change together. Only
+    one instance per table should be used in a process (CSVBackend keeps
+    one per table).
+    """
+
+    def __init__(self, table_path):
+        self.path = table_path + AGGREGATE_SUFFIX
+        self.journal_path = table_path + AGGREGATE_JOURNAL_SUFFIX
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._compacting = False
+        self._stamp = None
+        self._totals = {}
+        self._generation = 0
+        self._complete = False
+        self._offset = 0
+        self._journal_live = None
+        self._deltas = 0
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    # --- In-Memory State (callers hold the sidecar lock and self._lock) ---
+
+    def _load_snapshot(self, stamp):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            snapshot = None
+        if snapshot is not None and 'generation' not in snapshot:
+            # A sidecar from before the journal: readable, but rebuilt on the next write
+            snapshot = {'generation': 0, 'users': snapshot, 'outdated': True}
+        users = snapshot['users'] if snapshot else {}
+        self._totals = {int(user_id): UserAggregates.from_record(user_id, record) for user_id, record in users.items()}
+        self._generation = snapshot['generation'] if snapshot else 0
+        self._complete = (snapshot is not None and not snapshot.get('outdated')
+                          and all(totals.complete for totals in self._totals.values()))
+        self._stamp = stamp
+        self._offset = 0
+        self._journal_live = None
+        self._deltas = 0
+
+    def _apply(self, user_id, old, new):
+        # Copy on write: readers keep the object they were handed
+        totals = (self._totals.get(user_id) or UserAggregates(user_id)).copy()
+        totals.replace(old, new)
+        self._totals[user_id] = totals
+        self._deltas += 1
+
+    def _replay(self, size):
+        """Apply the whole journal lines written after the ones already applied."""
+        with open(self.journal_path, 'rb') as f:
+            f.seek(self._offset)
+            data = f.read(size - self._offset)
+        # A line torn by a crash mid-write is never applied
+        data = data[:data.rfind(b"\n") + 1]
+        lines = data.splitlines()
+        if self._offset == 0 and lines:
+            self._journal_live = json.loads(lines.pop(0))['generation'] > self._generation
+        if self._journal_live:
+            for line in lines:
+                self._apply(*json.loads(line))
+        self._offset += len(data)
+
+    def _refresh(self):
+        """Bring the in-memory state up to date with the snapshot and journal on disk."""
+        stamp = file_stamp(self.path)
+        try:
+            size = os.path.getsize(self.journal_path)
+        except FileNotFoundError:
+            size = 0
+        if stamp != self._stamp or size < self._offset:
+            self._load_snapshot(stamp)
+        if size > self._offset:
+            self._replay(size)
+        return self._totals
+
+    def _write_snapshot(self, totals, complete=True):
+        """Replace the snapshot with some totals and drop the journal they include."""
+        generation = self._generation + 1
+        snapshot = {'generation': generation,
+                    'users': {str(user_id): agg.to_record() for user_id, agg in sorted(totals.items())}}
+        atomic_write(self.path, lambda f: json.dump(snapshot, f, ensure_ascii=False))
+        # The new generation already disowns the journal, so a crash before this removal is harmless
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self._totals = dict(totals)
+        self._generation = generation
+        self._complete = complete
+        self._stamp = file_stamp(self.path)
+        self._offset = 0
+        self._journal_live = None
+        self._deltas = 0
+
+    def _append(self, changes):
+        """Journal some (user_id, old_row, new_row) check-ins with one write and apply them."""
+        lines = [(user_id, aggregate_row(old) if old is not None else None, aggregate_row(new))
+                 for user_id, old, new in changes]
+        data = b"".join(json.dumps(line, ensure_ascii=False).encode('utf-8') + b"\n" for line in lines)
+        if not self._journal_live:
+            # No journal yet, or one the snapshot already includes
+            self._offset = 0
+            data = json.dumps({'generation': self._generation + 1}).encode('utf-8') + b"\n" + data
+        fd = os.open(self.journal_path, os.O_RDWR | os.O_CREAT, 0o644)
+        with os.fdopen(fd, 'r+b') as f:
+            # Cut off anything past the applied lines: a torn line, or a disowned journal
+            f.truncate(self._offset)
+            f.seek(self._offset)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal_live = True
+        self._offset += len(data)
+        for line in lines:
+            self._apply(*line)
+
+    # --- Public Interface ---
+
+    def read(self):
+        """
+        Read every user's aggregates.
+
+        Returns:
+            dict: user_id -> UserAggregates (a copy of the mapping; don't change the values)
+        """
+        with file_lock(self.path, shared=True), self._lock:
+            return dict(self._refresh())
+
+    def current(self):
+        """True if the snapshot exists and holds every field; older sidecars are rebuilt from the rows."""
+        with file_lock(self.path, shared=True), self._lock:
+            self._refresh()
+            return self._complete
+
+    def get(self, user_id):
+        """One user's aggregates; empty ones for a user with no check-ins."""
+        with file_lock(self.path, shared=True), self._lock:
+            return self._refresh().get(int(user_id)) or UserAggregates(user_id)
+
+    def build(self, rebuild):
+        """
+        Write a snapshot from the rows if the sidecar is missing or outdated.
+
+        Args:
+            rebuild (callable): Returns every user's aggregates rebuilt from the
+                table's rows; runs under the exclusive lock
+        """
+        with file_lock(self.path), self._lock:
+            self._refresh()
+            if not self._complete:
+                self._write_snapshot(rebuild())
+
+    def update(self, change, rebuild):
+        """
+        Make a table write under the sidecar's exclusive lock and journal what it changes.
+
+        Args:
+            change (callable): Takes the user_id -> UserAggregates dict (don't
+                change it), writes the rows and returns the (user_id, old_row,
+                new_row) check-ins it stored, old_row None for a new day
+            rebuild (callable): As for build(), used first if the sidecar is
+                missing or outdated
+        """
+        with file_lock(self.path), self._lock:
+            self._refresh()
+            if not self._complete:
+                self._write_snapshot(rebuild())
+            changes = change(self._totals)
+            if changes:
+                self._append(changes)
+            should_compact = self._deltas >= AGGREGATE_COMPACT_THRESHOLD and not self._compacting
+            if should_compact:
+                self._compacting = True
+        if should_compact:
+            threading.Thread(target=self._compact_in_background, daemon=True).start()
+
+    def check(self, rebuild, repair=False):
+        """
+        Compare the stored aggregates with ones rebuilt from the rows.
+
+        Args:
+            rebuild (callable): As for build()
+            repair (bool): Replace the stored aggregates if they differ
+
+        Returns:
+            tuple: (stored, rebuilt), both user_id -> UserAggregates
+        """
+        with file_lock(self.path), self._lock:
+            stored = dict(self._refresh())
+            rebuilt = rebuild()
+            if repair and (stored != rebuilt or not self._complete):
+                self._write_snapshot(rebuilt)
+        return stored, rebuilt
+
+    def compact(self):
+        """Fold the journal into a new snapshot."""
+        with self._compact_lock, file_lock(self.path), self._lock:
+            self._refresh()
+            # An outdated snapshot is rebuilt from the rows on the next write instead
+            if self._complete and self._offset:
+                self._write_snapshot(self._totals)
+
+    def _compact_in_background(self):
+        try:
+            self.compact()
+        finally:
+            self._compacting = False
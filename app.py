@@ -1,12 +1,15 @@
 import streamlit as st
-import pandas as pd
-import os
+
+from records import begin_rerun, get_user_profile
 
 # Entry/landing page shown AFTER login.
 # Decides whether to send users to onboarding or the dashboard.
 
 st.set_page_config(page_title="🌿 Digital Detox Companion", page_icon="🌿", layout="wide")
 
+# Each table is loaded at most once per rerun
+begin_rerun()
+
 # --- Nature-inspired styling (soft gradient + glass overlay) ---
 st.markdown(
     """
@@ -23,38 +26,12 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
-PROFILES_FILE = "user_profiles.csv"
-
-def ensure_profiles_csv():
-    """Create profiles CSV if missing (for first run on new machines)."""
-    if not os.path.exists(PROFILES_FILE):
-        pd.DataFrame(
-            columns=[
-                "user_id",
-                "username",
-                "sleep_hours",
-                "eating_habits",
-                "main_goal",
-                "mood_after_screen",
-                "daily_offline_time",
-                "onboarding_complete",
-            ]
-        ).to_csv(PROFILES_FILE, index=False)
-
-def get_profile(user_id: int):
-    if not os.path.exists(PROFILES_FILE):
-        return None
-    df = pd.read_csv(PROFILES_FILE)
-    row = df[df["user_id"] == user_id]
-    return None if row.empty else row.iloc[0].to_dict()
-
 # --- Auth guard ---
 if "user_id" not in st.session_state or not st.session_state.user_id:
     # Not logged in → send to landing/login page
     st.switch_page("landing_page.py")
 
-ensure_profiles_csv()
-profile = get_profile(st.session_state.user_id)
+profile = get_user_profile(st.session_state.user_id)
 
 # --- Landing content ---
 st.markdown("# Your Personal Digital Detox Companion")
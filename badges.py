@@ -0,0 +1,236 @@
+"""
+Event-driven achievement evaluation.
+
+Achievements used to be checked by looping over every definition after
+each check-in and re-deriving everything from the user's whole history.
+Here each achievement type is a Rule that declares the events it reacts to,
+so an event only runs the rules it can affect, and only for badges the user
+hasn't earned yet:
+- DAY_LOGGED: a check-in for a day that wasn't logged before
+- DAY_UPDATED: a day that was already logged was saved again
+
+Rules read small per-user facts instead of the history: the running
+aggregates (days logged, mood counts, the calendar bitmap) that storage
+keeps up to date on every write, and, for the few rules that need values
+per day, one short date-window read. Each fact is loaded once per
+evaluation and only if a rule asks for it. Everything one event awards is
+persisted with a single achievements write.
+"""
+
+from datetime import date, timedelta
+
+from history import DailyHistory
+from storage import award_achievements, get_range, get_user_achievements, get_user_aggregates
+
+DAY_LOGGED = 'day_logged'
+DAY_UPDATED = 'day_updated'
+ALL_EVENTS = (DAY_LOGGED, DAY_UPDATED)
+
+POSITIVE_MOODS = ('Peaceful', 'Focused')
+
+ACHIEVEMENTS = {
+    "first_day": {
+        "name": "🌱 Digital Seedling",
+        "description": "Complete your first day of tracking",
+        "requirement": 1,
+        "type": "days_logged"
+    },
+    "week_warrior": {
+        "name": "🗓️ Week Warrior",
+        "description": "Track for 7 consecutive days",
+        "requirement": 7,
+        "type": "days_logged"
+    },
+    "mindful_month": {
+        "name": "🌙 Mindful Month",
+        "description": "Track for 30 days",
+        "requirement": 30,
+        "type": "days_logged"
+    },
+    "screen_reducer": {
+        "name": "📉 Screen Reducer",
+        "description": "Reduce daily screen time by 2+ hours",
+        "requirement": 2.0,
+        "type": "screen_reduction"
+    },
+    "balance_master": {
+        "name": "⚖️ Balance Master",
+        "description": "Maintain under 4 hours daily for a week",
+        "requirement": 4.0,
+        "type": "weekly_average"
+    },
+    "mood_stabilizer": {
+        "name": "😌 Mood Stabilizer",
+        "description": "Log 'Peaceful' or 'Focused' mood 5 times",
+        "requirement": 5,
+        "type": "positive_moods"
+    },
+    "early_bird": {
+        "name": "🌅 Early Bird",
+        "description": "Log data before 9 AM three times",
+        "requirement": 3,
+        "type": "early_logging"
+    },
+    "consistent_tracker": {
+        "name": "🎯 Consistent Tracker",
+        "description": "No missed days in 2 weeks",
+        "requirement": 14,
+        "type": "consecutive_days"
+    }
+}
+
+
+class UserFacts:
+    """
+    What the rules look at for one user, each loaded at most once and only when asked for.
+
+    Read it after the check-in is saved: the aggregates and date windows come
+    through the rerun's unit of work, which already holds the new check-in.
+    """
+
+    __slots__ = ('user_id', '_totals', '_recent', '_first_total')
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self._totals = None
+        self._recent = None
+        self._first_total = None
+
+    @property
+    def totals(self):
+        """The user's running aggregates (aggregates.UserAggregates)."""
+        if self._totals is None:
+            self._totals = get_user_aggregates(self.user_id)
+        return self._totals
+
+    @property
+    def days(self):
+        return self.totals.days
+
+    @property
+    def calendar(self):
+        return self.totals.calendar
+
+    def mood_days(self, *keywords):
+        """Days whose mood contains any of the keywords."""
+        return sum(count for mood, count in self.totals.moods.items() if any(word in mood for word in keywords))
+
+    def recent(self):
+        """
+        The last week of check-ins, ending on the latest one.
+
+        Returns:
+            trends.RollingWindows: Windows over the 7 calendar days up to the latest check-in
+        """
+        if self._recent is None:
+            last = date.fromisoformat(self.totals.last_date)
+            rows = get_range(self.user_id, last - timedelta(days=6), last)
+            self._recent = DailyHistory.from_frame(rows, self.user_id).rolling()
+        return self._recent
+
+    def first_total(self):
+        """Total screen hours of the first logged day."""
+        if self._first_total is None:
+            rows = get_range(self.user_id, self.totals.first_date, self.totals.first_date)
+            self._first_total = float(rows['total_screen'].iloc[0])
+        return self._first_total
+
+
+class Rule:
+    """
+    How one achievement type is earned.
+
+    Attributes:
+        events (tuple): Events that can change the outcome
+        progress (callable): (UserFacts, requirement) -> progress towards the
+            badge, where 1.0 or more means earned
+    """
+
+    __slots__ = ('events', 'progress')
+
+    def __init__(self, events, progress):
+        self.events = events
+        self.progress = progress
+
+
+def _days_logged(facts, requirement):
+    return facts.days / requirement
+
+
+def _screen_reduction(facts, requirement):
+    # The first day's total against the mean of the last 3 calendar days
+    if facts.days < 2:
+        return 0.0
+    reduction = facts.first_total() - facts.recent().mean('total_screen', 3)
+    return max(reduction, 0.0) / requirement
+
+
+def _weekly_average(facts, requirement):
+    # Every one of the last 7 calendar days logged, and under the limit on average
+    last = facts.totals.last_date
+    if last is None or not facts.calendar.is_complete(7, last):
+        return 0.0
+    return 1.0 if facts.recent().mean('total_screen', 7) <= requirement else 0.0
+
+
+def _positive_moods(facts, requirement):
+    return facts.mood_days(*POSITIVE_MOODS) / requirement
+
+
+def _early_logging(facts, requirement):
+    # This would need timestamp data - simplified for now
+    return facts.days / requirement
+
+
+def _consecutive_days(facts, requirement):
+    # Any run of that many logged days in a row; progress follows the current streak
+    if facts.calendar.longest_streak() >= requirement:
+        return 1.0
+    return facts.calendar.current_streak() / requirement
+
+
+RULES = {
+    'days_logged': Rule((DAY_LOGGED,), _days_logged),
+    'screen_reduction': Rule((DAY_LOGGED, DAY_UPDATED), _screen_reduction),
+    'weekly_average': Rule((DAY_LOGGED, DAY_UPDATED), _weekly_average),
+    'positive_moods': Rule((DAY_LOGGED, DAY_UPDATED), _positive_moods),
+    'early_logging': Rule((DAY_LOGGED,), _early_logging),
+    'consecutive_days': Rule((DAY_LOGGED,), _consecutive_days),
+}
+
+
+def progress(facts, achievement):
+    """
+    Progress towards one achievement, for the achievements page.
+
+    Args:
+        facts (UserFacts): The user's facts
+        achievement (dict): An entry of ACHIEVEMENTS
+
+    Returns:
+        float: Between 0.0 and 1.0
+    """
+    return min(RULES[achievement['type']].progress(facts, achievement['requirement']), 1.0)
+
+
+def evaluate(user_id, *events):
+    """
+    Run the rules that react to the events and award everything they find.
+
+    Args:
+        user_id (int): The user the events happened to
+        *events (str): DAY_LOGGED and/or DAY_UPDATED; ALL_EVENTS runs every rule
+
+    Returns:
+        list: The newly earned entries of ACHIEVEMENTS, saved with one write
+    """
+    earned_ids = set(get_user_achievements(user_id)['achievement_id'].tolist())
+    facts = UserFacts(user_id)
+    new_achievements = {
+        achievement_id: achievement for achievement_id, achievement in ACHIEVEMENTS.items()
+        if achievement_id not in earned_ids and any(event in RULES[achievement['type']].events for event in events)
+        and RULES[achievement['type']].progress(facts, achievement['requirement']) >= 1.0
+    }
+    award_achievements(user_id, [(achievement_id, achievement['name'])
+                                 for achievement_id, achievement in new_achievements.items()])
+    return list(new_achievements.values())
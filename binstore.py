@@ -0,0 +1,166 @@
+"""
+Fixed-width binary format for the screen time table.
+
+Each check-in is one 16-byte record (user_id, day ordinal, minutes per
+device, mood code) in a NumPy .npy file sorted by (user_id, day). The file
+is opened with mmap_mode='r', so finding a user's rows is a binary search
+on the user_id column and the result is a view into the mapped file:
+nothing is parsed and nothing is copied until a DataFrame is built.
+
+Mood labels don't fit a fixed-width record, so "<file>.moods.json" lists
+them and record codes index into it (0 means no mood). The list only ever
+grows, so an older records file is still valid against a newer list.
+Notes are not part of the screen time rows at all; they live in the
+separate notes table of storage.py. Files converted before that split
+still have a "<file>.notes.csv" sidecar, which storage.split_notes()
+moves over.
+"""
+
+import bisect
+import json
+
+import numpy as np
+import pandas as pd
+
+from locks import atomic_write
+
+RECORD_DTYPE = np.dtype([
+    ('user_id', '<u4'),
+    ('day', '<i4'),          # days since 1970-01-01
+    ('phone_min', '<u2'),
+    ('laptop_min', '<u2'),
+    ('tablet_min', '<u2'),
+    ('mood', '<u1'),
+    ('_pad', '<u1'),
+])
+
+MOODS_SUFFIX = ".moods.json"
+# Legacy notes sidecar, only read by storage.split_notes()
+NOTES_SUFFIX = ".notes.csv"
+MINUTE_COLUMNS = ['phone_min', 'laptop_min', 'tablet_min']
+
+def open_records(path):
+    """
+    Memory-map a records file.
+
+    Args:
+        path (str): The .npy records file
+
+    Returns:
+        numpy.ndarray: Read-only structured array backed by the file
+    """
+    return np.load(path, mmap_mode='r')
+
+def user_slice(records, user_id):
+    """
+    Return one user's records as a view, without copying.
+
+    Args:
+        records (numpy.ndarray): Records sorted by (user_id, day)
+        user_id (int): The user to look up
+
+    Returns:
+        numpy.ndarray: The user's records, ordered by day
+    """
+    # bisect probes ~log2(n) elements; np.searchsorted would first copy the
+    # strided user_id field of the whole mapping into a contiguous array
+    user_ids = records['user_id']
+    start = bisect.bisect_left(user_ids, user_id)
+    end = bisect.bisect_right(user_ids, user_id, lo=start)
+    return records[start:end]
+
+def day_slice(records, start, end):
+    """
+    Narrow one user's records to a date window, as a view.
+
+    Args:
+        records (numpy.ndarray): One user's records, e.g. from user_slice()
+        start (str): First date to include, "YYYY-MM-DD"
+        end (str): Last date to include, "YYYY-MM-DD"
+
+    Returns:
+        numpy.ndarray: The records dated start..end
+    """
+    days = records['day']
+    first = int(np.datetime64(start, 'D').astype('int64'))
+    last = int(np.datetime64(end, 'D').astype('int64'))
+    lo = bisect.bisect_left(days, first)
+    return records[lo:bisect.bisect_right(days, last, lo=lo)]
+
+def read_moods(path):
+    """Load the mood labels that record codes refer to."""
+    try:
+        with open(path + MOODS_SUFFIX, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+def records_to_frame(records, moods):
+    """
+    Build a screen time DataFrame from records.
+
+    Args:
+        records (numpy.ndarray): Structured records, e.g. from user_slice()
+        moods (list): Mood labels from read_moods()
+
+    Returns:
+        pandas.DataFrame: user_id, date, minute and mood columns
+    """
+    frame = {
+        'user_id': records['user_id'].astype('int32'),
+        'date': records['day'].astype('datetime64[D]').astype('datetime64[ns]'),
+    }
+    for column in MINUTE_COLUMNS:
+        frame[column] = np.asarray(records[column])
+    # Code 0 is "no mood", which from_codes represents as -1
+    mood = pd.Categorical.from_codes(records['mood'].astype('int16') - 1, categories=moods)
+    frame['mood'] = mood.remove_unused_categories()
+    return pd.DataFrame(frame)
+
+def frame_to_records(df, moods):
+    """
+    Encode a screen time DataFrame as records sorted by (user_id, day).
+
+    Args:
+        df (pandas.DataFrame): Typed rows with user_id, date, minute and mood columns
+        moods (list): Known mood labels; new ones are appended in place
+
+    Returns:
+        numpy.ndarray: The encoded records
+    """
+    codes = {mood: i + 1 for i, mood in enumerate(moods)}
+    mood_codes = []
+    for mood in df['mood']:
+        if pd.isna(mood):
+            mood_codes.append(0)
+            continue
+        if mood not in codes:
+            moods.append(mood)
+            codes[mood] = len(moods)
+        mood_codes.append(codes[mood])
+    if len(moods) > 255:
+        raise ValueError("The binary format supports at most 255 distinct moods")
+
+    records = np.zeros(len(df), dtype=RECORD_DTYPE)
+    records['user_id'] = df['user_id'].to_numpy()
+    records['day'] = df['date'].to_numpy().astype('datetime64[D]').astype('int64')
+    for column in MINUTE_COLUMNS:
+        records[column] = df[column].to_numpy()
+    records['mood'] = mood_codes
+    return records[np.lexsort((records['day'], records['user_id']))]
+
+def write_table(path, df):
+    """
+    Replace a binary table with the rows of a DataFrame.
+
+    The mood list is written first, so a reader never sees records whose
+    mood codes it can't resolve.
+
+    Args:
+        path (str): The .npy records file
+        df (pandas.DataFrame): Typed screen time rows
+    """
+    moods = read_moods(path)
+    records = frame_to_records(df, moods)
+    atomic_write(path + MOODS_SUFFIX, lambda f: json.dump(moods, f, ensure_ascii=False))
+    atomic_write(path, lambda f: np.save(f, records), mode='wb')
@@ -0,0 +1,143 @@
+"""
+Process-wide cache for parsed data tables.
+
+Streamlit reruns the page script on every widget interaction, but imported
+modules live for the whole server process. Keeping parsed tables here lets
+every session reuse them instead of re-reading the same files from disk.
+
+Each entry is stored with a validation stamp (file mtimes and sizes, or a
+version number). A lookup whose stamp no longer matches counts as a miss
+and reloads the table, and writers can drop entries explicitly. The cache
+holds at most DETOX_CACHE_MB megabytes and evicts the least recently used
+entries first.
+"""
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_MB = 64
+
+def file_stamp(*paths):
+    """
+    Build a validation stamp from the mtime and size of some files.
+
+    Args:
+        *paths (str): Files the cached value was built from
+
+    Returns:
+        tuple: One (mtime_ns, size) pair per path, None for missing files
+    """
+    stamp = []
+    for path in paths:
+        try:
+            info = os.stat(path)
+        except FileNotFoundError:
+            stamp.append(None)
+        else:
+            stamp.append((info.st_mtime_ns, info.st_size))
+    return tuple(stamp)
+
+def estimate_size(value):
+    """Approximate memory footprint of a cached value in bytes."""
+    if hasattr(value, 'memory_usage'):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if hasattr(usage, 'sum') else int(usage)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+class TableCache:
+    """Thread-safe LRU cache bounded by an approximate memory budget."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, stamp, loader):
+        """
+        Return the cached value for key, loading it if missing or stale.
+
+        Args:
+            key (hashable): Cache key, e.g. ('table', path)
+            stamp (hashable): Current validation stamp of the source data
+            loader (callable): Builds the value when the cache can't serve it
+
+        Returns:
+            object: The cached or freshly loaded value
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == stamp:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = loader()
+        self.put(key, stamp, value)
+        return value
+
+    def put(self, key, stamp, value):
+        """Store a value, evicting least recently used entries to fit the budget."""
+        size = estimate_size(value)
+        with self._lock:
+            self._discard(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (stamp, value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self, key):
+        """Drop one entry (called by writers after they change the source)."""
+        with self._lock:
+            self._discard(key)
+
+    def clear(self):
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def stats(self):
+        """
+        Report cache effectiveness.
+
+        Returns:
+            dict: Hit/miss/eviction counters, hit rate and memory in use
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+
+table_cache = TableCache(int(float(os.environ.get("DETOX_CACHE_MB", DEFAULT_CACHE_MB)) * 1024 * 1024))
+
+def get_cache_stats():
+    """Hit/miss counters of the process-wide table cache."""
+    return table_cache.stats()
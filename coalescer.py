@@ -0,0 +1,178 @@
+"""
+Group commit for writes coming from many Streamlit sessions.
+
+Each session's save call hands its record to the process-wide coalescer
+and blocks. A background thread collects records per kind (check-ins,
+profiles, achievements) and hands each batch to the storage backend,
+which writes it with one write per file. A batch is flushed every
+DETOX_BATCH_MS milliseconds, or as soon as DETOX_BATCH_SIZE records of
+one kind are waiting. Callers return once their batch has been written.
+If a batch fails, each caller's records are written again on their own,
+so only the callers whose records fail see the exception.
+"""
+
+import os
+import threading
+import time
+
+DEFAULT_BATCH_MS = 2
+DEFAULT_BATCH_SIZE = 64
+
+class _Ticket:
+    """Completion signal for one submitted record."""
+
+    __slots__ = ('done', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.error = None
+
+
+class WriteCoalescer:
+    """Batch records from many threads into periodic bulk writes."""
+
+    def __init__(self, handlers, interval_ms=DEFAULT_BATCH_MS, max_batch=DEFAULT_BATCH_SIZE):
+        """
+        Args:
+            handlers (dict): Maps a record kind to a callable taking a list of records
+            interval_ms (float): Longest time a record waits for its batch
+            max_batch (int): Flush a kind early once this many records are waiting
+        """
+        self.handlers = handlers
+        self.interval = interval_ms / 1000.0
+        self.max_batch = max_batch
+        self._pending = {kind: [] for kind in handlers}
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+        self.batches = 0
+        self.records = 0
+
+    def submit(self, kind, record):
+        """
+        Queue a record and wait until the batch holding it is written.
+
+        Args:
+            kind (str): One of the handler kinds, e.g. "screen_time"
+            record (dict): The record to write
+
+        Raises:
+            Exception: Whatever the backend raised while writing the batch
+        """
+        self.submit_many(kind, [record])
+
+    def submit_many(self, kind, records):
+        """
+        Queue several records together and wait until they are written.
+
+        The records are queued at once, so they are always written in the
+        same batch (one backend call), along with whatever else is waiting.
+
+        Args:
+            kind (str): One of the handler kinds, e.g. "achievements"
+            records (list): The records to write
+
+        Raises:
+            Exception: Whatever the backend raised while writing the batch
+        """
+        ticket = _Ticket()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Write coalescer is closed")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="write-coalescer", daemon=True)
+                self._thread.start()
+            pending = self._pending[kind]
+            was_empty = not pending
+            pending.extend((record, ticket) for record in records)
+            if was_empty or len(pending) >= self.max_batch:
+                self._cond.notify()
+        ticket.done.wait()
+        if ticket.error is not None:
+            raise ticket.error
+
+    def close(self):
+        """Flush whatever is queued and stop the background thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def stats(self):
+        """
+        Report how well writes are being grouped.
+
+        Returns:
+            dict: Batches flushed, records written and the average batch size
+        """
+        with self._cond:
+            return {
+                'batches': self.batches,
+                'records': self.records,
+                'avg_batch': self.records / self.batches if self.batches else 0.0,
+            }
+
+    # --- Background Flushing ---
+
+    def _full(self):
+        return any(len(pending) >= self.max_batch for pending in self._pending.values())
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed or any(self._pending.values()))
+                # Give other sessions until the deadline to join this batch
+                deadline = time.monotonic() + self.interval
+                while not self._closed and not self._full():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batches = self._pending
+                self._pending = {kind: [] for kind in self.handlers}
+                if self._closed and not any(batches.values()):
+                    return
+            for kind, items in batches.items():
+                if items:
+                    self._flush(kind, items)
+
+    def _flush(self, kind, items):
+        try:
+            self.handlers[kind]([record for record, _ in items])
+            error = None
+        except Exception as e:
+            error = e
+        with self._cond:
+            self.batches += 1
+            self.records += len(items)
+        if error is not None and len({id(ticket) for _, ticket in items}) > 1:
+            self._flush_each(kind, items)
+            return
+        for _, ticket in items:
+            ticket.error = error
+            ticket.done.set()
+
+    def _flush_each(self, kind, items):
+        """Write a failed batch again one caller at a time, so a bad record only fails its own caller."""
+        groups = {}
+        for record, ticket in items:
+            groups.setdefault(id(ticket), (ticket, []))[1].append(record)
+        for ticket, records in groups.values():
+            try:
+                self.handlers[kind](records)
+            except Exception as e:
+                ticket.error = e
+            ticket.done.set()
+
+
+def batch_settings():
+    """
+    Read the batching settings from the environment.
+
+    Returns:
+        tuple: (interval_ms, max_batch); an interval of 0 turns batching off
+    """
+    return (float(os.environ.get("DETOX_BATCH_MS", DEFAULT_BATCH_MS)),
+            int(os.environ.get("DETOX_BATCH_SIZE", DEFAULT_BATCH_SIZE)))
@@ -1,10 +1,15 @@
 import streamlit as st
 import pandas as pd
-import os
 from datetime import datetime
 import zipfile
 import io
 
+from history import DailyHistory
+from schema import DATE_FORMAT, export_frame
+from records import get_user_profile
+from storage import get_user_screen_data, get_user_achievements, begin_rerun, prefetch_user_data
+from timing import PageTimer, show_timings
+
 def create_data_export():
     """Create a comprehensive data export for the user"""
     if 'user_id' not in st.session_state:
@@ -18,7 +23,7 @@ def create_data_export():
     
     # Load all user data
     profile_data = get_user_profile_data(user_id)
-    screen_data = get_user_screen_data(user_id)
+    screen_data = get_user_screen_data(user_id, with_notes=True)
     achievements_data = get_user_achievements_data(user_id)
     
     col1, col2 = st.columns(2)
@@ -81,24 +86,12 @@ def create_data_export():
 
 def get_user_profile_data(user_id):
     """Get user profile data"""
-    if os.path.exists("user_profiles.csv"):
-        profiles = pd.read_csv("user_profiles.csv")
-        return profiles[profiles['user_id'] == user_id]
-    return pd.DataFrame()
-
-def get_user_screen_data(user_id):
-    """Get user screen time data"""
-    if os.path.exists("daily_screen_time.csv"):
-        screen_data = pd.read_csv("daily_screen_time.csv")
-        return screen_data[screen_data['user_id'] == user_id]
-    return pd.DataFrame()
+    profile = get_user_profile(user_id)
+    return pd.DataFrame([profile]) if profile else pd.DataFrame()
 
 def get_user_achievements_data(user_id):
     """Get user achievements data"""
-    if os.path.exists("user_achievements.csv"):
-        achievements = pd.read_csv("user_achievements.csv")
-        return achievements[achievements['user_id'] == user_id]
-    return pd.DataFrame()
+    return get_user_achievements(user_id)
 
 def create_summary_report(user_id, profile_data, screen_data):
     """Create a summary report of user's digital wellness journey"""
@@ -118,31 +111,30 @@ def create_summary_report(user_id, profile_data, screen_data):
         report.append(f"Profile Created: {profile.get('created_date', 'N/A')}")
         report.append("")
     
-    if not screen_data.empty:
+    summary = DailyHistory.from_frame(screen_data).summary()
+    if not summary.empty:
         report.append("TRACKING STATISTICS:")
-        report.append(f"Total Days Tracked: {len(screen_data)}")
-        report.append(f"First Entry: {screen_data['date'].min()}")
-        report.append(f"Latest Entry: {screen_data['date'].max()}")
+        report.append(f"Total Days Tracked: {summary.days}")
+        report.append(f"First Entry: {summary.first_date.strftime(DATE_FORMAT)}")
+        report.append(f"Latest Entry: {summary.last_date.strftime(DATE_FORMAT)}")
         report.append("")
         
         report.append("AVERAGE USAGE:")
-        report.append(f"Daily Screen Time: {screen_data['total_screen'].mean():.1f} hours")
-        report.append(f"Phone Usage: {screen_data['phone'].mean():.1f} hours")
-        report.append(f"Laptop Usage: {screen_data['laptop'].mean():.1f} hours")
-        report.append(f"Tablet Usage: {screen_data['tablet'].mean():.1f} hours")
+        report.append(f"Daily Screen Time: {summary.means['total_screen']:.1f} hours")
+        report.append(f"Phone Usage: {summary.means['phone']:.1f} hours")
+        report.append(f"Laptop Usage: {summary.means['laptop']:.1f} hours")
+        report.append(f"Tablet Usage: {summary.means['tablet']:.1f} hours")
         report.append("")
         
         report.append("MOOD ANALYSIS:")
-        mood_counts = screen_data['mood'].value_counts()
-        for mood, count in mood_counts.head(3).items():
-            report.append(f"{mood}: {count} days ({count/len(screen_data)*100:.1f}%)")
+        for mood, count in summary.moods[:3]:
+            report.append(f"{mood}: {count} days ({count/summary.days*100:.1f}%)")
         report.append("")
         
-        if len(screen_data) >= 7:
-            recent_week = screen_data.tail(7)
-            earlier_week = screen_data.head(7)
-            recent_avg = recent_week['total_screen'].mean()
-            earlier_avg = earlier_week['total_screen'].mean()
+        # First and latest calendar weeks of the history
+        if summary.span >= 7:
+            recent_avg = summary.week_means['total_screen']
+            earlier_avg = summary.first_week_avg
             change = recent_avg - earlier_avg
             
             report.append("PROGRESS ANALYSIS:")
@@ -189,9 +181,9 @@ def create_json_export(user_id, profile_data, screen_data, achievements_data, in
     export_data = {
         "user_id": user_id,
         "export_date": datetime.now().isoformat(),
-        "profile": profile_data.to_dict('records') if not profile_data.empty else [],
-        "screen_time_logs": screen_data.to_dict('records') if not screen_data.empty else [],
-        "achievements": achievements_data.to_dict('records') if not achievements_data.empty else []
+        "profile": export_frame(profile_data).to_dict('records') if not profile_data.empty else [],
+        "screen_time_logs": export_frame(screen_data).to_dict('records') if not screen_data.empty else [],
+        "achievements": export_frame(achievements_data).to_dict('records') if not achievements_data.empty else []
     }
     
     if include_summary:
@@ -208,10 +200,10 @@ def create_excel_export(user_id, profile_data, screen_data, achievements_data, i
             profile_data.to_excel(writer, sheet_name='Profile', index=False)
         
         if not screen_data.empty:
-            screen_data.to_excel(writer, sheet_name='Screen Time', index=False)
+            export_frame(screen_data).to_excel(writer, sheet_name='Screen Time', index=False)
         
         if not achievements_data.empty:
-            achievements_data.to_excel(writer, sheet_name='Achievements', index=False)
+            export_frame(achievements_data).to_excel(writer, sheet_name='Achievements', index=False)
         
         if include_summary:
             summary_df = pd.DataFrame([create_summary_report(user_id, profile_data, screen_data).split('\n')])
@@ -222,4 +214,10 @@ def create_excel_export(user_id, profile_data, screen_data, achievements_data, i
 
 # --- Main App Logic ---
 if __name__ == "__main__":
+    timer = PageTimer("data_export")
+    begin_rerun()
+    prefetch_user_data(st.session_state.get('user_id'), ('profiles', 'screen_time', 'notes', 'achievements'))
     create_data_export()
+    timer.mark("rendered")
+    if show_timings():
+        st.caption(timer.summary())
@@ -0,0 +1,172 @@
+"""
+Calendar bitmap of the days a user logged.
+
+Streaks and "no missed days" checks only need to know which calendar days
+have a check-in, so each user's days are kept as one bit per day in a
+Python int: bit 0 is the first logged day and bit n is n days later.
+Counting days in a range is a shift, a mask and a popcount, the current
+streak is a scan for the highest zero bit, and the longest streak folds the
+bitmap onto itself (x & x >> 1) once per day of the run. A year of
+check-ins is 46 bytes.
+
+The bitmap lives in the running aggregates (see aggregates.py), so both
+storage backends set a day's bit in the same write as the check-in.
+
+Like records.py, this module only uses the standard library.
+"""
+
+from datetime import date
+
+
+def _ordinal(day):
+    """Proleptic ordinal of a date, datetime or "YYYY-MM-DD" string."""
+    if isinstance(day, str):
+        day = date.fromisoformat(day[:10])
+    elif hasattr(day, 'date'):
+        day = day.date()
+    return day.toordinal()
+
+
+def _run_ending(bits, position):
+    """Length of the run of set bits ending at bit `position`."""
+    if position < 0:
+        return 0
+    window = bits & ((1 << (position + 1)) - 1)
+    gaps = ~window & ((1 << (position + 1)) - 1)
+    return position - (gaps.bit_length() - 1)
+
+
+class DayBitmap:
+    """
+    One bit per calendar day from a user's first check-in on.
+
+    Attributes:
+        origin (int): Date ordinal of bit 0 (the first logged day), None when empty
+        bits (int): Bit n set if the day origin + n was logged
+    """
+
+    __slots__ = ('origin', 'bits')
+
+    def __init__(self, origin=None, bits=0):
+        self.origin = origin
+        self.bits = bits
+
+    @classmethod
+    def from_hex(cls, first_date, text):
+        """Rebuild a bitmap stored with to_hex(); first_date is the first logged day."""
+        if first_date is None or not text:
+            return cls()
+        return cls(_ordinal(first_date), int(text, 16))
+
+    def to_hex(self):
+        return format(self.bits, 'x')
+
+    def add(self, day):
+        """Mark a day as logged, moving bit 0 back if it is the earliest day so far."""
+        ordinal = _ordinal(day)
+        if self.origin is None:
+            self.origin = ordinal
+        elif ordinal < self.origin:
+            self.bits <<= self.origin - ordinal
+            self.origin = ordinal
+        self.bits |= 1 << (ordinal - self.origin)
+
+    def __contains__(self, day):
+        if self.origin is None:
+            return False
+        position = _ordinal(day) - self.origin
+        return position >= 0 and bool(self.bits >> position & 1)
+
+    def __len__(self):
+        return self.bits.bit_count()
+
+    def __eq__(self, other):
+        return isinstance(other, DayBitmap) and (self.origin, self.bits) == (other.origin, other.bits)
+
+    def __repr__(self):
+        first = date.fromordinal(self.origin).isoformat() if self.origin is not None else None
+        return f"DayBitmap(first={first}, days={len(self)})"
+
+    def _position(self, day):
+        return (_ordinal(day) if day is not None else date.today().toordinal()) - self.origin
+
+    def count(self, start, end):
+        """
+        Days logged from start to end, inclusive.
+
+        Args:
+            start, end: date, datetime or "YYYY-MM-DD"
+
+        Returns:
+            int: Logged days in the range
+        """
+        if self.origin is None:
+            return 0
+        lo = max(self._position(start), 0)
+        hi = self._position(end)
+        if hi < lo:
+            return 0
+        return (self.bits >> lo & ((1 << (hi - lo + 1)) - 1)).bit_count()
+
+    def is_complete(self, days, end=None):
+        """
+        True if every one of the `days` calendar days ending on `end` was logged.
+
+        Args:
+            days (int): Window length in calendar days
+            end: Last day of the window; defaults to today
+        """
+        if self.origin is None:
+            return False
+        position = self._position(end)
+        return position - days + 1 >= 0 and _run_ending(self.bits, position) >= days
+
+    def current_streak(self, today=None):
+        """
+        Consecutive logged days up to today.
+
+        A streak whose last day is yesterday is still current, since today's
+        check-in may not have happened yet.
+
+        Args:
+            today: The day to count back from; defaults to the current date
+
+        Returns:
+            int: Length of the streak, 0 if neither today nor yesterday was logged
+        """
+        if self.origin is None:
+            return 0
+        position = self._position(today)
+        if position >= 0 and not self.bits >> position & 1:
+            position -= 1
+        return _run_ending(self.bits, position)
+
+    def longest_streak(self):
+        """Longest run of consecutive logged days."""
+        bits, longest = self.bits, 0
+        while bits:
+            bits &= bits >> 1
+            longest += 1
+        return longest
+
+    def year_weeks(self, year):
+        """
+        A year as calendar weeks, for a GitHub-style calendar view.
+
+        Args:
+            year (int): The calendar year
+
+        Returns:
+            list: One list per week (Monday first) of 7 values: True for a
+            logged day, False for a day without a check-in, None for days
+            outside the year
+        """
+        first = date(year, 1, 1)
+        length = date(year, 12, 31).toordinal() - first.toordinal() + 1
+        # Align the bitmap so bit 0 is January 1st
+        shift = first.toordinal() - self.origin if self.origin is not None else 0
+        bits = self.bits >> shift if shift >= 0 else self.bits << -shift
+        lead = first.weekday()
+        cells = [None] * lead + [bool(bits >> day & 1) for day in range(length)]
+        cells += [None] * (-len(cells) % 7)
+        return [cells[week:week + 7] for week in range(0, len(cells), 7)]
@@ -1,18 +1,15 @@
 import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
-import os
 import random
 from datetime import datetime, timedelta
 
-# Import achievements functions
-try:
-    from achievements import check_achievements, get_user_achievements
-except ImportError:
-    def check_achievements(user_id, user_data, profile):
-        return []
-    def get_user_achievements(user_id):
-        return pd.DataFrame()
+from badges import DAY_LOGGED, DAY_UPDATED, evaluate
+from records import get_user_profile
+from storage import (begin_rerun, get_entry, get_range, get_user_achievements, get_user_aggregates, get_user_calendar,
+                     get_user_history, get_user_summary, prefetch_user_data, save_daily_entry)
+from timing import PageTimer, show_timings
+from utils import create_calendar_chart
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -21,6 +18,11 @@ st.set_page_config(
     layout="wide"
 )
 
+# Each table is loaded at most once per rerun; start this user's reads in parallel
+timer = PageTimer("digital_detox")
+begin_rerun()
+prefetch_user_data(st.session_state.get('user_id'), ('profiles', 'screen_time', 'achievements', 'aggregates'))
+
 # --- Enhanced Nature-Inspired Styling ---
 st.markdown("""
     <style>
@@ -148,72 +150,13 @@ MOODS = [
 ]
 
 # --- Helper Functions ---
-def init_screen_time_file():
-    """Initialize the screen time CSV file if it doesn't exist"""
-    file_path = "daily_screen_time.csv"
-    if not os.path.exists(file_path):
-        df = pd.DataFrame(columns=['user_id', 'date', 'phone', 'laptop', 'tablet', 'total_screen', 'mood', 'notes'])
-        df.to_csv(file_path, index=False)
-
-def save_daily_entry(user_id, phone, laptop, tablet, mood, notes=""):
-    """Save a daily screen time entry"""
-    init_screen_time_file()
-    
-    total_screen = phone + laptop + tablet
-    today = datetime.now().strftime("%Y-%m-%d")
-    
-    # Load existing data
-    df = pd.read_csv("daily_screen_time.csv")
-    
-    # Check if entry for today already exists
-    existing_entry = df[(df['user_id'] == user_id) & (df['date'] == today)]
-    
-    if not existing_entry.empty:
-        # Update existing entry
-        df.loc[(df['user_id'] == user_id) & (df['date'] == today), 
-               ['phone', 'laptop', 'tablet', 'total_screen', 'mood', 'notes']] = [phone, laptop, tablet, total_screen, mood, notes]
-    else:
-        # Add new entry
-        new_entry = pd.DataFrame([{
-            'user_id': user_id,
-            'date': today,
-            'phone': phone,
-            'laptop': laptop,
-            'tablet': tablet,
-            'total_screen': total_screen,
-            'mood': mood,
-            'notes': notes
-        }])
-        df = pd.concat([df, new_entry], ignore_index=True)
-    
-    df.to_csv("daily_screen_time.csv", index=False)
-
-def get_user_screen_data(user_id):
-    """Get all screen time data for a specific user"""
-    init_screen_time_file()
-    df = pd.read_csv("daily_screen_time.csv")
-    user_data = df[df['user_id'] == user_id].sort_values('date')
-    return user_data
-
-def get_profile():
-    """Get user profile data"""
-    if not os.path.exists("user_profiles.csv"):
-        return None
-    
-    profiles_df = pd.read_csv("user_profiles.csv")
-    user_profile = profiles_df[profiles_df['user_id'] == st.session_state.user_id]
-    
-    if user_profile.empty:
-        return None
-    
-    return user_profile.iloc[0].to_dict()
-
-def generate_insights(user_data, profile):
-    """Generate personalized insights based on user data"""
-    if user_data.empty:
+def generate_insights(history, profile):
+    """Generate personalized insights based on the user's DailyHistory"""
+    if history.empty:
         return "🌱 Welcome to your digital wellness journey! Log your first day to start seeing insights."
     
-    recent_avg = user_data.tail(3)['total_screen'].mean()
+    summary = history.summary()
+    recent_avg = summary.recent_avg
     
     insights = []
     
@@ -226,19 +169,16 @@ def generate_insights(user_data, profile):
         insights.append("⚠️ High screen time detected. Try the 20-20-20 rule: every 20 minutes, look at something 20 feet away for 20 seconds.")
     
     # Mood analysis
-    if len(user_data) >= 3:
-        recent_moods = user_data.tail(3)['mood'].tolist()
+    if len(history) >= 3:
+        recent_moods = history.last_days(3).mood.tolist()
         if any('Stressed' in mood for mood in recent_moods):
             insights.append("🧘 Stress detected. Try 5 minutes of deep breathing or a short walk.")
         elif any('Peaceful' in mood or 'Happy' in mood for mood in recent_moods):
             insights.append("😊 Great to see positive moods! Keep up the good balance.")
     
-    # Progress tracking
-    if len(user_data) >= 2:
-        yesterday = user_data.iloc[-2]['total_screen']
-        today = user_data.iloc[-1]['total_screen']
-        change = today - yesterday
-        
+    # Progress tracking against the previous calendar day, if it was logged
+    change = summary.day_change
+    if not pd.isna(change):
         if change < -0.5:
             insights.append(f"📉 Amazing! You reduced screen time by {abs(change):.1f} hours today!")
         elif change > 1:
@@ -246,7 +186,7 @@ def generate_insights(user_data, profile):
     
     return " | ".join(insights) if insights else "Keep tracking to unlock personalized insights! 🌟"
 
-def get_personalized_activity(profile, mood, user_data):
+def get_personalized_activity(profile, mood, history):
     """Generate personalized activity suggestions"""
     activities = {
         "Stressed": ["Take 10 deep breaths", "Go for a 5-minute walk", "Listen to calming music", "Do gentle stretches"],
@@ -258,7 +198,7 @@ def get_personalized_activity(profile, mood, user_data):
     mood_key = next((key for key in activities.keys() if key in mood), "Focused")
     return random.choice(activities[mood_key])
 
-def get_challenge_plan(profile, user_data):
+def get_challenge_plan(profile, history):
     """Generate a 7-day personalized challenge"""
     base_challenges = [
         "📱 Day 1: Phone-free dinner - Enjoy a meal without any devices",
@@ -290,16 +230,19 @@ if 'user_id' not in st.session_state:
     st.switch_page("login_page.py")
 
 # Check if user has completed profile setup
-profile = get_profile()
+profile = get_user_profile(st.session_state.user_id)
 if not profile:
     st.error("🌿 Please complete your wellness profile first")
     st.switch_page("profile_setup.py")
 
-# --- Initialize Files ---
-init_screen_time_file()
-
 # --- Load User Data ---
-user_data = get_user_screen_data(st.session_state.user_id)
+history = get_user_history(st.session_state.user_id)
+# All-time figures come from the running aggregates; the summary adds the window and trend figures
+totals = get_user_aggregates(st.session_state.user_id)
+summary = get_user_summary(st.session_state.user_id)
+calendar = get_user_calendar(st.session_state.user_id)
+user_achievements = get_user_achievements(st.session_state.user_id)
+timer.mark("data")
 
 # --- Sidebar: Daily Check-in Form ---
 with st.sidebar:
@@ -307,27 +250,32 @@ with st.sidebar:
     username = profile.get('username', 'Friend') if profile else 'Friend'
     st.markdown(f"*Hello, {username}!* 👋")
     
+    # Past days can be filled in or edited too
+    today = datetime.now().date()
+    entry_day = st.date_input("📅 Day", value=today, max_value=today,
+                              help="Pick an earlier day to log or edit a missed check-in")
+    is_today = entry_day == today
+    
     with st.form("daily_check_in"):
-        today = datetime.now().strftime("%Y-%m-%d")
+        # Check if this day was already logged
+        existing = get_entry(st.session_state.user_id, entry_day, with_notes=True)
+        has_logged_day = existing is not None
         
-        # Check if already logged today
-        today_entry = user_data[user_data['date'] == today]
-        has_logged_today = not today_entry.empty
-        
-        if has_logged_today:
-            st.success("✅ Already checked in today!")
-            existing = today_entry.iloc[0]
+        if has_logged_day:
+            st.success("✅ Already checked in today!" if is_today else f"✅ Already logged {entry_day:%b %d} - saving replaces it")
             phone_default = float(existing['phone'])
             laptop_default = float(existing['laptop'])
             tablet_default = float(existing['tablet'])
             mood_default = existing['mood']
+            notes_default = existing['notes']
         else:
             phone_default = 0.0
             laptop_default = 0.0
             tablet_default = 0.0
             mood_default = MOODS[1]  # Default to "Focused"
+            notes_default = ""
         
-        st.markdown("#### ⏰ Screen Time Today")
+        st.markdown("#### ⏰ Screen Time Today" if is_today else f"#### ⏰ Screen Time on {entry_day:%b %d}")
         phone = st.number_input("📱 Phone (hours)", min_value=0.0, max_value=24.0, value=phone_default, step=0.5)
         laptop = st.number_input("💻 Laptop (hours)", min_value=0.0, max_value=24.0, value=laptop_default, step=0.5)
         tablet = st.number_input("📟 Tablet (hours)", min_value=0.0, max_value=24.0, value=tablet_default, step=0.5)
@@ -339,15 +287,17 @@ with st.sidebar:
         mood = st.selectbox("How are you feeling?", MOODS, index=MOODS.index(mood_default) if mood_default in MOODS else 1)
         
         st.markdown("#### 📝 Optional Notes")
-        notes = st.text_area("Any thoughts about today?", placeholder="Optional: How did screen time affect you today?", height=80)
+        notes = st.text_area("Any thoughts about today?" if is_today else "Any thoughts about that day?",
+                             value=notes_default, placeholder="Optional: How did screen time affect you today?", height=80)
         
-        submitted = st.form_submit_button("💾 Save Today's Check-in", use_container_width=True)
+        submitted = st.form_submit_button("💾 Save Today's Check-in" if is_today else f"💾 Save Check-in for {entry_day:%b %d}",
+                                          use_container_width=True)
         
         if submitted:
-            save_daily_entry(st.session_state.user_id, phone, laptop, tablet, mood, notes)
+            save_daily_entry(st.session_state.user_id, phone, laptop, tablet, mood, notes, date=entry_day)
             
-            # Check for new achievements
-            new_achievements = check_achievements(st.session_state.user_id, user_data, profile)
+            # Run only the badge rules this check-in can affect, against the data including it
+            new_achievements = evaluate(st.session_state.user_id, DAY_UPDATED if has_logged_day else DAY_LOGGED)
             if new_achievements:
                 for achievement in new_achievements:
                     st.balloons()
@@ -389,36 +339,35 @@ st.markdown(f"""
 """, unsafe_allow_html=True)
 
 # --- Progress Metrics ---
-if not user_data.empty:
-    streak_days = len(user_data)
+if not history.empty:
+    streak_days = calendar.current_streak()
     st.markdown(f"### 🔥 Tracking Streak: {streak_days} days <span class='nature-decoration'>🌱</span>", unsafe_allow_html=True)
+    st.caption(f"Longest streak: {calendar.longest_streak()} days · {totals.days} days tracked in total")
     
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        avg_total = user_data['total_screen'].mean()
+        avg_total = totals.mean_hours('total_screen')
         st.metric("📊 Average Screen Time", f"{avg_total:.1f} hrs/day", help="Your daily average across all devices")
     
     with col2:
-        avg_phone = user_data['phone'].mean()
+        avg_phone = totals.mean_hours('phone')
         st.metric("📱 Phone Usage", f"{avg_phone:.1f} hrs/day", help="Time spent on mobile device")
     
     with col3:
-        most_common_mood = user_data['mood'].mode().iloc[0] if not user_data['mood'].mode().empty else "😌 Calm"
+        most_common_mood = totals.dominant_mood(default="😌 Calm")
         mood_emoji = most_common_mood.split()[0] if most_common_mood else "😌"
         st.metric("🎭 Dominant Mood", mood_emoji, help="Your most frequent mood this week")
     
     with col4:
         # Show achievements count
-        user_achievements = get_user_achievements(st.session_state.user_id)
         achievement_count = len(user_achievements)
         st.metric("🏆 Achievements", f"{achievement_count} earned", help="Click 'Achievements' in sidebar to see all badges")
     
     with col4:
-        if len(user_data) >= 2:
-            recent_avg = user_data.tail(3)['total_screen'].mean()
-            older_avg = user_data.head(-3)['total_screen'].mean()
-            change = recent_avg - older_avg
+        if len(history) >= 2:
+            # Last 3 calendar days against every day before them
+            change = 0.0 if pd.isna(summary.recent_trend) else summary.recent_trend
             trend_emoji = "📉" if change < 0 else "📈"
             st.metric("📈 Recent Trend", f"{change:+.1f} hrs", help="Change in recent screen time")
             if change < 0:
@@ -430,8 +379,8 @@ else:
 st.markdown("---")
 st.markdown("### 🔍 Your Personal Insights <span class='nature-decoration'>🌟</span>", unsafe_allow_html=True)
 
-if not user_data.empty:
-    insight = generate_insights(user_data, profile)
+if not history.empty:
+    insight = generate_insights(history, profile)
     st.info(insight)
 
 # --- Personalized Activity Suggestion ---
@@ -439,21 +388,21 @@ st.markdown("---")
 st.markdown("### 🎯 Your Mindful Activity Right Now <span class='nature-decoration'>🌿</span>", unsafe_allow_html=True)
 
 if 'mood' in locals():  # If user just logged mood
-    suggestion = get_personalized_activity(profile, mood, user_data)
+    suggestion = get_personalized_activity(profile, mood, history)
     user_goal = profile.get('main_goal', 'better wellness') if profile else 'better wellness'
     st.success(f"Based on your {mood.split()[1].lower()} mood and '{user_goal}' goal: **{suggestion}**")
     st.caption("Tip: Take a 5-minute stretch break now to reset your mind.")
 else:
     # Show general activity based on recent mood
-    if not user_data.empty:
-        recent_mood = user_data.iloc[-1]['mood'] if len(user_data) > 0 else "😌 Peaceful"
-        suggestion = get_personalized_activity(profile, recent_mood, user_data)
+    if not history.empty:
+        recent_mood = history.latest('mood') if len(history) > 0 else "😌 Peaceful"
+        suggestion = get_personalized_activity(profile, recent_mood, history)
         st.success(f"💡 **Suggested activity:** {suggestion}")
     else:
         st.info("🌱 Log your mood in the sidebar to get personalized activity suggestions!")
 
 # --- Screen Time Visualization ---
-if len(user_data) >= 3:
+if len(history) >= 3:
     st.markdown("---")
     st.markdown("### 📈 Your Screen Time Journey <span class='nature-decoration'>📊</span>", unsafe_allow_html=True)
     
@@ -461,9 +410,11 @@ if len(user_data) >= 3:
     
     with chart_col1:
         st.markdown("#### 📅 Weekly Trend")
-        if len(user_data) >= 7:
-            recent_data = user_data.tail(7)
-            
+        week_start = (datetime.now() - timedelta(days=6)).strftime("%Y-%m-%d")
+        recent_data = get_range(st.session_state.user_id, week_start, datetime.now().strftime("%Y-%m-%d"))
+        if len(history) >= 7 and recent_data.empty:
+            st.info("🌿 No check-ins in the last 7 days yet. Log today to see your weekly trend!")
+        elif len(history) >= 7:
             fig, ax = plt.subplots(figsize=(8, 5))
             ax.plot(recent_data['date'], recent_data['phone'], marker='o', label='📱 Phone', linewidth=2, color='#FF6B35')
             ax.plot(recent_data['date'], recent_data['laptop'], marker='s', label='💻 Laptop', linewidth=2, color='#4CAF50')
@@ -485,9 +436,9 @@ if len(user_data) >= 3:
         with chart_col2:
             st.markdown("#### 📊 Device Usage Summary")
             device_totals = {
-                'Phone': user_data['phone'].sum(),
-                'Laptop': user_data['laptop'].sum(),
-                'Tablet': user_data['tablet'].sum()
+                'Phone': totals.total_hours('phone'),
+                'Laptop': totals.total_hours('laptop'),
+                'Tablet': totals.total_hours('tablet')
             }
             
             fig2, ax2 = plt.subplots(figsize=(8, 5))
@@ -509,7 +460,17 @@ if len(user_data) >= 3:
             st.pyplot(fig2)
 else:
     st.markdown("---")
-    st.info(f"🔓 **Visual insights unlock after 3 days of tracking!** ({len(user_data)}/3 days complete) Keep going! 🌱")
+    st.info(f"🔓 **Visual insights unlock after 3 days of tracking!** ({len(history)}/3 days complete) Keep going! 🌱")
+
+# --- Tracking Calendar ---
+if not history.empty:
+    st.markdown("---")
+    st.markdown("### 🗓️ Your Tracking Calendar <span class='nature-decoration'>🌿</span>", unsafe_allow_html=True)
+    this_year = datetime.now().year
+    first_year = datetime.strptime(totals.first_date, "%Y-%m-%d").year
+    calendar_year = st.selectbox("Year", list(range(this_year, min(first_year, this_year) - 1, -1)), index=0)
+    st.caption(f"{calendar.count(f'{calendar_year}-01-01', f'{calendar_year}-12-31')} days logged in {calendar_year}")
+    st.pyplot(create_calendar_chart(calendar, calendar_year))
 
 # --- 7-Day Challenge Plan ---
 st.markdown("---")
@@ -517,19 +478,19 @@ st.markdown("### 🏆 Your 7-Day Wellness Challenge <span class='nature-decorati
 challenge_goal = profile.get('main_goal', 'digital wellness') if profile else 'digital wellness'
 st.markdown(f"*Tailored for your goal: **{challenge_goal}***")
 
-challenge_plan = get_challenge_plan(profile, user_data)
+challenge_plan = get_challenge_plan(profile, history)
 
 for i, challenge in enumerate(challenge_plan, 1):
     # Mark completed days based on tracking history
-    is_completed = len(user_data) >= i
+    is_completed = len(history) >= i
     status = "✅" if is_completed else "⏳"
     st.markdown(f"{status} {challenge}")
 
-if len(user_data) >= 7:
+if len(history) >= 7:
     st.success("🎉 Congratulations! You've completed your first week of digital wellness tracking!")
     st.balloons()
 else:
-    remaining_days = 7 - len(user_data)
+    remaining_days = 7 - len(history)
     st.info(f"🌟 {remaining_days} more days to complete your first weekly challenge!")
 
 # --- Footer ---
@@ -540,3 +501,7 @@ st.markdown("""
     <em>All data is stored locally on your device for complete privacy</em> 🔒
 </div>
 """, unsafe_allow_html=True)
+
+timer.mark("rendered")
+if show_timings():
+    st.caption(timer.summary())
@@ -0,0 +1,221 @@
+"""
+Compact per-user daily history.
+
+A user's screen time history is typically a few dozen rows, and the
+dashboard asks it the same handful of questions many times per rerun:
+how many days, the mean of the last few days, the most common mood, the
+latest value. Answering those through a DataFrame costs far more than the
+arithmetic, so DailyHistory keeps one NumPy array per field, slices in
+O(1) (slices are views of the same arrays) and caches sums, means and the
+mood mode on first use. Calendar-window figures (rolling means, trends)
+come from rolling(), the trends.RollingWindows of the history, and every
+dashboard headline figure from summary(), the summary.SummaryMetrics of
+the history; both are built on first use as well. Convert with to_frame()
+only for charts and exports.
+"""
+
+import numpy as np
+import pandas as pd
+
+from schema import DEVICE_MINUTE_COLUMNS
+from summary import summarize
+from trends import RollingWindows
+
+HOUR_FIELDS = ('phone', 'laptop', 'tablet', 'total_screen')
+
+
+class DailyHistory:
+    """
+    One user's check-ins, ordered by date, as parallel arrays.
+
+    Attributes:
+        dates (numpy.ndarray): datetime64 day of each check-in
+        phone, laptop, tablet, total_screen (numpy.ndarray): Hours (float64)
+        mood (numpy.ndarray): Mood labels (object, NaN where missing)
+    """
+
+    __slots__ = ('user_id', 'dates', 'phone', 'laptop', 'tablet', 'total_screen', 'mood', '_sums', '_mood_mode',
+                 '_windows', '_summary')
+
+    def __init__(self, user_id, dates, phone, laptop, tablet, total_screen, mood):
+        self.user_id = user_id
+        self.dates = dates
+        self.phone = phone
+        self.laptop = laptop
+        self.tablet = tablet
+        self.total_screen = total_screen
+        self.mood = mood
+        self._sums = {}
+        self._mood_mode = None
+        self._windows = None
+        self._summary = None
+
+    @classmethod
+    def from_screen_time(cls, df, user_id=None):
+        """
+        Build a history from stored screen time rows.
+
+        Args:
+            df (pandas.DataFrame): Date-ordered rows with *_min columns, as
+                the storage backends return them
+            user_id (int): The user the rows belong to
+
+        Returns:
+            DailyHistory: The rows as arrays, in hours
+        """
+        minutes = {hours: df[column].to_numpy(dtype='int64') for column, hours in DEVICE_MINUTE_COLUMNS.items()}
+        # Sum whole minutes first so the total is exact
+        total = minutes['phone'] + minutes['laptop'] + minutes['tablet']
+        return cls(user_id, df['date'].to_numpy(), minutes['phone'] / 60, minutes['laptop'] / 60,
+                   minutes['tablet'] / 60, total / 60, df['mood'].to_numpy(dtype=object))
+
+    @classmethod
+    def from_frame(cls, df, user_id=None):
+        """
+        Build a history from hour rows like get_user_screen_data() returns.
+
+        Args:
+            df (pandas.DataFrame): Date-ordered rows with phone, laptop,
+                tablet, total_screen and mood columns
+            user_id (int): The user the rows belong to
+
+        Returns:
+            DailyHistory: The rows as arrays
+        """
+        hours = {field: df[field].to_numpy(dtype='float64') for field in HOUR_FIELDS}
+        return cls(user_id, df['date'].to_numpy(), hours['phone'], hours['laptop'], hours['tablet'],
+                   hours['total_screen'], df['mood'].to_numpy(dtype=object))
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def empty(self):
+        return len(self.dates) == 0
+
+    def __getitem__(self, rows):
+        """Slice of the history by position, e.g. history[-14:-7]; shares the arrays."""
+        if not isinstance(rows, slice):
+            raise TypeError("DailyHistory only supports slicing; use the field arrays for single values")
+        return DailyHistory(self.user_id, self.dates[rows], self.phone[rows], self.laptop[rows],
+                            self.tablet[rows], self.total_screen[rows], self.mood[rows])
+
+    def last_days(self, days, day=None):
+        """
+        The check-ins within a calendar window, found by binary search.
+
+        Args:
+            days (int): Window length in calendar days
+            day: Last day of the window; defaults to the last logged day
+
+        Returns:
+            DailyHistory: The rows dated in the window (a view)
+        """
+        if self.empty:
+            return self
+        end = self.dates[-1].astype('datetime64[D]') if day is None else np.datetime64(day, 'D')
+        days_logged = self.dates.astype('datetime64[D]')
+        lo = np.searchsorted(days_logged, end - (days - 1), side='left')
+        hi = np.searchsorted(days_logged, end, side='right')
+        return self[lo:hi]
+
+    def rolling(self):
+        """
+        Calendar-window sums of every hour field, computed once per history.
+
+        Returns:
+            trends.RollingWindows: O(1) means, counts and changes over any
+            window of calendar days
+        """
+        if self._windows is None:
+            self._windows = RollingWindows(self.dates, {field: getattr(self, field) for field in HOUR_FIELDS})
+        return self._windows
+
+    def summary(self):
+        """
+        Every summary figure of the history, computed once per history.
+
+        Returns:
+            summary.SummaryMetrics: Read-only totals, averages, moods and trends
+        """
+        if self._summary is None:
+            self._summary = summarize(self)
+        return self._summary
+
+    def tail(self, n):
+        """The last n days (all of them if there are fewer)."""
+        return self[max(len(self) - n, 0):]
+
+    def head(self, n):
+        """The first n days, or all but the last -n days for a negative n (like DataFrame.head)."""
+        return self[:n]
+
+    def sum(self, field):
+        """
+        Sum of one hour field, computed once per history.
+
+        Args:
+            field (str): phone, laptop, tablet or total_screen
+
+        Returns:
+            float: Total hours
+        """
+        if field not in self._sums:
+            self._sums[field] = float(getattr(self, field).sum())
+        return self._sums[field]
+
+    def mean(self, field):
+        """Mean hours per day of one field, or NaN for an empty history."""
+        return self.sum(field) / len(self) if len(self) else float('nan')
+
+    def mood_mode(self, default=None):
+        """
+        Most common mood, computed once per history.
+
+        Ties go to the alphabetically first mood, as with Series.mode().
+
+        Args:
+            default (str): Returned when no mood was logged
+
+        Returns:
+            str: The dominant mood
+        """
+        if self._mood_mode is None:
+            moods = self.mood[pd.notna(self.mood)]
+            if len(moods):
+                labels, counts = np.unique(moods.astype(str), return_counts=True)
+                self._mood_mode = str(labels[counts.argmax()])
+            else:
+                self._mood_mode = ''
+        return self._mood_mode or default
+
+    def count_moods(self, *keywords):
+        """Number of days whose mood contains any of the keywords, e.g. ("Peaceful", "Focused")."""
+        return sum(1 for mood in self.mood if isinstance(mood, str) and any(word in mood for word in keywords))
+
+    def latest(self, field):
+        """Value of a field on the most recent day, or None for an empty history."""
+        return getattr(self, field)[-1] if len(self) else None
+
+    def first(self, field):
+        """Value of a field on the earliest day, or None for an empty history."""
+        return getattr(self, field)[0] if len(self) else None
+
+    def memory_usage(self, deep=True):
+        """Bytes held by the arrays, so the table cache can budget for a history."""
+        return sum(getattr(self, field).nbytes for field in ('dates', 'mood') + HOUR_FIELDS)
+
+    def to_frame(self):
+        """
+        The history as the hour DataFrame the charts and exports use.
+
+        Returns:
+            pandas.DataFrame: user_id, date, phone, laptop, tablet,
+            total_screen and mood columns
+        """
+        frame = pd.DataFrame({'date': self.dates})
+        frame.insert(0, 'user_id', self.user_id)
+        for field in HOUR_FIELDS:
+            frame[field] = getattr(self, field).astype('float32')
+        frame['mood'] = self.mood
+        return frame
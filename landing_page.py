@@ -1,7 +1,7 @@
 import streamlit as st
-import pandas as pd
-import hashlib
-import os
+
+from accounts import authenticate_user, create_user
+from records import begin_rerun, get_user_profile
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -11,6 +11,9 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
+# Each table is loaded at most once per rerun
+begin_rerun()
+
 # --- Beautiful Landing Page Styling ---
 st.markdown("""
     <style>
@@ -303,56 +306,6 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# --- Helper Functions ---
-def hash_password(password):
-    """Hash password using SHA-256"""
-    return hashlib.sha256(password.encode()).hexdigest()
-
-def init_users_file():
-    """Initialize users CSV file if it doesn't exist"""
-    if not os.path.exists("users.csv"):
-        df = pd.DataFrame(columns=['user_id', 'username', 'password_hash'])
-        df.to_csv("users.csv", index=False)
-
-def authenticate_user(username, password):
-    """Authenticate user credentials"""
-    if not os.path.exists("users.csv"):
-        return False, None
-    
-    users_df = pd.read_csv("users.csv")
-    password_hash = hash_password(password)
-    
-    user = users_df[(users_df['username'] == username) & (users_df['password_hash'] == password_hash)]
-    
-    if not user.empty:
-        return True, user.iloc[0]['user_id']
-    return False, None
-
-def create_user(username, password):
-    """Create a new user account"""
-    init_users_file()
-    users_df = pd.read_csv("users.csv")
-    
-    # Check if username already exists
-    if username in users_df['username'].values:
-        return False, "Username already exists"
-    
-    # Generate new user ID
-    new_user_id = len(users_df) + 1
-    password_hash = hash_password(password)
-    
-    # Add new user
-    new_user = pd.DataFrame([{
-        'user_id': new_user_id,
-        'username': username,
-        'password_hash': password_hash
-    }])
-    
-    users_df = pd.concat([users_df, new_user], ignore_index=True)
-    users_df.to_csv("users.csv", index=False)
-    
-    return True, new_user_id
-
 # --- Landing Page Content ---
 def show_landing_page():
     """Display the beautiful landing page"""
@@ -516,15 +469,9 @@ if 'user_id' not in st.session_state:
 if st.session_state.user_id:
     # User is logged in, show the main app content
     # Check if user has completed profile setup
-    if not os.path.exists("user_profiles.csv"):
-        # Create profiles file
-        pd.DataFrame(columns=['user_id', 'username', 'sleep_hours', 'eating_habits', 'main_goal', 
-                             'mood_after_screen', 'daily_offline_time', 'onboarding_complete']).to_csv("user_profiles.csv", index=False)
-    
-    profiles_df = pd.read_csv("user_profiles.csv")
-    user_profile = profiles_df[profiles_df['user_id'] == st.session_state.user_id]
+    user_profile = get_user_profile(st.session_state.user_id)
     
-    if user_profile.empty or not user_profile.iloc[0].get('onboarding_complete', False):
+    if not user_profile or not user_profile.get('onboarding_complete', False):
         # Show onboarding
         st.markdown("### 🌿 Welcome! Let's set up your wellness profile")
         st.info("Redirecting to onboarding...")
@@ -0,0 +1,90 @@
+"""
+File locking and atomic writes for the CSV data files.
+
+Many Streamlit sessions (and maintenance scripts) can touch the same files
+at once. Every data file gets a "<file>.lock" sidecar used as a
+reader/writer lock:
+- readers take it shared, so they never block each other
+- writers take it exclusive, so writes to one file (or one partition)
+  are serialized while other files stay independent
+
+Whole-file rewrites go through atomic_write(), which writes a temp file in
+the same directory and swaps it in with os.replace, so readers see either
+the old or the new file and never a half-written one.
+"""
+
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+LOCK_SUFFIX = ".lock"
+
+@contextmanager
+def file_lock(path, shared=False):
+    """
+    Hold the reader/writer lock of a data file.
+
+    Locks are taken on a separate "<path>.lock" file so the data file itself
+    can be replaced while the lock is held. On POSIX each acquisition opens
+    its own file description, so threads of one process contend exactly
+    like separate processes do. Windows has no shared locks; there readers
+    take the lock exclusively as well.
+
+    Args:
+        path (str): The data file to lock
+        shared (bool): True for a reader lock, False for a writer lock
+    """
+    with open(path + LOCK_SUFFIX, 'a+b') as handle:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        else:
+            handle.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.01)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+def atomic_write(path, write, mode='w'):
+    """
+    Replace a file's contents without readers ever seeing a partial file.
+
+    Args:
+        path (str): The file to replace
+        write (callable): Called with the open temp file to fill it
+        mode (str): 'w' for text (UTF-8) or 'wb' for binary output
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        if 'b' in mode:
+            handle = os.fdopen(fd, mode)
+        else:
+            handle = os.fdopen(fd, mode, encoding='utf-8', newline='')
+        with handle:
+            write(handle)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
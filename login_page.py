@@ -1,7 +1,6 @@
 import streamlit as st
-import pandas as pd
-import hashlib
-import os
+
+from accounts import authenticate_user, create_user
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -37,62 +36,6 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# --- Constants ---
-USERS_FILE = "users.csv"
-
-# --- Helper Functions ---
-def init_users_file():
-    """Initialize users.csv if it doesn't exist"""
-    if not os.path.exists(USERS_FILE):
-        df = pd.DataFrame(columns=["user_id", "username", "password_hash"])
-        df.to_csv(USERS_FILE, index=False)
-
-def hash_password(password):
-    """Hash password using SHA256 (simple but secure for demo)"""
-    return hashlib.sha256(password.encode('utf-8')).hexdigest()
-
-def verify_password(password, hashed):
-    """Verify password against hash"""
-    return hashlib.sha256(password.encode('utf-8')).hexdigest() == hashed
-
-def create_user(username, password):
-    """Create new user account"""
-    df = pd.read_csv(USERS_FILE)
-    
-    # Check if username already exists
-    if username in df['username'].values:
-        return False, "Username already exists"
-    
-    # Create new user
-    user_id = len(df) + 1
-    password_hash = hash_password(password)
-    new_user = pd.DataFrame({
-        "user_id": [user_id],
-        "username": [username],
-        "password_hash": [password_hash]
-    })
-    
-    df = pd.concat([df, new_user], ignore_index=True)
-    df.to_csv(USERS_FILE, index=False)
-    return True, user_id
-
-def authenticate_user(username, password):
-    """Authenticate user login"""
-    if not os.path.exists(USERS_FILE):
-        return False, None
-    
-    df = pd.read_csv(USERS_FILE)
-    user_row = df[df['username'] == username]
-    
-    if user_row.empty:
-        return False, None
-    
-    stored_hash = user_row.iloc[0]['password_hash']
-    if verify_password(password, stored_hash):
-        return True, user_row.iloc[0]['user_id']
-    
-    return False, None
-
 # --- Initialize Session State ---
 if 'authenticated' not in st.session_state:
     st.session_state.authenticated = False
@@ -101,9 +44,6 @@ if 'user_id' not in st.session_state:
 if 'username' not in st.session_state:
     st.session_state.username = None
 
-# --- Initialize Files ---
-init_users_file()
-
 # --- Main App Logic ---
 if st.session_state.authenticated:
     # User is logged in → go to landing (app.py)
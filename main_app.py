@@ -1,11 +1,15 @@
 import streamlit as st
-import pandas as pd
 import matplotlib.pyplot as plt
-import hashlib
-import os
+import math
 import random
 from datetime import datetime, timedelta
 
+from accounts import authenticate_user, create_user
+from records import get_user_profile, save_user_profile
+from storage import (begin_rerun, get_entry, get_range, get_user_aggregates, get_user_calendar, get_user_history,
+                     get_user_summary, prefetch_user_data, save_daily_entry)
+from timing import PageTimer, show_timings
+
 # --- Page Configuration ---
 st.set_page_config(
     page_title="🌿 Digital Detox Companion", 
@@ -14,6 +18,11 @@ st.set_page_config(
     initial_sidebar_state="auto"
 )
 
+# Each table is loaded at most once per rerun; start this user's reads in parallel
+timer = PageTimer("main_app")
+begin_rerun()
+prefetch_user_data(st.session_state.get('user_id'), ('profiles', 'screen_time', 'aggregates'))
+
 # --- Beautiful Styling ---
 st.markdown("""
     <style>
@@ -162,150 +171,6 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# --- Helper Functions ---
-def hash_password(password):
-    """Hash password using SHA-256"""
-    return hashlib.sha256(password.encode()).hexdigest()
-
-def init_users_file():
-    """Initialize users CSV file if it doesn't exist"""
-    if not os.path.exists("users.csv"):
-        df = pd.DataFrame(columns=['user_id', 'username', 'password_hash'])
-        df.to_csv("users.csv", index=False)
-
-def authenticate_user(username, password):
-    """Authenticate user credentials"""
-    if not os.path.exists("users.csv"):
-        return False, None
-    
-    users_df = pd.read_csv("users.csv")
-    password_hash = hash_password(password)
-    
-    user = users_df[(users_df['username'] == username) & (users_df['password_hash'] == password_hash)]
-    
-    if not user.empty:
-        return True, user.iloc[0]['user_id']
-    return False, None
-
-def create_user(username, password):
-    """Create a new user account"""
-    init_users_file()
-    users_df = pd.read_csv("users.csv")
-    
-    # Check if username already exists
-    if username in users_df['username'].values:
-        return False, "Username already exists"
-    
-    # Generate new user ID
-    new_user_id = len(users_df) + 1
-    password_hash = hash_password(password)
-    
-    # Add new user
-    new_user = pd.DataFrame([{
-        'user_id': new_user_id,
-        'username': username,
-        'password_hash': password_hash
-    }])
-    
-    users_df = pd.concat([users_df, new_user], ignore_index=True)
-    users_df.to_csv("users.csv", index=False)
-    
-    return True, new_user_id
-
-def get_user_profile(user_id):
-    """Get user profile data"""
-    if not os.path.exists("user_profiles.csv"):
-        return None
-    
-    profiles_df = pd.read_csv("user_profiles.csv")
-    user_profile = profiles_df[profiles_df['user_id'] == user_id]
-    
-    if user_profile.empty:
-        return None
-    
-    return user_profile.iloc[0].to_dict()
-
-def save_user_profile(user_id, username, sleep_hours, eating_habits, main_goal, mood_after_screen, daily_offline_time):
-    """Save user profile data"""
-    if not os.path.exists("user_profiles.csv"):
-        df = pd.DataFrame(columns=['user_id', 'username', 'sleep_hours', 'eating_habits', 'main_goal', 
-                                  'mood_after_screen', 'daily_offline_time', 'onboarding_complete', 'created_date'])
-        df.to_csv("user_profiles.csv", index=False)
-    
-    profiles_df = pd.read_csv("user_profiles.csv")
-    
-    # Check if profile already exists
-    existing_profile = profiles_df[profiles_df['user_id'] == user_id]
-    
-    profile_data = {
-        'user_id': user_id,
-        'username': username,
-        'sleep_hours': sleep_hours,
-        'eating_habits': eating_habits,
-        'main_goal': main_goal,
-        'mood_after_screen': mood_after_screen,
-        'daily_offline_time': daily_offline_time,
-        'onboarding_complete': True,
-        'created_date': datetime.now().strftime("%Y-%m-%d")
-    }
-    
-    if not existing_profile.empty:
-        # Update existing profile
-        profiles_df.loc[profiles_df['user_id'] == user_id, list(profile_data.keys())] = list(profile_data.values())
-    else:
-        # Add new profile
-        new_profile = pd.DataFrame([profile_data])
-        profiles_df = pd.concat([profiles_df, new_profile], ignore_index=True)
-    
-    profiles_df.to_csv("user_profiles.csv", index=False)
-
-def init_screen_time_file():
-    """Initialize the screen time CSV file if it doesn't exist"""
-    file_path = "daily_screen_time.csv"
-    if not os.path.exists(file_path):
-        df = pd.DataFrame(columns=['user_id', 'date', 'phone', 'laptop', 'tablet', 'total_screen', 'mood', 'notes'])
-        df.to_csv(file_path, index=False)
-
-def save_daily_entry(user_id, phone, laptop, tablet, mood, notes=""):
-    """Save a daily screen time entry"""
-    init_screen_time_file()
-    
-    total_screen = phone + laptop + tablet
-    today = datetime.now().strftime("%Y-%m-%d")
-    
-    # Load existing data
-    df = pd.read_csv("daily_screen_time.csv")
-    
-    # Check if entry for today already exists
-    existing_entry = df[(df['user_id'] == user_id) & (df['date'] == today)]
-    
-    if not existing_entry.empty:
-        # Update existing entry
-        df.loc[(df['user_id'] == user_id) & (df['date'] == today), 
-               ['phone', 'laptop', 'tablet', 'total_screen', 'mood', 'notes']] = [phone, laptop, tablet, total_screen, mood, notes]
-    else:
-        # Add new entry
-        new_entry = pd.DataFrame([{
-            'user_id': user_id,
-            'date': today,
-            'phone': phone,
-            'laptop': laptop,
-            'tablet': tablet,
-            'total_screen': total_screen,
-            'mood': mood,
-            'notes': notes
-        }])
-        df = pd.concat([df, new_entry], ignore_index=True)
-    
-    df.to_csv("daily_screen_time.csv", index=False)
-
-def get_user_screen_data(user_id):
-    """Get all screen time data for a specific user"""
-    init_screen_time_file()
-    df = pd.read_csv("daily_screen_time.csv")
-    user_data = df[df['user_id'] == user_id].sort_values('date')
-    return user_data
-
 # --- Constants ---
 WELLNESS_QUOTES = [
     "The best time to plant a tree was 20 years ago. The second best time is now. 🌱",
@@ -511,34 +376,43 @@ def show_dashboard():
     """Show the main dashboard"""
     
     profile = get_user_profile(st.session_state.user_id)
-    user_data = get_user_screen_data(st.session_state.user_id)
+    history = get_user_history(st.session_state.user_id)
+    # All-time figures come from the running aggregates; the summary adds the window and trend figures
+    totals = get_user_aggregates(st.session_state.user_id)
+    summary = get_user_summary(st.session_state.user_id)
+    timer.mark("data")
     
     # Sidebar for daily check-in
     with st.sidebar:
         st.markdown("### 🌿 Daily Wellness Check-in")
         st.markdown(f"*Hello, {st.session_state.username}!* 👋")
         
+        # Past days can be filled in or edited too
+        today = datetime.now().date()
+        entry_day = st.date_input("📅 Day", value=today, max_value=today,
+                                  help="Pick an earlier day to log or edit a missed check-in")
+        is_today = entry_day == today
+        
         with st.form("daily_check_in"):
-            today = datetime.now().strftime("%Y-%m-%d")
+            # Check if this day was already logged
+            existing = get_entry(st.session_state.user_id, entry_day, with_notes=True)
+            has_logged_day = existing is not None
             
-            # Check if already logged today
-            today_entry = user_data[user_data['date'] == today]
-            has_logged_today = not today_entry.empty
-            
-            if has_logged_today:
-                st.success("✅ Already checked in today!")
-                existing = today_entry.iloc[0]
+            if has_logged_day:
+                st.success("✅ Already checked in today!" if is_today else f"✅ Already logged {entry_day:%b %d} - saving replaces it")
                 phone_default = float(existing['phone'])
                 laptop_default = float(existing['laptop'])
                 tablet_default = float(existing['tablet'])
                 mood_default = existing['mood']
+                notes_default = existing['notes']
             else:
                 phone_default = 0.0
                 laptop_default = 0.0
                 tablet_default = 0.0
                 mood_default = MOODS[1]
+                notes_default = ""
             
-            st.markdown("#### ⏰ Screen Time Today")
+            st.markdown("#### ⏰ Screen Time Today" if is_today else f"#### ⏰ Screen Time on {entry_day:%b %d}")
             phone = st.number_input("📱 Phone (hours)", min_value=0.0, max_value=24.0, value=phone_default, step=0.5)
             laptop = st.number_input("💻 Laptop (hours)", min_value=0.0, max_value=24.0, value=laptop_default, step=0.5)
             tablet = st.number_input("📟 Tablet (hours)", min_value=0.0, max_value=24.0, value=tablet_default, step=0.5)
@@ -550,12 +424,14 @@ def show_dashboard():
             mood = st.selectbox("How are you feeling?", MOODS, index=MOODS.index(mood_default) if mood_default in MOODS else 1)
             
             st.markdown("#### 📝 Optional Notes")
-            notes = st.text_area("Any thoughts about today?", placeholder="How did screen time affect you?", height=80)
+            notes = st.text_area("Any thoughts about today?" if is_today else "Any thoughts about that day?",
+                                 value=notes_default, placeholder="How did screen time affect you?", height=80)
             
-            submitted = st.form_submit_button("💾 Save Today's Check-in", use_container_width=True)
+            submitted = st.form_submit_button("💾 Save Today's Check-in" if is_today else f"💾 Save Check-in for {entry_day:%b %d}",
+                                              use_container_width=True)
             
             if submitted:
-                save_daily_entry(st.session_state.user_id, phone, laptop, tablet, mood, notes)
+                save_daily_entry(st.session_state.user_id, phone, laptop, tablet, mood, notes, date=entry_day)
                 st.success("🎉 Check-in saved!")
                 st.rerun()
         
@@ -581,30 +457,29 @@ def show_dashboard():
     """, unsafe_allow_html=True)
     
     # Progress metrics
-    if not user_data.empty:
-        streak_days = len(user_data)
+    if not history.empty:
+        streak_days = get_user_calendar(st.session_state.user_id).current_streak()
         st.markdown(f"### 🔥 Tracking Streak: {streak_days} days 🌱")
         
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            avg_total = user_data['total_screen'].mean()
+            avg_total = totals.mean_hours('total_screen')
             st.metric("📊 Average Screen Time", f"{avg_total:.1f} hrs/day")
         
         with col2:
-            avg_phone = user_data['phone'].mean()
+            avg_phone = totals.mean_hours('phone')
             st.metric("📱 Phone Usage", f"{avg_phone:.1f} hrs/day")
         
         with col3:
-            most_common_mood = user_data['mood'].mode().iloc[0] if not user_data['mood'].mode().empty else "😌 Calm"
+            most_common_mood = totals.dominant_mood(default="😌 Calm")
             mood_emoji = most_common_mood.split()[0] if most_common_mood else "😌"
             st.metric("🎭 Dominant Mood", mood_emoji)
         
         with col4:
-            if len(user_data) >= 2:
-                recent_avg = user_data.tail(3)['total_screen'].mean()
-                older_avg = user_data.head(-3)['total_screen'].mean() if len(user_data) > 3 else recent_avg
-                change = recent_avg - older_avg
+            if len(history) >= 2:
+                # Last 3 calendar days against every day before them
+                change = 0.0 if math.isnan(summary.recent_trend) else summary.recent_trend
                 trend_emoji = "📉" if change < 0 else "📈"
                 st.metric("📈 Recent Trend", f"{change:+.1f} hrs")
             else:
@@ -613,11 +488,11 @@ def show_dashboard():
         st.info("📈 **Start tracking today to see your progress metrics!** Use the sidebar to log your first day.")
     
     # Insights and suggestions
-    if not user_data.empty:
+    if not history.empty:
         st.markdown("---")
         st.markdown("### 🔍 Your Personal Insights 🌟")
         
-        recent_avg = user_data.tail(3)['total_screen'].mean()
+        recent_avg = summary.recent_avg
         
         if recent_avg < 4:
             insight = "🎉 Excellent! You're maintaining healthy screen time levels."
@@ -637,8 +512,8 @@ def show_dashboard():
             "Focused": ["Tackle a creative project", "Read a book", "Learn something new"]
         }
         
-        if len(user_data) > 0:
-            recent_mood = user_data.iloc[-1]['mood']
+        if len(history) > 0:
+            recent_mood = history.latest('mood')
             mood_key = next((key for key in activities.keys() if key in recent_mood), "Focused")
             suggestion = random.choice(activities[mood_key])
             st.success(f"💡 **Suggested activity:** {suggestion}")
@@ -646,13 +521,15 @@ def show_dashboard():
             st.info("🌱 Log your mood in the sidebar to get personalized activity suggestions!")
     
     # Charts (if enough data)
-    if len(user_data) >= 3:
+    if len(history) >= 3:
         st.markdown("---")
         st.markdown("### 📈 Your Screen Time Journey 📊")
         
-        if len(user_data) >= 7:
-            recent_data = user_data.tail(7)
-            
+        week_start = (datetime.now() - timedelta(days=6)).strftime("%Y-%m-%d")
+        recent_data = get_range(st.session_state.user_id, week_start, datetime.now().strftime("%Y-%m-%d"))
+        if len(history) >= 7 and recent_data.empty:
+            st.info("🌿 No check-ins in the last 7 days yet. Log today to see your weekly trend!")
+        elif len(history) >= 7:
             fig, ax = plt.subplots(figsize=(10, 6))
             ax.plot(recent_data['date'], recent_data['phone'], marker='o', label='📱 Phone', linewidth=2, color='#FF6B35')
             ax.plot(recent_data['date'], recent_data['laptop'], marker='s', label='💻 Laptop', linewidth=2, color='#4CAF50')
@@ -670,7 +547,7 @@ def show_dashboard():
             plt.tight_layout()
             st.pyplot(fig)
         else:
-            st.info(f"🔓 **Visual insights unlock after 7 days of tracking!** ({len(user_data)}/7 days complete)")
+            st.info(f"🔓 **Visual insights unlock after 7 days of tracking!** ({len(history)}/7 days complete)")
     
     # 7-Day Challenge
     st.markdown("---")
@@ -687,11 +564,11 @@ def show_dashboard():
     ]
     
     for i, challenge in enumerate(challenges, 1):
-        is_completed = len(user_data) >= i
+        is_completed = len(history) >= i
         status = "✅" if is_completed else "⏳"
         st.markdown(f"{status} {challenge}")
     
-    if len(user_data) >= 7:
+    if len(history) >= 7:
         st.success("🎉 Congratulations! You've completed your first week of digital wellness tracking!")
         st.balloons()
 
@@ -731,3 +608,7 @@ st.markdown("""
     <em>All data is stored locally on your device for complete privacy</em> 🔒
 </div>
 """, unsafe_allow_html=True)
+
+timer.mark("rendered")
+if show_timings():
+    st.caption(timer.summary())
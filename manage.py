@@ -0,0 +1,490 @@
+"""
+Maintenance commands for the Digital Detox Companion data files.
+
+Run from the app directory, for example:
+    python manage.py compact
+    python manage.py partition --partitions 256
+    python manage.py stress --processes 16
+    python manage.py bench-writes --sessions 64
+    python manage.py memory-report --sample 200000
+    python manage.py binary            # or: binary --to-csv
+    python manage.py bench-reads --sample 200000
+    python manage.py repair-ids        # or: repair-ids --dry-run
+    python manage.py dedupe            # or: dedupe --dry-run
+    python manage.py bench-page --sample 200000
+    python manage.py aggregates        # or: aggregates --repair
+"""
+
+import argparse
+import csv
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from functools import partial
+
+import pandas as pd
+
+import binstore
+import records
+import storage
+from cache import table_cache
+from coalescer import DEFAULT_BATCH_MS, DEFAULT_BATCH_SIZE
+from schema import ACHIEVEMENT_SCHEMA, PROFILE_SCHEMA, SCREEN_TIME_SCHEMA, apply_schema, read_table
+from timing import PageTimer, get_page_timings, page_timings
+
+def cmd_compact(args):
+    """Fold write journals back into the main data files."""
+    storage.create_storage(args.backend, args.data_dir).compact()
+    print("✅ Journals compacted")
+
+def cmd_partition(args):
+    """Split daily_screen_time.csv into per-user hash partitions."""
+    rows = storage.partition_screen_time(args.data_dir, args.partitions)
+    print(f"✅ Moved {rows} rows into {args.partitions} partitions under "
+          f"{os.path.join(args.data_dir, storage.SCREEN_TIME_PARTITION_DIR)}")
+
+def cmd_binary(args):
+    """Convert daily_screen_time.csv to the memory-mapped binary format (or back)."""
+    rows = storage.convert_screen_time(args.data_dir, binary=not args.to_csv)
+    target = storage.SCREEN_TIME_FILE if args.to_csv else storage.SCREEN_TIME_BINARY_FILE
+    print(f"✅ Converted {rows} rows to {os.path.join(args.data_dir, target)}")
+
+def cmd_repair_ids(args):
+    """Give users that share a user_id a fresh id from the id sequence."""
+    remapped = storage.create_storage(args.backend, args.data_dir).repair_user_ids(dry_run=args.dry_run)
+    if not remapped:
+        print("✅ No duplicate user ids")
+        return
+    for username, old_id, new_id in remapped:
+        print(f"  {username!r}: {old_id} -> {new_id if new_id is not None else '(dry run)'}")
+    if args.dry_run:
+        print(f"Found {len(remapped)} users sharing an id; run without --dry-run to remap them")
+    else:
+        print(f"✅ Remapped {len(remapped)} users. Their profiles moved with them; screen time, notes and "
+              "achievements logged under a shared id stay with its first holder.")
+
+def cmd_dedupe(args):
+    """Merge screen time and notes rows that share a (user_id, date) key, keeping the latest."""
+    found = storage.create_storage(args.backend, args.data_dir).repair_duplicate_rows(
+        chunk_size=args.chunk_size, dry_run=args.dry_run)
+    if not found:
+        print("✅ One row per user per day")
+        return
+    for path, duplicates in found:
+        print(f"  {path}: {duplicates} duplicate rows")
+    total = sum(duplicates for _, duplicates in found)
+    if args.dry_run:
+        print(f"Found {total} duplicate rows; run without --dry-run to merge them")
+    else:
+        print(f"✅ Merged {total} duplicate rows")
+
+def cmd_aggregates(args):
+    """Rebuild every user's running aggregates from the screen time rows and compare with the stored ones."""
+    found = storage.create_storage(args.backend, args.data_dir).check_aggregates(repair=args.repair)
+    if not found:
+        print("✅ Stored aggregates match the screen time rows")
+        return
+    for user_id, stored, rebuilt in found:
+        print(f"  user {user_id}: stored {stored}, rebuilt {rebuilt}")
+    if args.repair:
+        print(f"✅ Rebuilt the aggregates of {len(found)} users")
+    else:
+        print(f"Found {len(found)} users with stale aggregates; run with --repair to rebuild them")
+
+# --- Stress Test ---
+
+STRESS_START_DATE = date(2000, 1, 1)
+
+def _stress_worker(backend, data_dir, worker, checkins, users):
+    """Sign up users and hammer every write path from one process."""
+    # A tiny threshold makes compactions race with the appends as well
+    storage.JOURNAL_COMPACT_THRESHOLD = 25
+    store = storage.create_storage(backend, data_dir)
+    user_ids = [store.add_user(f"stress-{worker}-{n}", "x" * 64) for n in range(users)]
+    for i in range(checkins):
+        user_id = user_ids[i % users]
+        day = (STRESS_START_DATE + timedelta(days=i)).strftime("%Y-%m-%d")
+        # Rewrite each day: same-length notes are patched in place in the
+        # notes journal, longer ones are appended, so both paths see contention
+        for attempt, note in ((1, "first"), (2, "final" if i % 3 else "final, edited")):
+            store.save_screen_entry({
+                'user_id': user_id, 'date': day,
+                'phone_min': 60 * attempt, 'laptop_min': 60, 'tablet_min': 30,
+                'mood': "😌 Peaceful", 'notes': note,
+            })
+    for user_id in user_ids:
+        store.save_profile({
+            'user_id': user_id, 'username': f"stress-{worker}", 'sleep_hours': "7-8 hours",
+            'eating_habits': "Balanced", 'main_goal': "Reduce screen time",
+            'mood_after_screen': "Neutral", 'daily_offline_time': "1-2 hours",
+            'onboarding_complete': True, 'created_date': "2000-01-01",
+        })
+        store.add_achievement({
+            'user_id': user_id, 'achievement_id': "first_day",
+            'earned_date': "2000-01-01", 'achievement_name': "🌱 Digital Seedling",
+        })
+    return user_ids
+
+def _verify_stress(store, user_ids, checkins, users):
+    """Return a list of problems found after a stress run."""
+    problems = []
+    flat_ids = [user_id for ids in user_ids for user_id in ids]
+    if None in flat_ids or len(set(flat_ids)) != len(flat_ids):
+        problems.append(f"user ids not unique: {sorted(flat_ids, key=str)}")
+    for worker, ids in enumerate(user_ids):
+        for n, user_id in enumerate(ids):
+            found = store.find_user(f"stress-{worker}-{n}")
+            if found is None or int(found['user_id']) != user_id:
+                problems.append(f"user stress-{worker}-{n} resolves to {found}")
+            expected_days = len(range(n, checkins, users))
+            rows = store.get_screen_time(user_id)
+            if len(rows) != expected_days:
+                problems.append(f"user {user_id}: {len(rows)} check-ins, expected {expected_days}")
+            elif not (rows['phone_min'] == 120).all():
+                problems.append(f"user {user_id}: a same-day rewrite was lost")
+            notes = store.get_notes(user_id)
+            if len(notes) != expected_days or not notes['notes'].str.startswith("final").all():
+                problems.append(f"user {user_id}: {len(notes)} final notes, expected {expected_days}")
+            if store.get_profile(user_id) is None:
+                problems.append(f"user {user_id}: profile lost")
+            if len(store.get_achievements(user_id)) != 1:
+                problems.append(f"user {user_id}: {len(store.get_achievements(user_id))} achievements, expected 1")
+            totals = store.get_aggregates(user_id)
+            if totals.days != expected_days:
+                problems.append(f"user {user_id}: aggregates count {totals.days} days")
+            if len(totals.calendar) != expected_days:
+                problems.append(f"user {user_id}: calendar marks {len(totals.calendar)} days")
+    for user_id, stored, rebuilt in store.check_aggregates():
+        problems.append(f"user {user_id}: stored aggregates {stored} differ from the rows {rebuilt}")
+    return problems
+
+def run_stress(backend, data_dir, processes, checkins, users, partitions=0):
+    """
+    Race writer processes on an empty data dir and return what they lost.
+
+    Args:
+        backend (str): "csv" or "sqlite"
+        data_dir (str): Empty directory to write into
+        processes (int): Number of writer processes
+        checkins (int): Days each process checks in (each written twice)
+        users (int): Users each process signs up and spreads its days over
+        partitions (int): Screen time partitions, or 0 for the single-file layout
+
+    Returns:
+        list: Problems found before and after compaction, empty if nothing was lost
+    """
+    if partitions:
+        storage.partition_screen_time(data_dir, partitions)
+    # Create the schema / files once before the workers race on them
+    storage.create_storage(backend, data_dir)
+    jobs = [(backend, data_dir, worker, checkins, users) for worker in range(processes)]
+    with multiprocessing.Pool(processes) as pool:
+        user_ids = pool.starmap(_stress_worker, jobs)
+
+    problems = []
+    for phase in ("before compaction", "after compaction"):
+        table_cache.clear()
+        store = storage.create_storage(backend, data_dir)
+        found = _verify_stress(store, user_ids, checkins, users)
+        problems.extend(f"{phase}: {problem}" for problem in found)
+        store.compact()
+    return problems
+
+def cmd_stress(args):
+    """Run concurrent writer processes against a scratch data dir and check nothing was lost."""
+    backend = (args.backend or os.environ.get("DETOX_STORAGE", "csv")).lower()
+    data_dir = tempfile.mkdtemp(prefix="detox-stress-")
+    # Keep the SQLite database inside the scratch dir too
+    os.environ.pop("DETOX_DB_PATH", None)
+    try:
+        problems = run_stress(backend, data_dir, args.processes, args.checkins, args.users, args.partitions)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    writes = args.processes * args.checkins * 2
+    print(f"Wrote {writes} check-ins from {args.processes} processes ({backend} backend)")
+    if problems:
+        for problem in problems[:20]:
+            print(f"❌ {problem}")
+        sys.exit(1)
+    print("✅ No lost check-ins, profiles, achievements or duplicate user ids")
+
+# --- Write Batching Benchmark ---
+
+def _run_sessions(sessions, checkins):
+    """Save check-ins from concurrent sessions and return the elapsed seconds."""
+    def session(number):
+        for i in range(checkins):
+            # Every check-in belongs to a different user, like an evening rush
+            storage.save_daily_entry(i * sessions + number + 1, 2.5, 3.0, 0.5, "😌 Peaceful", "bench")
+
+    threads = [threading.Thread(target=session, args=(n,)) for n in range(sessions)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started
+
+def cmd_bench_writes(args):
+    """Compare check-in throughput with and without group-commit batching."""
+    backend = (args.backend or os.environ.get("DETOX_STORAGE", "csv")).lower()
+    os.environ.pop("DETOX_DB_PATH", None)
+    writes = args.sessions * args.checkins
+    print(f"{writes} check-ins from {args.sessions} sessions ({backend} backend)")
+    for label, batch_ms in (("unbatched", 0), (f"batched every {args.batch_ms:g} ms", args.batch_ms)):
+        data_dir = tempfile.mkdtemp(prefix="detox-bench-")
+        os.environ["DETOX_BATCH_MS"] = str(batch_ms)
+        os.environ["DETOX_BATCH_SIZE"] = str(args.batch_size)
+        try:
+            store = storage.create_storage(backend, data_dir)
+            storage.set_storage(store)
+            elapsed = _run_sessions(args.sessions, args.checkins)
+            coalescer = storage.get_coalescer()
+            batches = f", {coalescer.stats()['avg_batch']:.1f} records per batch" if coalescer else ""
+            print(f"  {label:<24} {writes / elapsed:8.0f} writes/s{batches}")
+            # Waits for any background compaction before the dir is removed
+            store.compact()
+        finally:
+            storage.set_storage(None)
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+# --- Memory Report ---
+
+SAMPLE_MOODS = ["😌 Peaceful", "🎯 Focused", "😴 Tired", "😰 Stressed",
+                "😊 Happy", "🤔 Contemplative", "😔 Down", "⚡ Energetic"]
+
+def _write_sample(data_dir, rows):
+    """Write synthetic screen time, profile and achievement CSVs for the report."""
+    rng = random.Random(42)
+    users = max(1, rows // 60)
+
+    def write(filename, columns, records):
+        with open(os.path.join(data_dir, filename), 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(records)
+
+    def day(i):
+        return (STRESS_START_DATE + timedelta(days=i // users)).strftime("%Y-%m-%d")
+
+    def screen_rows():
+        for i in range(rows):
+            minutes = [30 * rng.randint(0, 16) for _ in range(3)]
+            yield [i % users + 1, day(i), *minutes, rng.choice(SAMPLE_MOODS)]
+
+    write(storage.SCREEN_TIME_FILE, storage.SCREEN_TIME_COLUMNS, screen_rows())
+    write(storage.NOTES_FILE, storage.NOTE_COLUMNS, (
+        [i % users + 1, day(i), "Long day at work"] for i in range(rows) if rng.random() < 0.25))
+    write(records.PROFILES_FILE, records.PROFILE_COLUMNS, (
+        [user_id, f"user{user_id}", rng.choice(["6-7 hours", "7-8 hours", "8-9 hours"]),
+         rng.choice(["Balanced", "Irregular"]), rng.choice(["Better sleep quality", "Reduce screen time"]),
+         rng.choice(["Tired and drained", "Neutral"]), rng.choice(["30-60 minutes", "1-2 hours"]),
+         True, "2000-01-01"]
+        for user_id in range(1, users + 1)))
+    write(storage.ACHIEVEMENTS_FILE, storage.ACHIEVEMENT_COLUMNS, (
+        [user_id, "first_day", "2000-01-01", "🌱 Digital Seedling"] for user_id in range(1, users + 1)))
+
+def _measure(paths, parse):
+    """Parse files with one strategy; return (frame, seconds)."""
+    started = time.perf_counter()
+    df = pd.concat([parse(path) for path in paths], ignore_index=True)
+    return df, time.perf_counter() - started
+
+def cmd_memory_report(args):
+    """Compare parse time and memory of type-inferred vs schema-typed tables."""
+    data_dir = args.data_dir
+    scratch = None
+    if args.sample:
+        data_dir = scratch = tempfile.mkdtemp(prefix="detox-memory-")
+        _write_sample(data_dir, args.sample)
+    try:
+        partitions = storage.read_partition_count(data_dir)
+        if partitions:
+            screen_files = [storage.partition_path(data_dir, bucket) for bucket in range(partitions)]
+        else:
+            screen_files = [os.path.join(data_dir, storage.SCREEN_TIME_FILE)]
+        tables = [
+            ("screen time", screen_files, SCREEN_TIME_SCHEMA),
+            ("profiles", [os.path.join(data_dir, records.PROFILES_FILE)], PROFILE_SCHEMA),
+            ("achievements", [os.path.join(data_dir, storage.ACHIEVEMENTS_FILE)], ACHIEVEMENT_SCHEMA),
+        ]
+        print(f"{'table':<14}{'rows':>10}{'inferred':>12}{'typed':>12}{'saving':>9}{'parse':>18}")
+        for name, paths, schema in tables:
+            paths = [path for path in paths if os.path.exists(path)]
+            if not paths:
+                continue
+            inferred, inferred_time = _measure(paths, pd.read_csv)
+            typed, typed_time = _measure(paths, lambda path: read_table(path, schema))
+            typed = apply_schema(typed, schema)
+            before = inferred.memory_usage(deep=True).sum()
+            after = typed.memory_usage(deep=True).sum()
+            print(f"{name:<14}{len(typed):>10}{before / 1e6:>10.2f}MB{after / 1e6:>10.2f}MB"
+                  f"{before / max(after, 1):>8.1f}x"
+                  f"{inferred_time * 1000:>8.0f} -> {typed_time * 1000:.0f} ms")
+    finally:
+        if scratch:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+# --- Read Benchmark ---
+
+def _time_lookups(user_ids, lookup):
+    """Average milliseconds per call of lookup(user_id)."""
+    started = time.perf_counter()
+    for user_id in user_ids:
+        lookup(user_id)
+    return (time.perf_counter() - started) * 1000 / len(user_ids)
+
+def cmd_bench_reads(args):
+    """Compare per-user screen time reads: pd.read_csv, CSV offset index and binary mmap, full and 7-day."""
+    data_dir = tempfile.mkdtemp(prefix="detox-reads-")
+    try:
+        _write_sample(data_dir, args.sample)
+        csv_path = os.path.join(data_dir, storage.SCREEN_TIME_FILE)
+        users = max(1, args.sample // 60)
+        user_ids = random.Random(7).sample(range(1, users + 1), min(args.lookups, users))
+        key = ['user_id', 'date']
+
+        def read_csv_filter(user_id):
+            df = pd.read_csv(csv_path)
+            return df[df['user_id'] == user_id]
+
+        csv_table = storage.JournaledCSV(csv_path, storage.SCREEN_TIME_COLUMNS, key, storage.SCREEN_TIME_SCHEMA)
+        # The dashboard's weekly chart only needs the last 7 days of a history
+        last_day = STRESS_START_DATE + timedelta(days=(args.sample - 1) // users)
+        week = ((last_day - timedelta(days=6)).strftime("%Y-%m-%d"), last_day.strftime("%Y-%m-%d"))
+        results = [("pd.read_csv + filter", _time_lookups(user_ids[:5], read_csv_filter)),
+                   ("CSV offset index", _time_lookups(user_ids, csv_table._load)),
+                   ("CSV offset index, 7 days", _time_lookups(user_ids, lambda user_id: csv_table._load(user_id, *week)))]
+
+        storage.convert_screen_time(data_dir)
+        binary_path = os.path.join(data_dir, storage.SCREEN_TIME_BINARY_FILE)
+        binary_table = storage.BinaryScreenTable(binary_path, storage.SCREEN_TIME_COLUMNS, key,
+                                                 storage.SCREEN_TIME_SCHEMA)
+        mapped = binstore.open_records(binary_path)
+        results += [("binary mmap (DataFrame)", _time_lookups(user_ids, binary_table._load)),
+                    ("binary mmap, 7 days", _time_lookups(user_ids, lambda user_id: binary_table._load(user_id, *week))),
+                    ("binary mmap (slice only)",
+                     _time_lookups(user_ids, partial(binstore.user_slice, mapped)))]
+
+        csv_size = os.path.getsize(csv_path + ".migrated")
+        print(f"{args.sample} check-ins, {users} users; CSV {csv_size / 1e6:.1f} MB, "
+              f"binary {os.path.getsize(binary_path) / 1e6:.1f} MB "
+              f"({binstore.RECORD_DTYPE.itemsize} bytes/row)")
+        for label, ms in results:
+            print(f"  {label:<26} {ms:10.3f} ms per user")
+        del mapped
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+# --- Page Load Benchmark ---
+
+def _load_dashboard(user_id, label, prefetch):
+    """Load what the dashboard needs for one user in a fresh rerun, timed like a page."""
+    # Start cold, as after another session's write
+    table_cache.clear()
+    timer = PageTimer(label)
+    storage.begin_rerun()
+    if prefetch:
+        storage.prefetch_user_data(user_id)
+    records.get_user_profile(user_id)
+    storage.get_user_screen_data(user_id)
+    storage.get_user_achievements(user_id)
+    timer.mark("data")
+
+def cmd_bench_page(args):
+    """Compare the dashboard's data wait with sequential reads and with parallel prefetch."""
+    data_dir = tempfile.mkdtemp(prefix="detox-page-")
+    try:
+        _write_sample(data_dir, args.sample)
+        storage.set_storage(storage.create_storage(args.backend, data_dir))
+        users = max(1, args.sample // 60)
+        user_ids = random.Random(7).sample(range(1, users + 1), min(args.lookups, users))
+        # Build the offset indexes and start the pool before timing anything
+        _load_dashboard(user_ids[0], "warm-up", prefetch=True)
+        page_timings.clear()
+        for user_id in user_ids:
+            _load_dashboard(user_id, "sequential", prefetch=False)
+            _load_dashboard(user_id, "prefetch", prefetch=True)
+        timings = get_page_timings()
+        print(f"{args.sample} check-ins, {users} users, {len(user_ids)} cold page loads each")
+        for label in ("sequential", "prefetch"):
+            data = timings[label]["data"]
+            print(f"  {label:<12} data ready after {data['mean_ms']:8.2f} ms (max {data['max_ms']:.2f} ms)")
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Digital Detox Companion data maintenance")
+    parser.add_argument("--data-dir", default=os.environ.get("DETOX_DATA_DIR", "."),
+                        help="Directory holding the data files")
+    parser.add_argument("--backend", default=None, help="Storage backend (csv or sqlite)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    compact = commands.add_parser("compact", help=cmd_compact.__doc__)
+    compact.set_defaults(func=cmd_compact)
+
+    partition = commands.add_parser("partition", help=cmd_partition.__doc__)
+    partition.add_argument("--partitions", type=int, default=storage.SCREEN_TIME_PARTITIONS,
+                           help="Number of user_id hash buckets")
+    partition.set_defaults(func=cmd_partition)
+
+    stress = commands.add_parser("stress", help=cmd_stress.__doc__)
+    stress.add_argument("--processes", type=int, default=8, help="Concurrent writer processes")
+    stress.add_argument("--checkins", type=int, default=200, help="Distinct check-in days per process")
+    stress.add_argument("--users", type=int, default=4, help="New users signed up per process")
+    stress.add_argument("--partitions", type=int, default=0,
+                        help="Partition the screen time table first (0 keeps a single file)")
+    stress.set_defaults(func=cmd_stress)
+
+    bench = commands.add_parser("bench-writes", help=cmd_bench_writes.__doc__)
+    bench.add_argument("--sessions", type=int, default=64, help="Concurrent sessions saving check-ins")
+    bench.add_argument("--checkins", type=int, default=100, help="Check-ins saved per session")
+    bench.add_argument("--batch-ms", type=float, default=DEFAULT_BATCH_MS, help="Batch window in milliseconds")
+    bench.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Records that trigger an early flush")
+    bench.set_defaults(func=cmd_bench_writes)
+
+    memory = commands.add_parser("memory-report", help=cmd_memory_report.__doc__)
+    memory.add_argument("--sample", type=int, default=0,
+                        help="Measure a synthetic table of this many check-ins instead of --data-dir")
+    memory.set_defaults(func=cmd_memory_report)
+
+    binary = commands.add_parser("binary", help=cmd_binary.__doc__)
+    binary.add_argument("--to-csv", action="store_true", help="Convert the binary table back to CSV")
+    binary.set_defaults(func=cmd_binary)
+
+    bench_reads = commands.add_parser("bench-reads", help=cmd_bench_reads.__doc__)
+    bench_reads.add_argument("--sample", type=int, default=200000, help="Synthetic check-ins to generate")
+    bench_reads.add_argument("--lookups", type=int, default=200, help="Users to read")
+    bench_reads.set_defaults(func=cmd_bench_reads)
+
+    repair_ids = commands.add_parser("repair-ids", help=cmd_repair_ids.__doc__)
+    repair_ids.add_argument("--dry-run", action="store_true", help="Only list users that share an id")
+    repair_ids.set_defaults(func=cmd_repair_ids)
+
+    dedupe = commands.add_parser("dedupe", help=cmd_dedupe.__doc__)
+    dedupe.add_argument("--chunk-size", type=int, default=storage.DEDUPE_CHUNK_ROWS,
+                        help="Rows scanned at a time")
+    dedupe.add_argument("--dry-run", action="store_true", help="Only count the duplicates")
+    dedupe.set_defaults(func=cmd_dedupe)
+
+    aggregates = commands.add_parser("aggregates", help=cmd_aggregates.__doc__)
+    aggregates.add_argument("--repair", action="store_true", help="Replace stale aggregates with the rebuilt ones")
+    aggregates.set_defaults(func=cmd_aggregates)
+
+    bench_page = commands.add_parser("bench-page", help=cmd_bench_page.__doc__)
+    bench_page.add_argument("--sample", type=int, default=200000, help="Synthetic check-ins to generate")
+    bench_page.add_argument("--lookups", type=int, default=50, help="Page loads per mode")
+    bench_page.set_defaults(func=cmd_bench_page)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
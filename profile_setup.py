@@ -1,6 +1,6 @@
 import streamlit as st
-import pandas as pd
-import os
+
+from records import begin_rerun, get_user_profile, save_user_profile
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -9,6 +9,9 @@ st.set_page_config(
     layout="centered"
 )
 
+# Each table is loaded at most once per rerun
+begin_rerun()
+
 # --- Enhanced Styling with Nature Theme ---
 st.markdown("""
     <style>
@@ -81,62 +84,11 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# --- Constants ---
-PROFILES_FILE = "user_profiles.csv"
-
-# --- Helper Functions ---
-def init_profiles_file():
-    """Initialize user_profiles.csv if it doesn't exist"""
-    if not os.path.exists(PROFILES_FILE):
-        df = pd.DataFrame(columns=[
-            "user_id", "username", "sleep_hours", "eating_habits", "main_goal", 
-            "mood_after_screen", "daily_offline_time", "onboarding_complete"
-        ])
-        df.to_csv(PROFILES_FILE, index=False)
-
-def get_user_profile(user_id):
-    """Get user profile if exists"""
-    if not os.path.exists(PROFILES_FILE):
-        return None
-    
-    df = pd.read_csv(PROFILES_FILE)
-    user_profile = df[df['user_id'] == user_id]
-    
-    if user_profile.empty:
-        return None
-    
-    return user_profile.iloc[0].to_dict()
-
-def save_user_profile(user_id, username, sleep_hours, eating_habits, main_goal, mood_after_screen, daily_offline_time):
-    """Save or update user profile"""
-    df = pd.read_csv(PROFILES_FILE)
-    
-    # Remove existing profile for this user
-    df = df[df['user_id'] != user_id]
-    
-    # Add new profile
-    new_profile = pd.DataFrame({
-        "user_id": [user_id],
-        "username": [username],
-        "sleep_hours": [sleep_hours],
-        "eating_habits": [eating_habits],
-        "main_goal": [main_goal],
-        "mood_after_screen": [mood_after_screen],
-        "daily_offline_time": [daily_offline_time],
-        "onboarding_complete": [True]
-    })
-    
-    df = pd.concat([df, new_profile], ignore_index=True)
-    df.to_csv(PROFILES_FILE, index=False)
-
 # --- Check Authentication ---
 if 'authenticated' not in st.session_state or not st.session_state.authenticated:
     st.error("🔒 Please login first to access your wellness journey")
     st.switch_page("login_page.py")
 
-# --- Initialize Files ---
-init_profiles_file()
-
 # --- Check if Profile Already Exists ---
 existing_profile = get_user_profile(st.session_state.user_id)
 
@@ -0,0 +1,613 @@
+"""
+Lightweight record store for the small account tables: users and profiles.
+
+Logging in, routing and onboarding only ever look up one user or one
+profile. Building a DataFrame for that costs more than the lookup itself,
+so these tables are read with the stdlib csv module (or plain sqlite3
+queries) and handed out as plain dicts, and this module doesn't import
+pandas at all. Pages that only need accounts and profiles (login, landing,
+routing, onboarding) import from here; pandas is loaded by storage.py for
+the analytics pages.
+
+The storage backends in storage.py extend CSVRecords and SQLiteRecords, so
+both paths share one implementation. get_records() returns the storage
+backend once storage.py has created one, and a standalone record store
+before that.
+"""
+
+import csv
+import io
+import os
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime
+
+from cache import file_stamp, table_cache
+from locks import atomic_write, file_lock
+
+USERS_FILE = "users.csv"
+PROFILES_FILE = "user_profiles.csv"
+DB_FILE = "digital_detox.db"
+
+USER_COLUMNS = ['user_id', 'username', 'password_hash']
+PROFILE_COLUMNS = ['user_id', 'username', 'sleep_hours', 'eating_habits', 'main_goal',
+                   'mood_after_screen', 'daily_offline_time', 'onboarding_complete', 'created_date']
+
+SEQUENCE_SUFFIX = ".seq"
+
+# --- User IDs ---
+
+class IdSequence:
+    """
+    Persistent counter that hands out user ids.
+
+    "<users file>.seq" holds the last id given out as a fixed-width number,
+    so an allocation is a locked read and an in-place rewrite of a few
+    bytes, however many users exist. Ids only ever grow, so one is never
+    handed out twice, even after rows are removed from the user table.
+    """
+
+    WIDTH = 20
+
+    def __init__(self, path):
+        self.path = path
+
+    def allocate(self, floor=0):
+        """
+        Hand out the next id.
+
+        Args:
+            floor (int): Highest id known to be in use; the sequence skips
+                past it when ids were created without the sequence
+
+        Returns:
+            int: The new id
+        """
+        with file_lock(self.path):
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            with os.fdopen(fd, 'r+b') as f:
+                try:
+                    last = int(f.read().strip() or 0)
+                except ValueError:
+                    # A torn write; the floor still keeps ids unique
+                    last = 0
+                user_id = max(last, floor) + 1
+                f.seek(0)
+                f.write(f"{user_id:0{self.WIDTH}d}\n".encode('ascii'))
+                f.flush()
+                os.fsync(f.fileno())
+        return user_id
+
+
+class UsernameIndex:
+    """
+    In-memory hash index from username to (user_id, password_hash).
+
+    users.csv is only ever appended to, so the index remembers how many
+    bytes it has consumed and parses just the new tail when another process
+    adds users. Signups in this process append one line and update the
+    index directly, so neither login nor signup scans the user table. New
+    ids come from an IdSequence rather than the row count.
+    """
+
+    def __init__(self, path, sequence):
+        self.path = path
+        self.sequence = sequence
+        self._lock = threading.Lock()
+        self._reset(None)
+
+    def _reset(self, identity):
+        self._users = {}
+        self._max_id = 0
+        self._offset = 0
+        self._identity = identity
+
+    def _refresh(self):
+        try:
+            info = os.stat(self.path)
+        except FileNotFoundError:
+            self._reset(None)
+            return
+        identity = (info.st_dev, info.st_ino)
+        if identity != self._identity or info.st_size < self._offset:
+            # The file was replaced or rewritten; start over
+            self._reset(identity)
+        if info.st_size == self._offset:
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            tail = f.read()
+        end = tail.rfind(b'\n') + 1
+        for row in csv.reader(io.StringIO(tail[:end].decode('utf-8'))):
+            if len(row) < 3 or row[0] == 'user_id':
+                continue
+            user_id = int(float(row[0]))
+            self._max_id = max(self._max_id, user_id)
+            self._users.setdefault(row[1], (user_id, row[2]))
+        self._offset += end
+
+    def lookup(self, username):
+        """
+        Find a user by name.
+
+        Args:
+            username (str): The username to look up
+
+        Returns:
+            dict: user_id, username and password_hash, or None if unknown
+        """
+        with self._lock, file_lock(self.path, shared=True):
+            self._refresh()
+            entry = self._users.get(username)
+        if entry is None:
+            return None
+        return {'user_id': entry[0], 'username': username, 'password_hash': entry[1]}
+
+    def add(self, username, password_hash):
+        """
+        Append a new user unless the username is taken.
+
+        Args:
+            username (str): The new username
+            password_hash (str): SHA-256 hash of the password
+
+        Returns:
+            int: The new user_id, or None if the username already exists
+        """
+        with self._lock, file_lock(self.path):
+            self._refresh()
+            if username in self._users:
+                return None
+            user_id = self.sequence.allocate(self._max_id)
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            if not self._offset:
+                writer.writerow(USER_COLUMNS)
+            writer.writerow([user_id, username, password_hash])
+            data = buffer.getvalue().encode('utf-8')
+            with open(self.path, 'ab') as f:
+                f.write(data)
+            self._refresh()
+        return user_id
+
+# --- Profiles ---
+
+def _parse_flag(value):
+    return str(value).strip().lower() in ('true', '1', 'yes')
+
+def _profile_from_row(row):
+    """Turn a profiles.csv row (a dict of strings) into a profile dict."""
+    profile = {column: (row.get(column) or None) for column in PROFILE_COLUMNS}
+    profile['user_id'] = int(float(profile['user_id']))
+    profile['onboarding_complete'] = _parse_flag(profile['onboarding_complete'])
+    return profile
+
+class ProfileTable:
+    """
+    user_profiles.csv as a dict from user_id to profile.
+
+    The parsed dict is kept in the process-wide table cache and revalidated
+    against the file's mtime and size, so a lookup is a stat and a dict
+    get. Saves rewrite the file under its writer lock; it holds one short
+    row per user, so that stays cheap.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def _load(self):
+        with file_lock(self.path, shared=True):
+            try:
+                with open(self.path, encoding='utf-8', newline='') as f:
+                    rows = list(csv.DictReader(f))
+            except FileNotFoundError:
+                return {}
+        return {profile['user_id']: profile
+                for profile in map(_profile_from_row, rows) if profile['user_id'] is not None}
+
+    def _profiles(self):
+        return table_cache.get(('profiles', self.path), file_stamp(self.path), self._load)
+
+    def get(self, user_id):
+        """
+        Look up one profile.
+
+        Args:
+            user_id (int): The user's ID
+
+        Returns:
+            dict: The profile, or None if the user hasn't onboarded
+        """
+        profile = self._profiles().get(int(user_id))
+        return dict(profile) if profile is not None else None
+
+    def _rewrite(self, change):
+        """Apply change(rows) to the file's rows (lists of strings, header first) and write it back."""
+        with file_lock(self.path):
+            try:
+                with open(self.path, encoding='utf-8', newline='') as f:
+                    rows = list(csv.reader(f))
+            except FileNotFoundError:
+                rows = []
+            header = rows[0] if rows else PROFILE_COLUMNS
+            # Write the full set of columns whatever the old file had
+            columns = header + [c for c in PROFILE_COLUMNS if c not in header]
+            records = [dict(zip(header, row)) for row in rows[1:] if row]
+            if change(records) is False:
+                return
+            atomic_write(self.path, lambda f: csv.DictWriter(f, columns, extrasaction='ignore',
+                                                             lineterminator='\n').writerows(
+                [dict(zip(columns, columns))] + records))
+        table_cache.invalidate(('profiles', self.path))
+
+    def save(self, profiles):
+        """
+        Insert or update profiles in one rewrite.
+
+        Args:
+            profiles (list): Profile dicts; columns they leave out keep their stored values
+        """
+        def upsert(records):
+            positions = {}
+            for i, record in enumerate(records):
+                try:
+                    positions[int(float(record['user_id']))] = i
+                except (KeyError, ValueError):
+                    continue
+            for profile in profiles:
+                values = {c: '' if v is None else str(v) for c, v in profile.items() if c in PROFILE_COLUMNS}
+                user_id = int(profile['user_id'])
+                if user_id in positions:
+                    records[positions[user_id]].update(values)
+                else:
+                    positions[user_id] = len(records)
+                    records.append(values)
+
+        self._rewrite(upsert)
+
+    def remap_ids(self, remapped):
+        """
+        Move profiles to new user ids, matching each on (old_id, username).
+
+        Args:
+            remapped (list): (username, old_id, new_id) triples
+        """
+        moves = {(str(old_id), username): str(new_id) for username, old_id, new_id in remapped}
+
+        def remap(records):
+            if not records:
+                return False
+            for record in records:
+                key = (str(int(float(record['user_id']))), record.get('username'))
+                if key in moves:
+                    record['user_id'] = moves[key]
+
+        self._rewrite(remap)
+
+# --- Record Stores ---
+
+class CSVRecords:
+    """Users and profiles in users.csv and user_profiles.csv."""
+
+    def __init__(self, data_dir="."):
+        self.data_dir = data_dir
+        self.users = UsernameIndex(self._path(USERS_FILE), IdSequence(self._path(USERS_FILE) + SEQUENCE_SUFFIX))
+        self.profiles = ProfileTable(self._path(PROFILES_FILE))
+
+    def _path(self, filename):
+        return os.path.join(self.data_dir, filename)
+
+    def find_user(self, username):
+        return self.users.lookup(username)
+
+    def add_user(self, username, password_hash):
+        return self.users.add(username, password_hash)
+
+    def get_profile(self, user_id):
+        return self.profiles.get(user_id)
+
+    def save_profile(self, profile):
+        self.save_profiles([profile])
+
+    def save_profiles(self, profiles):
+        self.profiles.save(profiles)
+
+
+class SQLiteRecords:
+    """Users and profiles in the users and user_profiles tables of the SQLite database."""
+
+    # storage.SQLiteBackend adds the tracking tables to these
+    RECORD_SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT NOT NULL UNIQUE,
+            password_hash TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS id_sequences (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS user_profiles (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT,
+            sleep_hours TEXT,
+            eating_habits TEXT,
+            main_goal TEXT,
+            mood_after_screen TEXT,
+            daily_offline_time TEXT,
+            onboarding_complete INTEGER,
+            created_date TEXT
+        );
+    """
+
+    # user_version of a new database whose tracking tables are still to be imported from CSV
+    TRACKING_IMPORT_PENDING = 1
+
+    def __init__(self, db_path=DB_FILE):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def create(self, data_dir):
+        """
+        Create the database from a CSV deployment unless it already exists.
+
+        Users, profiles and the user id sequence are copied from the CSV
+        files in data_dir. The tracking tables need pandas, so they are left
+        to storage.SQLiteBackend, which imports them the first time it opens
+        a database marked TRACKING_IMPORT_PENDING. The database is built in a
+        temp file and moved into place, so no process sees it half-made.
+
+        Args:
+            data_dir (str): Directory holding the CSV files
+
+        Returns:
+            bool: True if the database was created
+        """
+        if os.path.exists(self.db_path):
+            return False
+        with file_lock(self.db_path):
+            if os.path.exists(self.db_path):
+                return False
+            directory = os.path.dirname(os.path.abspath(self.db_path))
+            fd, temp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(self.db_path) + ".",
+                                             suffix=".tmp")
+            os.close(fd)
+            try:
+                conn = sqlite3.connect(temp_path)
+                try:
+                    conn.executescript(self.RECORD_SCHEMA)
+                    with conn:
+                        self._import_csv_records(conn, data_dir)
+                        conn.execute(f"PRAGMA user_version = {self.TRACKING_IMPORT_PENDING}")
+                finally:
+                    conn.close()
+                os.replace(temp_path, self.db_path)
+            except BaseException:
+                os.remove(temp_path)
+                raise
+        return True
+
+    def _import_csv_records(self, conn, data_dir):
+        """Copy users.csv, user_profiles.csv and the user id sequence into the database."""
+        try:
+            with open(os.path.join(data_dir, USERS_FILE), encoding='utf-8', newline='') as f:
+                users = [(int(float(row[0])), row[1], row[2]) for row in csv.reader(f)
+                         if len(row) >= 3 and row[0] and row[0] != 'user_id']
+        except FileNotFoundError:
+            users = []
+        conn.executemany("INSERT OR IGNORE INTO users (user_id, username, password_hash) VALUES (?, ?, ?)", users)
+        try:
+            with open(os.path.join(data_dir, PROFILES_FILE), encoding='utf-8', newline='') as f:
+                profiles = [_profile_from_row(row) for row in csv.DictReader(f) if row.get('user_id')]
+        except FileNotFoundError:
+            profiles = []
+        conn.executemany(
+            f"INSERT OR IGNORE INTO user_profiles ({', '.join(PROFILE_COLUMNS)}) "
+            f"VALUES ({', '.join('?' for _ in PROFILE_COLUMNS)})",
+            [[int(p[c]) if c == 'onboarding_complete' else p[c] for c in PROFILE_COLUMNS] for p in profiles],
+        )
+        # Ids handed out to users that were removed since stay retired
+        try:
+            with open(os.path.join(data_dir, USERS_FILE + SEQUENCE_SUFFIX), encoding='ascii') as f:
+                last_id = int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            last_id = 0
+        conn.execute("INSERT OR REPLACE INTO id_sequences (name, value) VALUES ('users', ?)", (last_id,))
+
+    def _connect(self):
+        """Return this thread's connection (sqlite3 connections are per thread)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _stamp(self):
+        """Validation stamp that changes whenever any connection commits."""
+        return file_stamp(self.db_path, self.db_path + "-wal")
+
+    def _cached(self, table, user_id, loader):
+        return table_cache.get(('sqlite', self.db_path, table, int(user_id)), self._stamp(), loader)
+
+    def _invalidate(self, table, user_id):
+        table_cache.invalidate(('sqlite', self.db_path, table, int(user_id)))
+
+    def find_user(self, username):
+        row = self._connect().execute(
+            "SELECT user_id, username, password_hash FROM users WHERE username = ?", (username,)
+        ).fetchone()
+        return dict(row) if row is not None else None
+
+    def add_user(self, username, password_hash):
+        conn = self._connect()
+        try:
+            with conn:
+                # Like IdSequence: ids keep growing even after the highest user row is deleted
+                conn.execute("INSERT OR IGNORE INTO id_sequences (name, value) VALUES ('users', 0)")
+                conn.execute(
+                    "UPDATE id_sequences SET value = MAX(value, (SELECT COALESCE(MAX(user_id), 0) FROM users)) + 1 "
+                    "WHERE name = 'users'"
+                )
+                user_id = conn.execute("SELECT value FROM id_sequences WHERE name = 'users'").fetchone()[0]
+                conn.execute(
+                    "INSERT INTO users (user_id, username, password_hash) VALUES (?, ?, ?)",
+                    (user_id, username, password_hash),
+                )
+        except sqlite3.IntegrityError:
+            return None
+        return user_id
+
+    def get_profile(self, user_id):
+        def load():
+            row = self._connect().execute(
+                "SELECT * FROM user_profiles WHERE user_id = ?", (int(user_id),)
+            ).fetchone()
+            if row is None:
+                return None
+            profile = dict(row)
+            profile['onboarding_complete'] = bool(profile['onboarding_complete'])
+            return profile
+
+        profile = self._cached('user_profiles', user_id, load)
+        return dict(profile) if profile is not None else None
+
+    def save_profile(self, profile):
+        self.save_profiles([profile])
+
+    def save_profiles(self, profiles):
+        conn = self._connect()
+        with conn:
+            for profile in profiles:
+                columns = [c for c in PROFILE_COLUMNS if c in profile]
+                values = [int(v) if c == 'user_id' else v for c, v in ((c, profile[c]) for c in columns)]
+                # Like the CSV upsert, columns the profile leaves out keep their stored values
+                updates = ", ".join(f"{c} = excluded.{c}" for c in columns if c != 'user_id')
+                conn.execute(
+                    f"INSERT INTO user_profiles ({', '.join(columns)}) "
+                    f"VALUES ({', '.join('?' for _ in columns)}) "
+                    f"ON CONFLICT(user_id) DO {f'UPDATE SET {updates}' if updates else 'NOTHING'}",
+                    values,
+                )
+        for profile in profiles:
+            self._invalidate('user_profiles', profile['user_id'])
+
+
+# --- Store Selection ---
+
+_records = None
+_records_lock = threading.Lock()
+_profile_access = None
+_rerun_hook = None
+
+def create_records(kind=None, data_dir=None):
+    """
+    Create a record store for the configured backend.
+
+    A SQLite database that doesn't exist yet is created with the users and
+    profiles of the CSV files in data_dir; storage.py imports the tracking
+    tables the first time it opens it.
+
+    Args:
+        kind (str): "csv" or "sqlite"; defaults to the DETOX_STORAGE variable
+        data_dir (str): Directory holding the data files
+
+    Returns:
+        CSVRecords or SQLiteRecords: The record store
+    """
+    kind = (kind or os.environ.get("DETOX_STORAGE", "csv")).lower()
+    data_dir = data_dir or os.environ.get("DETOX_DATA_DIR", ".")
+    if kind == "sqlite":
+        records = SQLiteRecords(os.environ.get("DETOX_DB_PATH", os.path.join(data_dir, DB_FILE)))
+        records.create(data_dir)
+        return records
+    if kind == "csv":
+        return CSVRecords(data_dir)
+    raise ValueError(f"Unknown storage backend: {kind}")
+
+def get_records():
+    """Return the process-wide record store, creating it on first use."""
+    global _records
+    if _records is None:
+        with _records_lock:
+            if _records is None:
+                _records = create_records()
+    return _records
+
+def set_records(records):
+    """Replace the process-wide record store (storage.py registers its backend here)."""
+    global _records
+    _records = records
+
+# --- Page-Facing Functions ---
+
+def new_profile(user_id, username, sleep_hours, eating_habits, main_goal, mood_after_screen, daily_offline_time):
+    """Build the profile record saved when onboarding completes"""
+    return {
+        'user_id': user_id,
+        'username': username,
+        'sleep_hours': sleep_hours,
+        'eating_habits': eating_habits,
+        'main_goal': main_goal,
+        'mood_after_screen': mood_after_screen,
+        'daily_offline_time': daily_offline_time,
+        'onboarding_complete': True,
+        'created_date': datetime.now().strftime("%Y-%m-%d")
+    }
+
+def set_profile_access(get_profile, save_profile):
+    """
+    Route get_user_profile() and save_user_profile() through other functions.
+
+    storage.py installs its unit-of-work reads and coalesced writes here when
+    it is imported, so every page shares one profile API and a profile saved
+    from a page that only imports this module is seen by storage-side reads.
+
+    Args:
+        get_profile (callable): user_id -> profile dict or None
+        save_profile (callable): Saves a profile dict built by new_profile()
+    """
+    global _profile_access
+    _profile_access = (get_profile, save_profile)
+
+def set_rerun_hook(begin):
+    """
+    Run a function whenever a page that only imports this module starts a rerun.
+
+    storage.py installs its begin_rerun() here when it is imported, so the
+    profile reads routed through its unit of work start fresh on every page.
+
+    Args:
+        begin (callable): Takes no arguments
+    """
+    global _rerun_hook
+    _rerun_hook = begin
+
+def begin_rerun():
+    """
+    Start a fresh rerun on this thread.
+
+    Call it at the top of every page script that reads profiles through this
+    module, so nothing held by an earlier page or rerun is served again.
+    Without storage.py loaded nothing is held, and this does nothing.
+    """
+    if _rerun_hook is not None:
+        _rerun_hook()
+
+def get_user_profile(user_id):
+    """Get a user's profile as a dict, or None if onboarding hasn't happened"""
+    if _profile_access is not None:
+        return _profile_access[0](user_id)
+    return get_records().get_profile(user_id)
+
+def save_user_profile(user_id, username, sleep_hours, eating_habits, main_goal, mood_after_screen, daily_offline_time):
+    """Save or update a user's wellness profile"""
+    profile = new_profile(user_id, username, sleep_hours, eating_habits, main_goal, mood_after_screen,
+                          daily_offline_time)
+    if _profile_access is not None:
+        _profile_access[1](profile)
+    else:
+        get_records().save_profile(profile)
@@ -0,0 +1,205 @@
+"""
+Column types for the tracking tables.
+
+pd.read_csv infers a type for every column on every load: moods end up as
+generic object columns, dates as plain strings, hours as float64 and
+user_id as float as soon as one value is missing. Every loader in
+storage.py parses through read_table() / apply_schema() instead, so all
+cached frames share one compact layout:
+- category columns for the repeated labels (mood, profile answers)
+- datetime64 for the check-in date
+- uint16 minutes per device (total_screen is derived, never stored)
+- int32 user ids, dropping rows that have none
+
+Screen time is stored in whole minutes and only converted to hours at the
+UI boundary by hours_frame() / hours_to_minutes(). Files written before
+the switch still hold float hours; apply_schema() converts them on load.
+"""
+
+import pandas as pd
+
+SCREEN_TIME_SCHEMA = {
+    'user_id': 'int32',
+    'date': 'datetime64',
+    'phone_min': 'uint16',
+    'laptop_min': 'uint16',
+    'tablet_min': 'uint16',
+    'mood': 'category',
+}
+
+# Free-text notes are kept out of the screen time rows, keyed the same way
+NOTES_SCHEMA = {
+    'user_id': 'int32',
+    'date': 'datetime64',
+}
+
+# Device minute columns and the legacy hour columns they replace
+DEVICE_MINUTE_COLUMNS = {'phone_min': 'phone', 'laptop_min': 'laptop', 'tablet_min': 'tablet'}
+
+PROFILE_SCHEMA = {
+    'user_id': 'int32',
+    'sleep_hours': 'category',
+    'eating_habits': 'category',
+    'main_goal': 'category',
+    'mood_after_screen': 'category',
+    'daily_offline_time': 'category',
+}
+
+ACHIEVEMENT_SCHEMA = {
+    'user_id': 'int32',
+    'achievement_id': 'category',
+    'achievement_name': 'category',
+}
+
+DATE_FORMAT = "%Y-%m-%d"
+
+def _parse_options(schema):
+    """Translate a schema into pd.read_csv dtype/parse_dates arguments."""
+    dtypes = {column: dtype for column, dtype in schema.items()
+              if dtype in ('category', 'float32')}
+    dates = [column for column, dtype in schema.items() if dtype.startswith('datetime')]
+    return dtypes, dates
+
+def read_table(source, schema):
+    """
+    Parse a CSV file (or buffer) straight into the schema's types.
+
+    Args:
+        source (str or file): Path or open buffer holding the CSV data
+        schema (dict): Column name to dtype, e.g. SCREEN_TIME_SCHEMA
+
+    Returns:
+        pandas.DataFrame: The typed table
+    """
+    dtypes, dates = _parse_options(schema)
+    df = pd.read_csv(source, dtype=dtypes, parse_dates=dates, date_format=DATE_FORMAT)
+    return apply_schema(df, schema)
+
+def hours_to_minutes(hours):
+    """
+    Convert hours entered in the UI to whole minutes for storage.
+
+    Args:
+        hours (float): Hours, e.g. 2.5; empty values count as 0
+
+    Returns:
+        int: Minutes, rounded to the nearest minute
+    """
+    if hours is None or hours == '' or hours != hours:
+        return 0
+    return int(round(float(hours) * 60))
+
+def upgrade_hours(df):
+    """
+    Replace legacy float hour columns with device minute columns.
+
+    Args:
+        df (pandas.DataFrame): A screen time frame in either layout
+
+    Returns:
+        pandas.DataFrame: The frame with *_min columns and no hour columns
+    """
+    legacy = [hours for minutes, hours in DEVICE_MINUTE_COLUMNS.items()
+              if minutes not in df and hours in df]
+    if not legacy:
+        return df
+    conversions = {minutes: (pd.to_numeric(df[hours], errors='coerce').fillna(0) * 60).round()
+                   for minutes, hours in DEVICE_MINUTE_COLUMNS.items() if hours in legacy}
+    stale = [c for c in legacy + ['total_screen'] if c in df]
+    return df.assign(**conversions).drop(columns=stale)
+
+def hours_frame(df):
+    """
+    Convert stored minutes to the hour columns the pages display.
+
+    Args:
+        df (pandas.DataFrame): Screen time rows with *_min columns
+
+    Returns:
+        pandas.DataFrame: Rows with phone, laptop, tablet and total_screen
+        in hours (float32) in place of the minute columns
+    """
+    minutes = list(DEVICE_MINUTE_COLUMNS)
+    hours = {DEVICE_MINUTE_COLUMNS[c]: (df[c] / 60).astype('float32') for c in minutes}
+    # Sum whole minutes first so the total is exact
+    hours['total_screen'] = (df[minutes].sum(axis=1) / 60).astype('float32')
+    out = df.drop(columns=minutes).assign(**hours)
+    columns = ['user_id', 'date', 'phone', 'laptop', 'tablet', 'total_screen']
+    return out[columns + [c for c in out.columns if c not in columns]]
+
+def apply_schema(df, schema):
+    """
+    Cast a frame to the schema's types.
+
+    Columns that already have the right type are left alone, so this is
+    cheap to call again after filtering or concatenating typed frames.
+
+    Args:
+        df (pandas.DataFrame): The frame to convert
+        schema (dict): Column name to dtype
+
+    Returns:
+        pandas.DataFrame: The converted frame (df itself if nothing changed)
+    """
+    if 'user_id' in schema and 'user_id' in df and df['user_id'].isna().any():
+        df = df[df['user_id'].notna()]
+    if 'phone_min' in schema:
+        df = upgrade_hours(df)
+    conversions = {}
+    for column, dtype in schema.items():
+        if column not in df:
+            continue
+        series = df[column]
+        if dtype == 'category':
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                # Filtering keeps the parent's categories; drop the unused ones
+                if len(series.cat.categories) > series.nunique():
+                    conversions[column] = series.cat.remove_unused_categories()
+            else:
+                conversions[column] = series.astype('category')
+        elif dtype.startswith('datetime'):
+            if not pd.api.types.is_datetime64_any_dtype(series):
+                conversions[column] = pd.to_datetime(series, format=DATE_FORMAT, errors='coerce')
+        elif dtype.startswith('uint'):
+            if series.dtype != dtype:
+                conversions[column] = pd.to_numeric(series, errors='coerce').fillna(0).round().astype(dtype)
+        elif series.dtype != dtype:
+            conversions[column] = series.astype(dtype)
+    return df.assign(**conversions) if conversions else df
+
+def empty_table(columns, schema):
+    """
+    Build an empty frame with the given columns and the schema's types.
+
+    Args:
+        columns (list): Column names in order
+        schema (dict): Column name to dtype
+
+    Returns:
+        pandas.DataFrame: A typed frame with no rows
+    """
+    return apply_schema(pd.DataFrame(columns=columns), schema)
+
+def export_frame(df):
+    """
+    Convert a typed frame back to plain values for JSON and Excel exports.
+
+    Dates become "YYYY-MM-DD" strings and float32 hours are widened and
+    rounded so exports don't show float32 noise like 2.299999952.
+
+    Args:
+        df (pandas.DataFrame): A frame produced by read_table/apply_schema
+
+    Returns:
+        pandas.DataFrame: A copy with plain strings and float64 numbers
+    """
+    conversions = {}
+    for column in df.columns:
+        series = df[column]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            conversions[column] = series.dt.strftime(DATE_FORMAT)
+        elif series.dtype == 'float32':
+            conversions[column] = series.astype('float64').round(4)
+        elif isinstance(series.dtype, pd.CategoricalDtype):
+            conversions[column] = series.astype(object)
+    return df.assign(**conversions)
@@ -0,0 +1,2145 @@
+"""
+Storage layer for the Digital Detox Companion app.
+
+Every page reads and writes tracking data through the functions at the
+bottom of this module instead of parsing the CSV files itself. The
+functions delegate to a pluggable backend:
+- CSVBackend: the original CSV files (default, keeps existing data working)
+- SQLiteBackend: an embedded SQLite database in WAL mode with an index on
+  (user_id, date), so a dashboard rerun is a few indexed point reads
+
+Daily check-ins in the CSV backend are appended to a journal file next to
+daily_screen_time.csv; readers merge it on the fly and a background thread
+folds it back into the base file once it grows. After running
+"python manage.py partition" the screen time table is split into hash
+buckets of user_id under screen_time/, so one user's reads and writes only
+touch that user's partition. "python manage.py binary" instead switches
+the single-file table to the memory-mapped format of binstore.py.
+
+Free-text notes are not part of the screen time rows. They live in their
+own table keyed by (user_id, date) (daily_notes.csv, or the daily_notes
+table in SQLite), so the rows read on every dashboard rerun stay small
+and fixed-shape and notes are only parsed by callers that show them, like
+the export page. Files written before the split are converted the first
+time a backend opens the data directory.
+
+Parsed tables are kept in the process-wide cache from cache.py, so
+Streamlit reruns and other sessions reuse them until the underlying files
+change or a writer invalidates them; cache.get_cache_stats() reports its
+hit and miss counters. Every loader parses through schema.py, so cached
+frames use compact, explicit column types. Screen time is stored as whole
+minutes per device; the page-facing functions convert to and from hours.
+
+Sessions in several processes stay consistent through the reader/writer
+file locks in locks.py: readers share a lock, writers serialize per file
+or partition, and whole-file rewrites land through a temp file plus
+os.replace.
+
+The page-facing save functions go through the group-commit coalescer in
+coalescer.py, which gathers writes from every session in the process and
+hands them to the backend's batch methods (save_screen_entries,
+save_profiles, add_achievements) as one write per file.
+
+The backend is chosen with the DETOX_STORAGE environment variable
+("csv" or "sqlite"). DETOX_DATA_DIR sets where data files live and
+DETOX_DB_PATH overrides the SQLite database file.
+
+Each screen time table also keeps per-user running aggregates (see
+aggregates.py), including a bitmap of the days logged (daybits.py), that
+every check-in updates, so a user's running totals and streaks never need
+the full history; check_aggregates() rebuilds them from the
+rows to verify or repair them.
+
+The dashboards take their all-time figures from get_user_aggregates() and
+their window and trend figures from get_user_summary(), the
+summary.SummaryMetrics of the user's DailyHistory. Histories are kept in the
+table cache under a digest of the rows they were built from, so a rerun over
+unchanged data reads and hashes the rows but doesn't rebuild the history or
+its summary.
+
+The users and profiles tables are small and read on every login, so both
+backends inherit their handling from the stdlib-only record stores in
+records.py, and the login, routing and onboarding pages use that module
+directly without importing pandas. Every page reads and saves profiles
+with records.get_user_profile() / save_user_profile(); once this module is
+imported it routes them through the rerun's unit of work and the write
+coalescer, and records.begin_rerun() starts a fresh unit of work on pages
+that don't import this module.
+"""
+
+import bisect
+import csv
+import hashlib
+import io
+import json
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+import binstore
+from aggregates import AGGREGATE_JOURNAL_SUFFIX, AGGREGATE_SUFFIX, AggregateFile, UserAggregates
+from cache import file_stamp, table_cache
+from coalescer import WriteCoalescer, batch_settings
+from history import DailyHistory
+from locks import atomic_write, file_lock
+from records import DB_FILE, USERS_FILE, CSVRecords, SQLiteRecords, set_profile_access, set_records, set_rerun_hook
+from schema import (ACHIEVEMENT_SCHEMA, DATE_FORMAT, DEVICE_MINUTE_COLUMNS, NOTES_SCHEMA,
+                    SCREEN_TIME_SCHEMA, apply_schema, empty_table, export_frame, hours_frame, hours_to_minutes,
+                    read_table)
+
+# --- Configuration ---
+
+SCREEN_TIME_FILE = "daily_screen_time.csv"
+SCREEN_TIME_BINARY_FILE = "daily_screen_time.npy"
+ACHIEVEMENTS_FILE = "user_achievements.csv"
+NOTES_FILE = "daily_notes.csv"
+
+# Device usage is stored in whole minutes; total_screen is derived on read
+SCREEN_TIME_COLUMNS = ['user_id', 'date', 'phone_min', 'laptop_min', 'tablet_min', 'mood']
+NOTE_COLUMNS = ['user_id', 'date', 'notes']
+ACHIEVEMENT_COLUMNS = ['user_id', 'achievement_id', 'earned_date', 'achievement_name']
+
+SCREEN_TIME_PARTITION_DIR = "screen_time"
+SCREEN_TIME_PARTITIONS = 256
+PARTITION_LAYOUT_FILE = "layout.json"
+
+JOURNAL_SUFFIX = ".journal"
+COMPACTING_SUFFIX = ".compacting"
+INDEX_SUFFIX = ".idx"
+JOURNAL_COMPACT_THRESHOLD = 500
+DEDUPE_CHUNK_ROWS = 100000
+
+# --- Byte-Offset Index ---
+
+def _leading_key(line):
+    """Parse the user_id and date in the first two columns of a raw CSV line."""
+    fields = line.split(b',', 2)
+    try:
+        user_id = int(float(fields[0].strip().strip(b'"')))
+    except ValueError:
+        return None, None
+    day = fields[1].strip().strip(b'"').decode('utf-8', 'replace') if len(fields) > 1 else ''
+    return user_id, day
+
+
+class OffsetIndex:
+    """
+    Sidecar index mapping each user_id to the byte ranges of its rows,
+    ordered by date.
+
+    "<file>.idx" starts with a fixed-width header holding the data file's
+    mtime and size at the last sync, followed by one
+    "user_id,offset,length,date" line per row. In memory each user's ranges
+    are kept sorted by (date, offset), so a date window is two bisects.
+    Lookups only return the last line written for each date, which makes
+    the index a unique (user_id, date) key even while the file still holds
+    lines a later upsert superseded. Appends keep it
+    current in constant time (one appended line plus an in-place header
+    rewrite). Whenever the header no longer matches the data file, e.g.
+    after another tool rewrote it, the index is rebuilt by scanning the file
+    once.
+    """
+
+    HEADER_FORMAT = "{:020d} {:020d}\n"
+    HEADER_WIDTH = 42
+
+    def __init__(self, data_path):
+        self.data_path = data_path
+        self.path = data_path + INDEX_SUFFIX
+        self._ranges = None
+        self._stamp = None
+
+    def reset(self, empty=False):
+        """
+        Drop the index because the data file was replaced or newly created.
+
+        Args:
+            empty (bool): Start from an empty index instead of rebuilding lazily
+        """
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        self._ranges = {} if empty else None
+        self._stamp = None
+
+    def ranges(self, handle, user_id, start=None, end=None):
+        """
+        Byte ranges of a user's rows in the open data file.
+
+        Args:
+            handle (file): Data file opened in binary mode
+            user_id (int): The user's ID
+            start (str): First date to include ("YYYY-MM-DD"), None for no bound
+            end (str): Last date to include, None for no bound
+
+        Returns:
+            list: (offset, length) of the latest line per date, ordered by date
+        """
+        user_ranges = self.ensure_fresh(handle).get(int(user_id), [])
+        lo = 0 if start is None else bisect.bisect_left(user_ranges, [start])
+        hi = len(user_ranges) if end is None else bisect.bisect_right(user_ranges, [end, math.inf])
+        window = user_ranges[lo:hi]
+        return [(offset, length) for i, (day, offset, length) in enumerate(window)
+                if i + 1 == len(window) or window[i + 1][0] != day]
+
+    def ensure_fresh(self, handle):
+        """
+        Load or rebuild the index so it matches the open data file.
+
+        Returns:
+            dict: user_id -> ranges for that file. Callers use this rather
+            than re-reading the attribute, which a compaction in another
+            thread may reset at any time.
+        """
+        info = os.fstat(handle.fileno())
+        stamp = (info.st_mtime_ns, info.st_size)
+        ranges, current = self._ranges, self._stamp
+        if ranges is not None and current == stamp:
+            return ranges
+        ranges = self._load_sidecar()
+        if ranges is not None and self._stamp == stamp:
+            return ranges
+        return self._rebuild(handle, stamp)
+
+    def _load_sidecar(self):
+        try:
+            with open(self.path, 'rb') as f:
+                header = f.read(self.HEADER_WIDTH).split()
+                ranges = {}
+                for line in f:
+                    user_id, offset, length, day = line.rstrip(b'\n').split(b',')
+                    ranges.setdefault(int(user_id), []).append([day.decode('utf-8'), int(offset), int(length)])
+        except (FileNotFoundError, ValueError):
+            # Sidecars from before dates were indexed fail to unpack and get rebuilt
+            return None
+        if len(header) != 2:
+            return None
+        for user_ranges in ranges.values():
+            user_ranges.sort()
+        self._ranges = ranges
+        self._stamp = (int(header[0]), int(header[1]))
+        return ranges
+
+    def _rebuild(self, handle, stamp):
+        ranges = {}
+        handle.seek(0)
+        offset = 0
+        record_start = 0
+        record = b""
+        quotes = 0
+        is_header = True
+        for line in handle:
+            if not record:
+                record_start = offset
+            offset += len(line)
+            record += line
+            # Quoted fields may span lines; a record ends on an even quote count
+            quotes += line.count(b'"')
+            if quotes % 2 or not line.endswith(b'\n'):
+                continue
+            if is_header:
+                is_header = False
+            else:
+                user_id, day = _leading_key(record)
+                if user_id is not None:
+                    ranges.setdefault(user_id, []).append([day, record_start, offset - record_start])
+            record = b""
+            quotes = 0
+        for user_ranges in ranges.values():
+            user_ranges.sort()
+        self._ranges = ranges
+        self._stamp = stamp
+        self._write_sidecar(ranges, stamp)
+        return ranges
+
+    def _write_sidecar(self, ranges, stamp):
+        lines = [self.HEADER_FORMAT.format(*stamp)]
+        for user_id, user_ranges in ranges.items():
+            lines.extend(f"{user_id},{offset},{length},{day}\n" for day, offset, length in user_ranges)
+        atomic_write(self.path, lambda f: f.writelines(lines))
+
+    def record_write(self, handle, appended=()):
+        """
+        Update the index after this process wrote to the data file.
+
+        Args:
+            handle (file): The data file, still open after the write
+            appended (list): (user_id, date, offset, length) of rows added at the end
+        """
+        info = os.fstat(handle.fileno())
+        self._stamp = (info.st_mtime_ns, info.st_size)
+        for user_id, day, offset, length in appended:
+            bisect.insort(self._ranges.setdefault(int(user_id), []), [day, offset, length])
+        if not os.path.exists(self.path):
+            self._write_sidecar(self._ranges, self._stamp)
+            return
+        with open(self.path, 'r+b') as f:
+            # Lines first, header last: a sidecar whose stamp matches the
+            # data file always holds every range for it
+            f.seek(0, os.SEEK_END)
+            f.write("".join(f"{u},{o},{n},{d}\n" for u, d, o, n in appended).encode('utf-8'))
+            f.seek(0)
+            f.write(self.HEADER_FORMAT.format(*self._stamp).encode('ascii'))
+
+# --- Journaled CSV Tables ---
+
+def _row_keys(df):
+    """Pack each row's (user_id, date) into one int64 that sorts the same way."""
+    days = df['date'].to_numpy('datetime64[D]')
+    days = np.where(np.isnat(days), -2 ** 31, days.astype(np.int64))
+    return (df['user_id'].to_numpy(np.int64) << 32) | (days + 2 ** 31)
+
+def _sorted_unique(df):
+    """
+    Order rows by (user_id, date), keeping the last row written per key.
+
+    Frames read through an offset index or from a compacted base file are
+    already in that order, which costs one comparison pass to confirm;
+    only journals read whole (at most a compaction's worth of rows) and
+    files from older versions get sorted.
+    """
+    keys = _row_keys(df)
+    if len(keys) < 2 or (keys[1:] > keys[:-1]).all():
+        return df
+    order = np.argsort(keys, kind='stable')
+    ordered = keys[order]
+    last = np.append(ordered[1:] != ordered[:-1], True)
+    return df.iloc[order[last]]
+
+def _overlay_sorted(older, newer):
+    """
+    Merge two frames ordered and unique by (user_id, date), rows in newer
+    replacing older ones with the same key, without sorting.
+
+    Each newer row is placed by a binary search into older, so this is
+    O(len(older) + len(newer) * log(len(older))).
+    """
+    if older.empty or newer.empty:
+        return newer if older.empty else older
+    older_keys, newer_keys = _row_keys(older), _row_keys(newer)
+    found = np.searchsorted(older_keys, newer_keys)
+    replaced = found[(found < len(older_keys)) & (older_keys[np.minimum(found, len(older_keys) - 1)] == newer_keys)]
+    kept = np.ones(len(older_keys), dtype=bool)
+    kept[replaced] = False
+    older, older_keys = older[kept], older_keys[kept]
+    # Newer row j lands after the older rows below it and the j newer rows before it
+    slots = np.searchsorted(older_keys, newer_keys) + np.arange(len(newer_keys))
+    from_newer = np.zeros(len(older_keys) + len(newer_keys), dtype=bool)
+    from_newer[slots] = True
+    take = np.empty(len(from_newer), dtype=np.int64)
+    take[~from_newer] = np.arange(len(older_keys))
+    take[from_newer] = len(older_keys) + np.arange(len(newer_keys))
+    return pd.concat([older, newer], ignore_index=True).iloc[take].reset_index(drop=True)
+
+class JournaledCSV:
+    """
+    A CSV table keyed on (user_id, date) whose upserts are appended to a
+    journal instead of rewriting the whole file.
+
+    Each write appends one line per record to "<file>.journal", so its cost
+    does not depend on how much history the table holds. Readers merge the
+    base file and the journal with last-write-wins on the key columns. When
+    the journal passes JOURNAL_COMPACT_THRESHOLD records a background thread
+    folds it back into the base file, sorted by key so each user's rows sit
+    together.
+
+    Both the base file and the journal carry an OffsetIndex on the
+    (user_id, date) key, so read_user() seeks straight to one user's rows,
+    read_range() to the rows of a date window, and a same-day update that
+    encodes to the same number of bytes is written over the existing
+    journal line instead of appended.
+    """
+
+    def __init__(self, path, columns, key, schema=None):
+        self.path = path
+        self.columns = columns
+        self.key = key
+        self.schema = schema or {}
+        self.journal_path = path + JOURNAL_SUFFIX
+        self.compacting_path = path + COMPACTING_SUFFIX
+        self._base_index = OffsetIndex(path)
+        self._journal_index = OffsetIndex(self.journal_path)
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._journal_records = None
+        self._journal_checked = False
+        self._compacting = False
+
+    def _count_journal_records(self):
+        if not os.path.exists(self.journal_path):
+            return 0
+        with open(self.journal_path, encoding='utf-8', newline='') as f:
+            return max(sum(1 for _ in csv.reader(f)) - 1, 0)
+
+    def _encode(self, values):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(values)
+        return buffer.getvalue().encode('utf-8')
+
+    def _find_in_journal(self, handle, record):
+        """Locate the journal line holding a record's key, or None (an index bisect)."""
+        day = str(record[self.key[1]])
+        ranges = self._journal_index.ranges(handle, record[self.key[0]], day, day)
+        return ranges[0] if ranges else None
+
+    def _check_journal_header(self):
+        """Fold in a journal written with other columns before appending to it."""
+        if self._journal_checked:
+            return
+        try:
+            with open(self.journal_path, 'rb') as f:
+                header = f.readline()
+        except FileNotFoundError:
+            header = None
+        if header and header != self._encode(self.columns):
+            self.compact()
+        self._journal_checked = True
+
+    def append(self, records):
+        """
+        Write upserted records to the journal.
+
+        Records whose key already has a journal line of the same encoded
+        length are overwritten in place; the rest are appended together in
+        a single write.
+
+        Args:
+            records (list): Dicts holding at least the table's columns
+        """
+        self._check_journal_header()
+        with self._lock, file_lock(self.path):
+            if self._journal_records is None:
+                self._journal_records = self._count_journal_records()
+            fd = os.open(self.journal_path, os.O_RDWR | os.O_CREAT, 0o644)
+            with os.fdopen(fd, 'r+b') as f:
+                end = f.seek(0, os.SEEK_END)
+                if end:
+                    self._journal_index.ensure_fresh(f)
+                else:
+                    self._journal_index.reset(empty=True)
+                pending = b"" if end else self._encode(self.columns)
+                appended = []
+                for record in records:
+                    line = self._encode([record.get(c, '') for c in self.columns])
+                    existing = self._find_in_journal(f, record) if end else None
+                    if existing and existing[1] == len(line):
+                        f.seek(existing[0])
+                        f.write(line)
+                        continue
+                    appended.append((record[self.key[0]], str(record[self.key[1]]), end + len(pending), len(line)))
+                    pending += line
+                # A single write keeps each batch of lines contiguous in the file
+                f.seek(end)
+                f.write(pending)
+                f.flush()
+                os.fsync(f.fileno())
+                self._journal_index.record_write(f, appended)
+            for record in records:
+                table_cache.invalidate(('rows', self.path, int(record[self.key[0]])))
+            table_cache.invalidate(('table', self.path))
+            self._journal_records += len(appended)
+            should_compact = self._journal_records >= JOURNAL_COMPACT_THRESHOLD and not self._compacting
+            if should_compact:
+                self._compacting = True
+        if should_compact:
+            threading.Thread(target=self._compact_in_background, daemon=True).start()
+
+    def _read_file(self, path):
+        try:
+            return read_table(path, self.schema)
+        except FileNotFoundError:
+            return None
+
+    def _read_indexed(self, path, index, user_id, start=None, end=None):
+        """Parse only one user's lines of a data file (optionally a date window) using its offset index."""
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            return None
+        with f:
+            header = f.readline()
+            ranges = index.ranges(f, user_id, start, end)
+            if not ranges:
+                return None
+            chunks = [header]
+            for offset, length in ranges:
+                f.seek(offset)
+                chunks.append(f.read(length))
+        return read_table(io.BytesIO(b"".join(chunks)), self.schema)
+
+    def read(self):
+        """
+        Read the merged table, served from the table cache when unchanged.
+
+        Returns:
+            pandas.DataFrame: One row per key, latest write winning
+        """
+        stamp = file_stamp(self.journal_path, self.compacting_path, self.path)
+        return table_cache.get(('table', self.path), stamp, self._load)
+
+    def read_user(self, user_id):
+        """
+        Read one user's merged rows, seeking to them through the offset indexes.
+
+        Args:
+            user_id (int): Value of the first key column
+
+        Returns:
+            pandas.DataFrame: The user's rows, latest write winning per key
+        """
+        stamp = file_stamp(self.journal_path, self.compacting_path, self.path)
+        return table_cache.get(('rows', self.path, int(user_id)), stamp, lambda: self._load(user_id))
+
+    def read_range(self, user_id, start, end):
+        """
+        Read one user's merged rows for a date window.
+
+        Only the index entries inside the window are read from disk, so the
+        cost follows the window size rather than the user's history.
+
+        Args:
+            user_id (int): Value of the first key column
+            start (str): First date to include, "YYYY-MM-DD"
+            end (str): Last date to include, "YYYY-MM-DD"
+
+        Returns:
+            pandas.DataFrame: The user's rows in the window, latest write winning per key
+        """
+        stamp = file_stamp(self.journal_path, self.compacting_path, self.path)
+        return table_cache.get(('range', self.path, int(user_id), start, end), stamp,
+                               lambda: self._load(user_id, start, end))
+
+    def _load(self, user_id=None, start=None, end=None):
+        """
+        Parse and merge the journal and base file, optionally for one user
+        and a date window.
+
+        The journal is read before the base file so a compaction running in
+        another thread can never hide records: anything it has moved out of
+        the journal is already in the base file by the time we read it.
+
+        Returns:
+            pandas.DataFrame: One row per key, latest write winning
+        """
+        with file_lock(self.path, shared=True):
+            if user_id is None:
+                journal = self._read_file(self.journal_path)
+                compacting = self._read_file(self.compacting_path)
+                base = self._read_base()
+            else:
+                journal = self._read_indexed(self.journal_path, self._journal_index, user_id, start, end)
+                compacting = self._read_file(self.compacting_path)
+                if compacting is not None:
+                    mask = compacting[self.key[0]] == user_id
+                    if start is not None:
+                        mask &= compacting[self.key[1]].between(pd.Timestamp(start), pd.Timestamp(end))
+                    compacting = compacting[mask]
+                base = self._read_base(user_id, start, end)
+        return self._merge([base, compacting, journal])
+
+    def compact(self):
+        """
+        Fold the journal into the base file and start a fresh journal.
+
+        Writers only wait for the journal rename; the merge itself holds a
+        separate lock so just one process compacts a table at a time.
+        """
+        with self._compact_lock, file_lock(self.compacting_path):
+            with self._lock, file_lock(self.path):
+                if os.path.exists(self.journal_path) and not os.path.exists(self.compacting_path):
+                    # New appends go to a fresh journal while we fold this one in
+                    os.replace(self.journal_path, self.compacting_path)
+                    self._journal_index.reset()
+                self._journal_records = 0
+            if not os.path.exists(self.compacting_path):
+                return
+            self._write_base(self._merge([self._read_base(), self._read_file(self.compacting_path)]))
+            os.remove(self.compacting_path)
+            table_cache.invalidate(('table', self.path))
+
+    def snapshot(self):
+        """
+        Merge base, compacting file and journal without taking the table lock.
+
+        For maintenance code that already holds the writer lock.
+
+        Returns:
+            pandas.DataFrame: One row per key, sorted by key
+        """
+        return self._merge([self._read_base(), self._read_file(self.compacting_path),
+                            self._read_file(self.journal_path)])
+
+    def _merge(self, frames):
+        """Combine frames oldest first, keeping the last row per key, ordered by key."""
+        frames = [_sorted_unique(df) for df in frames if df is not None and not df.empty]
+        if not frames:
+            return empty_table(self.columns, self.schema)
+        merged = frames[0]
+        for newer in frames[1:]:
+            merged = _overlay_sorted(merged, newer)
+        if len(frames) == 1 and list(merged.columns) == self.columns:
+            return merged
+        # Concatenating categoricals with different categories gives object columns
+        return apply_schema(merged.reindex(columns=self.columns), self.schema)
+
+    # --- Base File Format ---
+
+    def _read_base(self, user_id=None, start=None, end=None):
+        """Read the base file, or one user's rows of it through the offset index."""
+        if user_id is None:
+            return self._read_file(self.path)
+        return self._read_indexed(self.path, self._base_index, user_id, start, end)
+
+    def _write_base(self, df):
+        """Replace the base file with the merged rows."""
+        atomic_write(self.path, lambda f: df.to_csv(f, index=False))
+        self._base_index.reset()
+
+    def _compact_in_background(self):
+        try:
+            self.compact()
+        finally:
+            self._compacting = False
+
+
+class BinaryScreenTable(JournaledCSV):
+    """
+    Screen time table whose base file is the fixed-width format of binstore.py.
+
+    Check-ins still go to a CSV journal next to the records file; compaction
+    folds them into a new records file. A user's base rows are a binary
+    search and a slice of the memory-mapped records.
+    """
+
+    def __init__(self, path, columns, key, schema=None):
+        super().__init__(path, columns, key, schema)
+        self._mapped = (None, None)
+
+    def _records(self):
+        """Return the memory-mapped records, remapping after the file is replaced."""
+        stamp = file_stamp(self.path)
+        if self._mapped[0] != stamp:
+            self._mapped = (stamp, binstore.open_records(self.path))
+        return self._mapped[1]
+
+    def _read_base(self, user_id=None, start=None, end=None):
+        try:
+            records = self._records()
+        except FileNotFoundError:
+            return None
+        if user_id is not None:
+            records = binstore.user_slice(records, int(user_id))
+        if start is not None:
+            records = binstore.day_slice(records, start, end)
+        if not len(records):
+            return None
+        return binstore.records_to_frame(records, binstore.read_moods(self.path))
+
+    def _write_base(self, df):
+        binstore.write_table(self.path, df)
+
+
+class NotesTable(JournaledCSV):
+    """
+    Free-text check-in notes keyed by (user_id, date).
+
+    Only non-empty notes are kept. Clearing a note appends an empty record,
+    which hides the older one on read; compaction then drops both.
+    """
+
+    def __init__(self, path):
+        super().__init__(path, NOTE_COLUMNS, ['user_id', 'date'], NOTES_SCHEMA)
+
+    def save(self, entries):
+        """
+        Store the notes of some check-ins.
+
+        Args:
+            entries (list): Check-in dicts with user_id, date and notes
+        """
+        records = []
+        for entry in entries:
+            note = entry.get('notes')
+            if pd.isna(note) or note == '':
+                # An empty note only needs writing if it replaces a stored one
+                existing = self.read_user(entry['user_id'])
+                if not (existing['notes'].notna() & (existing['date'] == entry['date'])).any():
+                    continue
+                note = ''
+            records.append({'user_id': entry['user_id'], 'date': entry['date'], 'notes': note})
+        if records:
+            self.append(records)
+
+    def read_notes(self, user_id):
+        """
+        Read one user's notes.
+
+        Args:
+            user_id (int): The user's ID
+
+        Returns:
+            pandas.DataFrame: user_id, date and notes, ordered by date
+        """
+        notes = self.read_user(user_id)
+        return notes[notes['notes'].notna()]
+
+    def _merge(self, frames):
+        merged = super()._merge(frames)
+        return merged[merged['notes'].notna()]
+
+# --- Binary Screen Time Format ---
+
+def uses_binary_screen_time(data_dir):
+    """Return True if the screen time table has been converted to the binary format."""
+    return os.path.exists(os.path.join(data_dir, SCREEN_TIME_BINARY_FILE))
+
+def convert_screen_time(data_dir, binary=True):
+    """
+    Convert the screen time table between CSV and the binary format.
+
+    The journal is folded in and the old files are kept with a ".migrated"
+    suffix. Running app servers should be restarted afterwards so they
+    pick up the new layout.
+
+    Args:
+        data_dir (str): Directory holding the data files
+        binary (bool): True for CSV to binary, False for binary back to CSV
+
+    Returns:
+        int: Number of rows converted
+    """
+    if read_partition_count(data_dir):
+        raise RuntimeError("The binary format needs the single-file screen time layout")
+    if binary == uses_binary_screen_time(data_dir):
+        raise RuntimeError(f"Screen time is already stored as {'binary' if binary else 'CSV'}")
+
+    split_notes(data_dir)
+    csv_path = os.path.join(data_dir, SCREEN_TIME_FILE)
+    binary_path = os.path.join(data_dir, SCREEN_TIME_BINARY_FILE)
+    key = ['user_id', 'date']
+    if binary:
+        source = JournaledCSV(csv_path, SCREEN_TIME_COLUMNS, key, SCREEN_TIME_SCHEMA)
+        retired = [csv_path]
+    else:
+        source = BinaryScreenTable(binary_path, SCREEN_TIME_COLUMNS, key, SCREEN_TIME_SCHEMA)
+        retired = [binary_path, binary_path + binstore.MOODS_SUFFIX]
+
+    with file_lock(source.path):
+        df = source.snapshot()
+        if binary:
+            binstore.write_table(binary_path, df)
+        else:
+            atomic_write(csv_path, lambda f: df.to_csv(f, index=False))
+        for path in retired + [source.journal_path, source.compacting_path, source.path + AGGREGATE_SUFFIX,
+                               source.path + AGGREGATE_JOURNAL_SUFFIX]:
+            if os.path.exists(path):
+                os.replace(path, path + ".migrated")
+    return len(df)
+
+# --- Partitioned Screen Time Layout ---
+
+def partition_path(data_dir, bucket):
+    """Path of the CSV shard holding one hash bucket of user_ids."""
+    return os.path.join(data_dir, SCREEN_TIME_PARTITION_DIR, f"part-{bucket:04d}.csv")
+
+def read_partition_count(data_dir):
+    """
+    Return the number of screen time partitions, or 0 for the single-file layout.
+
+    Args:
+        data_dir (str): Directory holding the data files
+
+    Returns:
+        int: Partition count recorded by partition_screen_time()
+    """
+    layout_path = os.path.join(data_dir, SCREEN_TIME_PARTITION_DIR, PARTITION_LAYOUT_FILE)
+    if not os.path.exists(layout_path):
+        return 0
+    with open(layout_path, encoding='utf-8') as f:
+        return int(json.load(f)['partitions'])
+
+def partition_screen_time(data_dir=".", partitions=SCREEN_TIME_PARTITIONS):
+    """
+    Split daily_screen_time.csv into per-bucket shards in one streaming pass.
+
+    Rows are routed by user_id % partitions. Base rows go to each shard's
+    base file and journal rows to each shard's journal, so last-write-wins
+    ordering is preserved without loading the table into memory. The old
+    files are kept with a ".migrated" suffix.
+
+    Args:
+        data_dir (str): Directory holding the data files
+        partitions (int): Number of hash buckets
+
+    Returns:
+        int: Number of rows migrated
+    """
+    if read_partition_count(data_dir):
+        raise RuntimeError("Screen time data is already partitioned")
+    if uses_binary_screen_time(data_dir):
+        raise RuntimeError("Convert the binary screen time table back to CSV before partitioning")
+
+    split_notes(data_dir)
+    source = os.path.join(data_dir, SCREEN_TIME_FILE)
+    target_dir = os.path.join(data_dir, SCREEN_TIME_PARTITION_DIR)
+    staging_dir = target_dir + ".tmp"
+    os.makedirs(staging_dir, exist_ok=True)
+
+    # Hold the writer lock so no check-in lands in the old file mid-migration
+    with file_lock(source):
+        migrated = 0
+        for suffix in ("", COMPACTING_SUFFIX, JOURNAL_SUFFIX):
+            if not os.path.exists(source + suffix):
+                continue
+            outputs = {}
+            try:
+                with open(source + suffix, encoding='utf-8', newline='') as f:
+                    for row in csv.DictReader(f):
+                        if not row.get('user_id'):
+                            continue
+                        for minutes, hours in DEVICE_MINUTE_COLUMNS.items():
+                            if not row.get(minutes):
+                                row[minutes] = hours_to_minutes(row.get(hours))
+                        bucket = int(float(row['user_id'])) % partitions
+                        if bucket not in outputs:
+                            shard = os.path.join(staging_dir, os.path.basename(partition_path(data_dir, bucket)))
+                            handle = open(shard + suffix, 'w', encoding='utf-8', newline='')
+                            writer = csv.DictWriter(handle, SCREEN_TIME_COLUMNS, restval='', extrasaction='ignore')
+                            writer.writeheader()
+                            outputs[bucket] = (handle, writer)
+                        outputs[bucket][1].writerow(row)
+                        migrated += 1
+            finally:
+                for handle, _ in outputs.values():
+                    handle.close()
+
+        atomic_write(os.path.join(staging_dir, PARTITION_LAYOUT_FILE),
+                     lambda f: json.dump({'partitions': partitions}, f))
+        os.replace(staging_dir, target_dir)
+        for suffix in ("", COMPACTING_SUFFIX, JOURNAL_SUFFIX, AGGREGATE_SUFFIX, AGGREGATE_JOURNAL_SUFFIX):
+            if os.path.exists(source + suffix):
+                os.replace(source + suffix, source + suffix + ".migrated")
+    return migrated
+
+# --- Notes Split ---
+
+def _screen_time_tables(data_dir):
+    """Base paths of every screen time table in the data directory's layout."""
+    partitions = read_partition_count(data_dir)
+    if partitions:
+        return [partition_path(data_dir, bucket) for bucket in range(partitions)]
+    if uses_binary_screen_time(data_dir):
+        return [os.path.join(data_dir, SCREEN_TIME_BINARY_FILE)]
+    return [os.path.join(data_dir, SCREEN_TIME_FILE)]
+
+def _csv_header(path):
+    try:
+        with open(path, encoding='utf-8', newline='') as f:
+            return next(csv.reader(f), [])
+    except FileNotFoundError:
+        return []
+
+def _files_with_notes(base):
+    """Files of one screen time table that still carry notes, oldest writes first."""
+    paths = [base + suffix for suffix in ("", COMPACTING_SUFFIX, JOURNAL_SUFFIX)]
+    if base.endswith(".npy"):
+        # The records file itself is binary; its notes sat in a sidecar
+        paths[0] = base + binstore.NOTES_SUFFIX
+    return [path for path in paths if 'notes' in _csv_header(path)]
+
+def _drop_csv_column(path, column):
+    """Rewrite a CSV file without one of its columns, streaming row by row."""
+    def write(out):
+        with open(path, encoding='utf-8', newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            keep = [i for i, name in enumerate(header) if name != column]
+            writer = csv.writer(out)
+            writer.writerow([header[i] for i in keep])
+            for row in reader:
+                writer.writerow([row[i] if i < len(row) else '' for i in keep])
+
+    atomic_write(path, write)
+
+def _legacy_notes(paths):
+    """Non-empty notes of screen time files from before the notes split, resolved last-write-wins."""
+    notes = {}
+    for path in paths:
+        with open(path, encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                if row.get('user_id'):
+                    notes[(int(float(row['user_id'])), row['date'])] = row.get('notes') or ''
+    return [{'user_id': user_id, 'date': day, 'notes': note} for (user_id, day), note in notes.items() if note]
+
+def screen_time_has_notes(data_dir):
+    """Return True if screen time files written before the notes split still hold notes."""
+    return any(_files_with_notes(base) for base in _screen_time_tables(data_dir))
+
+def split_notes(data_dir):
+    """
+    Move notes out of the screen time files into the notes table.
+
+    Each screen time table is converted under its writer lock: its notes
+    are resolved last-write-wins across the base file, compacting file and
+    journal and saved to the notes table, and only then are those files
+    rewritten without the notes column. A binary table's notes sidecar is
+    kept with a ".migrated" suffix.
+
+    Args:
+        data_dir (str): Directory holding the data files
+
+    Returns:
+        int: Number of notes moved
+    """
+    notes_table = NotesTable(os.path.join(data_dir, NOTES_FILE))
+    moved = 0
+    for base in _screen_time_tables(data_dir):
+        with file_lock(base):
+            paths = _files_with_notes(base)
+            if not paths:
+                continue
+            records = _legacy_notes(paths)
+            if records:
+                notes_table.append(records)
+            for path in paths:
+                if path.endswith(binstore.NOTES_SUFFIX):
+                    os.replace(path, path + ".migrated")
+                else:
+                    _drop_csv_column(path, 'notes')
+                table_cache.invalidate(('table', base))
+            moved += len(records)
+    notes_table.compact()
+    return moved
+
+def read_csv_tables(data_dir):
+    """
+    Read the screen time, notes and achievements tables of a CSV data
+    directory whole, without changing anything in it.
+
+    Write journals not yet compacted, hash partitions and the binary screen
+    time format are merged in, latest write per key winning, as in every
+    other read, and notes still held in screen time files from before the
+    notes split are taken as split_notes() would move them. Unlike opening
+    a CSVBackend this runs no migration and takes no locks, so no file in
+    the directory is written or created.
+
+    Args:
+        data_dir (str): Directory holding the data files
+
+    Returns:
+        dict: SQLite table name -> pandas.DataFrame
+    """
+    key = ['user_id', 'date']
+    screen_time, legacy = [], []
+    for base in _screen_time_tables(data_dir):
+        table_class = BinaryScreenTable if base.endswith(".npy") else JournaledCSV
+        screen_time.append(table_class(base, SCREEN_TIME_COLUMNS, key, SCREEN_TIME_SCHEMA).snapshot())
+        legacy.extend(_legacy_notes(_files_with_notes(base)))
+    notes = NotesTable(os.path.join(data_dir, NOTES_FILE)).snapshot()
+    if legacy:
+        legacy = _sorted_unique(apply_schema(pd.DataFrame(legacy, columns=NOTE_COLUMNS), NOTES_SCHEMA))
+        notes = apply_schema(_overlay_sorted(notes, legacy), NOTES_SCHEMA)
+    achievements_path = os.path.join(data_dir, ACHIEVEMENTS_FILE)
+    if os.path.exists(achievements_path):
+        achievements = read_table(achievements_path, ACHIEVEMENT_SCHEMA)
+    else:
+        achievements = empty_table(ACHIEVEMENT_COLUMNS, ACHIEVEMENT_SCHEMA)
+    return {
+        'daily_screen_time': pd.concat(screen_time, ignore_index=True),
+        'daily_notes': notes,
+        'user_achievements': achievements,
+    }
+
+# --- Duplicate Repair ---
+
+def _last_of_each_key(user_ids, days):
+    """Boolean mask keeping the last row of every (user_id, day) pair."""
+    keys = (user_ids.astype(np.int64) << 32) | (days.astype(np.int64) & 0xFFFFFFFF)
+    _, first_from_end = np.unique(keys[::-1], return_index=True)
+    keep = np.zeros(len(keys), dtype=bool)
+    keep[len(keys) - 1 - first_from_end] = True
+    return keep
+
+def _dedupe_csv(path, chunk_size, dry_run):
+    """
+    Drop all but the last row per (user_id, date) from a CSV file.
+
+    The file is read twice in chunks of chunk_size rows: the first pass
+    collects one packed integer key per row, the second streams the rows
+    worth keeping into the replacement file. Memory stays at ~9 bytes per
+    row plus one chunk, whatever the file size.
+    """
+    chunks = lambda **kwargs: pd.read_csv(path, chunksize=chunk_size, dtype=str, keep_default_na=False, **kwargs)
+    user_ids, days = [], []
+    try:
+        for chunk in chunks(usecols=['user_id', 'date']):
+            user_ids.append(pd.to_numeric(chunk['user_id'], errors='coerce').fillna(-1).to_numpy(np.int64))
+            dates = pd.to_datetime(chunk['date'], format=DATE_FORMAT, errors='coerce')
+            days.append(dates.to_numpy('datetime64[D]').astype(np.int64))
+    except FileNotFoundError:
+        return 0
+    if not user_ids:
+        return 0
+    keep = _last_of_each_key(np.concatenate(user_ids), np.concatenate(days))
+    duplicates = int(len(keep) - keep.sum())
+    if duplicates and not dry_run:
+        def write(out):
+            position = 0
+            for n, chunk in enumerate(chunks()):
+                chunk[keep[position:position + len(chunk)]].to_csv(out, index=False, header=n == 0)
+                position += len(chunk)
+
+        atomic_write(path, write)
+    return duplicates
+
+def _dedupe_binary(path, dry_run):
+    """Drop all but the last record per (user_id, day) from a binary table."""
+    try:
+        records = binstore.open_records(path)
+    except FileNotFoundError:
+        return 0
+    # Records are sorted by key with ties in write order, so the last of each run wins
+    keep = _last_of_each_key(records['user_id'], records['day'])
+    duplicates = int(len(keep) - keep.sum())
+    if duplicates and not dry_run:
+        kept = np.array(records[keep])
+        del records
+        atomic_write(path, lambda f: np.save(f, kept), mode='wb')
+    return duplicates
+
+def dedupe_data_files(data_dir, chunk_size=DEDUPE_CHUNK_ROWS, dry_run=False):
+    """
+    Find and merge rows that share a (user_id, date) key in the data files.
+
+    Upserts never write a second row for a key, but files written by older
+    versions, or edited by hand, can hold several. Readers merging a journal
+    already keep only the latest of them; this repairs the files themselves
+    so every reader path sees one row per day. Each base file is scanned in
+    chunks under its writer lock and the last row for a key wins, as it
+    does for the journal. Journals are left alone: compaction merges them.
+
+    Args:
+        data_dir (str): Directory holding the data files
+        chunk_size (int): Rows parsed per chunk while scanning CSV files
+        dry_run (bool): Only count the duplicates
+
+    Returns:
+        list: (path, duplicate rows) for every file that had duplicates
+    """
+    found = []
+    for base in _screen_time_tables(data_dir) + [os.path.join(data_dir, NOTES_FILE)]:
+        with file_lock(base):
+            if base.endswith(".npy"):
+                duplicates = _dedupe_binary(base, dry_run)
+            else:
+                duplicates = _dedupe_csv(base, chunk_size, dry_run)
+            if duplicates and not dry_run:
+                table_cache.invalidate(('table', base))
+        if duplicates:
+            found.append((base, duplicates))
+    return found
+
+# --- Running Aggregates ---
+
+def _aggregate_rows(df):
+    """Yield (user_id, row) for screen time rows, with rows shaped like saved check-in entries."""
+    columns = df[['user_id', 'date', 'phone_min', 'laptop_min', 'tablet_min', 'mood']]
+    for user_id, day, phone, laptop, tablet, mood in columns.itertuples(index=False, name=None):
+        if pd.isna(day):
+            continue
+        yield int(user_id), {
+            'date': day.strftime(DATE_FORMAT),
+            'phone_min': int(phone),
+            'laptop_min': int(laptop),
+            'tablet_min': int(tablet),
+            'mood': mood if isinstance(mood, str) else None,
+        }
+
+def aggregate_screen_time(df):
+    """
+    Aggregate screen time rows from scratch.
+
+    This is the reference the running aggregates are checked against.
+
+    Args:
+        df (pandas.DataFrame): Screen time rows, one per (user_id, date)
+
+    Returns:
+        dict: user_id -> UserAggregates
+    """
+    totals = {}
+    for user_id, row in _aggregate_rows(df):
+        if user_id not in totals:
+            totals[user_id] = UserAggregates(user_id)
+        totals[user_id].add(row)
+    return totals
+
+def _compare_aggregates(stored, rebuilt):
+    """(user_id, stored, rebuilt) for every user whose stored aggregates are wrong."""
+    return [(user_id, stored.get(user_id), rebuilt.get(user_id))
+            for user_id in sorted(set(stored) | set(rebuilt))
+            if stored.get(user_id) != rebuilt.get(user_id)]
+
+# --- Backend Interface ---
+
+class StorageBackend:
+    """
+    Interface shared by all storage backends.
+
+    Screen time, notes and achievement reads return DataFrames with the
+    columns listed above; user and profile reads return a plain dict (or
+    None). Check-in entries carry their notes, and each backend stores them
+    apart from the screen time rows.
+    """
+
+    def find_user(self, username):
+        raise NotImplementedError
+
+    def add_user(self, username, password_hash):
+        raise NotImplementedError
+
+    def get_profile(self, user_id):
+        raise NotImplementedError
+
+    def save_profile(self, profile):
+        raise NotImplementedError
+
+    def get_screen_time(self, user_id):
+        raise NotImplementedError
+
+    def get_screen_range(self, user_id, start, end):
+        raise NotImplementedError
+
+    def save_screen_entry(self, entry):
+        raise NotImplementedError
+
+    def get_notes(self, user_id):
+        raise NotImplementedError
+
+    def get_achievements(self, user_id):
+        raise NotImplementedError
+
+    def add_achievement(self, achievement):
+        raise NotImplementedError
+
+    def save_profiles(self, profiles):
+        """Save several profiles at once; backends override this to batch the write."""
+        for profile in profiles:
+            self.save_profile(profile)
+
+    def save_screen_entries(self, entries):
+        """Save several check-ins at once; backends override this to batch the write."""
+        for entry in entries:
+            self.save_screen_entry(entry)
+
+    def add_achievements(self, achievements):
+        """Add several achievements at once; backends override this to batch the write."""
+        for achievement in achievements:
+            self.add_achievement(achievement)
+
+    def get_aggregates(self, user_id):
+        """
+        Running totals of a user's check-ins.
+
+        Backends override this to keep the totals up to date on write; the
+        default recomputes them from the user's rows.
+
+        Returns:
+            UserAggregates: Days, minute sums, mood counts, first/last date
+            and the calendar of logged days
+        """
+        return aggregate_screen_time(self.get_screen_time(user_id)).get(int(user_id)) or UserAggregates(user_id)
+
+    def check_aggregates(self, repair=False):
+        """
+        Rebuild the stored aggregates from the raw rows and compare.
+
+        Backends that don't store aggregates have nothing to check.
+
+        Args:
+            repair (bool): Replace the stored aggregates with the rebuilt ones
+
+        Returns:
+            list: (user_id, stored, rebuilt) per user whose aggregates were wrong
+        """
+        return []
+
+    def compact(self):
+        """Fold any write journals back into the main storage (no-op by default)."""
+
+    def repair_user_ids(self, dry_run=False):
+        """
+        Give every user whose id repeats an earlier user's id a fresh one.
+
+        Backends that can't hold duplicate ids have nothing to repair.
+
+        Args:
+            dry_run (bool): Only report the duplicates
+
+        Returns:
+            list: (username, old_id, new_id) per remapped user, new_id None on a dry run
+        """
+        return []
+
+    def repair_duplicate_rows(self, chunk_size=DEDUPE_CHUNK_ROWS, dry_run=False):
+        """
+        Merge rows that share a (user_id, date) key, keeping the latest.
+
+        Backends with a unique (user_id, date) key have nothing to repair.
+
+        Args:
+            chunk_size (int): Rows scanned at a time
+            dry_run (bool): Only count the duplicates
+
+        Returns:
+            list: (file or table, duplicate rows) for everything that had duplicates
+        """
+        return []
+
+
+class CSVBackend(CSVRecords, StorageBackend):
+    """
+    Backend that keeps every table in a CSV file (the original layout).
+
+    Users and profiles are handled by records.CSVRecords without pandas.
+    """
+
+    def __init__(self, data_dir="."):
+        super().__init__(data_dir)
+        self.partitions = read_partition_count(data_dir)
+        self.binary = not self.partitions and uses_binary_screen_time(data_dir)
+        self._screen_tables = {}
+        self._aggregate_files = {}
+        self._screen_tables_lock = threading.Lock()
+        if screen_time_has_notes(data_dir):
+            split_notes(data_dir)
+        self.notes = NotesTable(self._path(NOTES_FILE))
+
+    def _screen_table(self, user_id):
+        """Return the journaled table holding a user's screen time rows."""
+        table_class = JournaledCSV
+        if self.partitions:
+            bucket = int(user_id) % self.partitions
+            path = partition_path(self.data_dir, bucket)
+        elif self.binary:
+            bucket = None
+            path = self._path(SCREEN_TIME_BINARY_FILE)
+            table_class = BinaryScreenTable
+        else:
+            bucket = None
+            path = self._path(SCREEN_TIME_FILE)
+        table = self._screen_tables.get(bucket)
+        if table is None:
+            with self._screen_tables_lock:
+                table = self._screen_tables.setdefault(
+                    bucket, table_class(path, SCREEN_TIME_COLUMNS, ['user_id', 'date'], SCREEN_TIME_SCHEMA))
+        return table
+
+    def _read(self, filename, columns, schema):
+        path = self._path(filename)
+
+        def load():
+            with file_lock(path, shared=True):
+                if not os.path.exists(path):
+                    return empty_table(columns, schema)
+                return read_table(path, schema)
+
+        return table_cache.get(('table', path), file_stamp(path), load)
+
+    def repair_user_ids(self, dry_run=False):
+        """
+        Remap users that share an id, which older signups produced by
+        numbering users by row count.
+
+        The first holder of an id keeps it. Profiles follow their user by
+        username. Screen time, notes and achievements rows don't say which
+        of the accounts wrote them, so they stay with the first holder.
+        """
+        path = self._path(USERS_FILE)
+        with file_lock(path):
+            try:
+                with open(path, encoding='utf-8', newline='') as f:
+                    rows = list(csv.reader(f))
+            except FileNotFoundError:
+                return []
+            users = [row for row in rows[1:] if len(row) >= 3]
+            highest = max((int(float(row[0])) for row in users), default=0)
+            seen = set()
+            remapped = []
+            for row in users:
+                user_id = int(float(row[0]))
+                if user_id in seen:
+                    new_id = None if dry_run else self.users.sequence.allocate(highest)
+                    remapped.append((row[1], user_id, new_id))
+                    if new_id is not None:
+                        row[0] = str(new_id)
+                seen.add(user_id)
+            if not remapped or dry_run:
+                return remapped
+            atomic_write(path, lambda f: csv.writer(f).writerows(rows[:1] + users))
+            self.profiles.remap_ids(remapped)
+        return remapped
+
+    def repair_duplicate_rows(self, chunk_size=DEDUPE_CHUNK_ROWS, dry_run=False):
+        return dedupe_data_files(self.data_dir, chunk_size, dry_run)
+
+    def get_screen_time(self, user_id):
+        return self._screen_table(user_id).read_user(user_id)
+
+    def get_screen_range(self, user_id, start, end):
+        return self._screen_table(user_id).read_range(user_id, start, end)
+
+    def save_screen_entry(self, entry):
+        self.save_screen_entries([entry])
+
+    def _all_screen_tables(self):
+        if self.partitions:
+            return [self._screen_table(bucket) for bucket in range(self.partitions)]
+        return [self._screen_table(None)]
+
+    def _aggregate_file(self, table):
+        """Return the running aggregates kept next to a screen time table."""
+        aggregates = self._aggregate_files.get(table.path)
+        if aggregates is None:
+            with self._screen_tables_lock:
+                aggregates = self._aggregate_files.setdefault(table.path, AggregateFile(table.path))
+        return aggregates
+
+    def _rebuild_aggregates(self, table):
+        return aggregate_screen_time(table.read())
+
+    def _write_screen_rows(self, table, records, totals):
+        """Append check-ins and return them with the rows they replace (runs under the aggregates lock)."""
+        # The row each check-in replaces: stored, or an earlier one in this batch
+        latest = {}
+        changes = []
+        for record in records:
+            user_id = int(record['user_id'])
+            key = (user_id, record['date'])
+            if key not in latest:
+                held = totals.get(user_id)
+                if held is None or key[1] not in held.calendar:
+                    # A day the calendar hasn't seen has nothing to take back
+                    latest[key] = None
+                else:
+                    stored = table.read_range(user_id, key[1], key[1])
+                    latest[key] = next((row for _, row in _aggregate_rows(stored)), None)
+            changes.append((user_id, latest[key], record))
+            latest[key] = record
+        table.append(records)
+        return changes
+
+    def save_screen_entries(self, entries):
+        # One journal write per partition touched by the batch
+        by_table = {}
+        for entry in entries:
+            by_table.setdefault(self._screen_table(entry['user_id']), []).append(entry)
+        for table, records in by_table.items():
+            self._aggregate_file(table).update(partial(self._write_screen_rows, table, records),
+                                               partial(self._rebuild_aggregates, table))
+        self.notes.save(entries)
+
+    def get_aggregates(self, user_id):
+        table = self._screen_table(user_id)
+        aggregates = self._aggregate_file(table)
+        if not aggregates.current():
+            aggregates.build(partial(self._rebuild_aggregates, table))
+        return aggregates.get(user_id)
+
+    def check_aggregates(self, repair=False):
+        found = []
+        for table in self._all_screen_tables():
+            aggregates = self._aggregate_file(table)
+            if not aggregates.exists():
+                continue  # Built from the rows on first use
+            stored, rebuilt = aggregates.check(partial(self._rebuild_aggregates, table), repair)
+            found.extend(_compare_aggregates(stored, rebuilt))
+        return found
+
+    def get_notes(self, user_id):
+        return self.notes.read_notes(user_id)
+
+    def get_achievements(self, user_id):
+        achievements_df = self._read(ACHIEVEMENTS_FILE, ACHIEVEMENT_COLUMNS, ACHIEVEMENT_SCHEMA)
+        return apply_schema(achievements_df[achievements_df['user_id'] == user_id], ACHIEVEMENT_SCHEMA)
+
+    def add_achievement(self, achievement):
+        self.add_achievements([achievement])
+
+    def add_achievements(self, achievements):
+        path = self._path(ACHIEVEMENTS_FILE)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        with file_lock(path):
+            if not os.path.exists(path) or not os.path.getsize(path):
+                writer.writerow(ACHIEVEMENT_COLUMNS)
+            writer.writerows([achievement.get(c, '') for c in ACHIEVEMENT_COLUMNS] for achievement in achievements)
+            with open(path, 'a', encoding='utf-8', newline='') as f:
+                f.write(buffer.getvalue())
+                f.flush()
+                os.fsync(f.fileno())
+        table_cache.invalidate(('table', path))
+
+    def compact(self):
+        self.notes.compact()
+        if not self.partitions:
+            table = self._screen_table(None)
+            table.compact()
+            self._aggregate_file(table).compact()
+            return
+        for bucket in range(self.partitions):
+            path = partition_path(self.data_dir, bucket)
+            if os.path.exists(path + JOURNAL_SUFFIX) or os.path.exists(path + COMPACTING_SUFFIX):
+                self._screen_table(bucket).compact()
+            if os.path.exists(path + AGGREGATE_JOURNAL_SUFFIX):
+                self._aggregate_file(self._screen_table(bucket)).compact()
+
+
+class SQLiteBackend(SQLiteRecords, StorageBackend):
+    """
+    Backend that stores every table in one SQLite database.
+
+    The database runs in WAL mode so readers never wait for a writer, and
+    per-user lookups hit the (user_id, date) and user_id indexes instead of
+    scanning every row. The (user_id, date) index is unique, so a day's
+    screen time is saved with a single upsert and repeated or concurrent
+    submits can never leave two rows for it. On first use the existing CSV
+    files are imported.
+    """
+
+    # The users, id_sequences and user_profiles tables are in SQLiteRecords.RECORD_SCHEMA
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS daily_screen_time (
+            user_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            phone_min INTEGER,
+            laptop_min INTEGER,
+            tablet_min INTEGER,
+            mood TEXT
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_screen_time_key
+            ON daily_screen_time (user_id, date);
+        CREATE TABLE IF NOT EXISTS daily_notes (
+            user_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            notes TEXT NOT NULL,
+            PRIMARY KEY (user_id, date)
+        );
+        CREATE TABLE IF NOT EXISTS user_achievements (
+            user_id INTEGER NOT NULL,
+            achievement_id TEXT NOT NULL,
+            earned_date TEXT,
+            achievement_name TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_achievements_user
+            ON user_achievements (user_id);
+        CREATE TABLE IF NOT EXISTS user_aggregates (
+            user_id INTEGER PRIMARY KEY,
+            days INTEGER NOT NULL,
+            phone_min INTEGER NOT NULL,
+            laptop_min INTEGER NOT NULL,
+            tablet_min INTEGER NOT NULL,
+            moods TEXT NOT NULL,
+            first_date TEXT,
+            last_date TEXT,
+            calendar TEXT
+        );
+    """
+
+    AGGREGATE_COLUMNS = ['days', 'phone_min', 'laptop_min', 'tablet_min', 'moods', 'first_date', 'last_date',
+                         'calendar']
+
+    def __init__(self, db_path=DB_FILE, data_dir="."):
+        super().__init__(db_path)
+        self.data_dir = data_dir
+        is_new = self.create(data_dir)
+        conn = self._connect()
+        if not is_new:
+            self._upgrade_hours_table(conn)
+            self._split_notes_table(conn)
+            self._add_screen_time_key(conn)
+        has_aggregates = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_aggregates'").fetchone()
+        conn.executescript(self.RECORD_SCHEMA + self.SCHEMA)
+        self.import_csv_files()
+        if not has_aggregates or self._add_calendar_column(conn):
+            self.check_aggregates(repair=True)
+
+    def _add_calendar_column(self, conn):
+        """Add the calendar bitmap to a user_aggregates table from before it was kept; True if it was added."""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(user_aggregates)")}
+            added = 'calendar' not in columns
+            if added:
+                conn.execute("ALTER TABLE user_aggregates ADD COLUMN calendar TEXT")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return added
+
+    def _upgrade_hours_table(self, conn):
+        """Convert a daily_screen_time table that still stores float hours."""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(daily_screen_time)")}
+            if 'phone' in columns and 'phone_min' not in columns:
+                conn.execute("ALTER TABLE daily_screen_time RENAME TO daily_screen_time_hours")
+                conn.execute("DROP INDEX IF EXISTS idx_screen_time_user_date")
+                conn.execute(
+                    "CREATE TABLE daily_screen_time (user_id INTEGER NOT NULL, date TEXT NOT NULL, "
+                    "phone_min INTEGER, laptop_min INTEGER, tablet_min INTEGER, mood TEXT, notes TEXT)"
+                )
+                conn.execute(
+                    "INSERT INTO daily_screen_time SELECT user_id, date, "
+                    "CAST(ROUND(COALESCE(phone, 0) * 60) AS INTEGER), "
+                    "CAST(ROUND(COALESCE(laptop, 0) * 60) AS INTEGER), "
+                    "CAST(ROUND(COALESCE(tablet, 0) * 60) AS INTEGER), "
+                    "mood, notes FROM daily_screen_time_hours"
+                )
+                conn.execute("DROP TABLE daily_screen_time_hours")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def _split_notes_table(self, conn):
+        """Move the notes column of daily_screen_time into the daily_notes table."""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(daily_screen_time)")}
+            if 'notes' in columns:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS daily_notes (user_id INTEGER NOT NULL, date TEXT NOT NULL, "
+                    "notes TEXT NOT NULL, PRIMARY KEY (user_id, date))"
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO daily_notes SELECT user_id, date, notes "
+                    "FROM daily_screen_time WHERE notes IS NOT NULL AND notes != ''"
+                )
+                conn.execute("ALTER TABLE daily_screen_time RENAME TO daily_screen_time_notes")
+                conn.execute("DROP INDEX IF EXISTS idx_screen_time_user_date")
+                conn.execute(
+                    "CREATE TABLE daily_screen_time (user_id INTEGER NOT NULL, date TEXT NOT NULL, "
+                    "phone_min INTEGER, laptop_min INTEGER, tablet_min INTEGER, mood TEXT)"
+                )
+                conn.execute(
+                    "INSERT INTO daily_screen_time SELECT user_id, date, phone_min, laptop_min, "
+                    "tablet_min, mood FROM daily_screen_time_notes"
+                )
+                conn.execute("DROP TABLE daily_screen_time_notes")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def _add_screen_time_key(self, conn):
+        """Merge duplicate (user_id, date) rows and replace the plain index with a unique one."""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            indexes = {row[1] for row in conn.execute("PRAGMA index_list(daily_screen_time)")}
+            has_table = conn.execute("PRAGMA table_info(daily_screen_time)").fetchone() is not None
+            if has_table and 'idx_screen_time_key' not in indexes:
+                # The most recently inserted row wins, like the CSV journal
+                conn.execute(
+                    "DELETE FROM daily_screen_time WHERE rowid NOT IN "
+                    "(SELECT MAX(rowid) FROM daily_screen_time GROUP BY user_id, date)"
+                )
+                conn.execute("DROP INDEX IF EXISTS idx_screen_time_user_date")
+                conn.execute("CREATE UNIQUE INDEX idx_screen_time_key ON daily_screen_time (user_id, date)")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def _query_frame(self, sql, params, columns, schema):
+        rows = self._connect().execute(sql, params).fetchall()
+        return apply_schema(pd.DataFrame([tuple(row) for row in rows], columns=columns), schema)
+
+    def import_csv_files(self):
+        """
+        Copy the tracking tables of a CSV deployment in data_dir into a new database.
+
+        SQLiteRecords.create() copies users and profiles when it creates the
+        database and marks it TRACKING_IMPORT_PENDING; this imports the
+        rest and clears the mark, in one transaction, so only the first
+        process to open the database imports them. The tables are read with
+        read_csv_tables(), so check-ins and notes still in write journals,
+        hash partitions and the binary screen time format are imported the
+        way the CSV backend serves them, while the CSV files themselves are
+        left untouched.
+        """
+        conn = self._connect()
+        if conn.execute("PRAGMA user_version").fetchone()[0] != self.TRACKING_IMPORT_PENDING:
+            return
+        frames = read_csv_tables(self.data_dir)
+        columns = {
+            'daily_screen_time': SCREEN_TIME_COLUMNS,
+            'daily_notes': NOTE_COLUMNS,
+            'user_achievements': ACHIEVEMENT_COLUMNS,
+        }
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("PRAGMA user_version").fetchone()[0] == self.TRACKING_IMPORT_PENDING:
+                for table, df in frames.items():
+                    df = export_frame(df.reindex(columns=columns[table]))
+                    df = df.astype(object).where(df.notna(), None)
+                    placeholders = ", ".join("?" for _ in columns[table])
+                    conn.executemany(
+                        f"INSERT OR IGNORE INTO {table} ({', '.join(columns[table])}) VALUES ({placeholders})",
+                        df.itertuples(index=False, name=None),
+                    )
+                conn.execute("PRAGMA user_version = 0")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def get_screen_time(self, user_id):
+        return self._cached('daily_screen_time', user_id, lambda: self._query_frame(
+            f"SELECT {', '.join(SCREEN_TIME_COLUMNS)} FROM daily_screen_time "
+            "WHERE user_id = ? ORDER BY date",
+            (int(user_id),),
+            SCREEN_TIME_COLUMNS,
+            SCREEN_TIME_SCHEMA,
+        )).copy()
+
+    def get_screen_range(self, user_id, start, end):
+        return self._query_frame(
+            f"SELECT {', '.join(SCREEN_TIME_COLUMNS)} FROM daily_screen_time "
+            "WHERE user_id = ? AND date BETWEEN ? AND ? ORDER BY date",
+            (int(user_id), start, end),
+            SCREEN_TIME_COLUMNS,
+            SCREEN_TIME_SCHEMA,
+        )
+
+    def save_screen_entry(self, entry):
+        self.save_screen_entries([entry])
+
+    def save_screen_entries(self, entries):
+        conn = self._connect()
+        upsert = (
+            f"INSERT INTO daily_screen_time ({', '.join(SCREEN_TIME_COLUMNS)}) "
+            f"VALUES ({', '.join('?' for _ in SCREEN_TIME_COLUMNS)}) "
+            "ON CONFLICT (user_id, date) DO UPDATE SET "
+            f"{', '.join(f'{c} = excluded.{c}' for c in SCREEN_TIME_COLUMNS[2:])}"
+        )
+        # Reading the replaced rows and writing the aggregates share one write transaction
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            totals = {}
+            for entry in entries:
+                key = (int(entry['user_id']), entry['date'])
+                old = conn.execute(
+                    "SELECT date, phone_min, laptop_min, tablet_min, mood FROM daily_screen_time "
+                    "WHERE user_id = ? AND date = ?", key).fetchone()
+                conn.execute(upsert, list(key) + [entry[c] for c in SCREEN_TIME_COLUMNS[2:]])
+                if entry.get('notes'):
+                    conn.execute("INSERT OR REPLACE INTO daily_notes (user_id, date, notes) VALUES (?, ?, ?)",
+                                 list(key) + [entry['notes']])
+                else:
+                    conn.execute("DELETE FROM daily_notes WHERE user_id = ? AND date = ?", key)
+                if key[0] not in totals:
+                    totals[key[0]] = self._read_aggregates(conn, key[0]).get(key[0]) or UserAggregates(key[0])
+                totals[key[0]].replace(dict(old) if old is not None else None, entry)
+            self._write_aggregates(conn, totals)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        for entry in entries:
+            self._invalidate('daily_screen_time', entry['user_id'])
+            self._invalidate('daily_notes', entry['user_id'])
+            self._invalidate('user_aggregates', entry['user_id'])
+
+    def _read_aggregates(self, conn, user_id=None):
+        """Stored aggregates of one user (or everyone) as user_id -> UserAggregates."""
+        sql = f"SELECT user_id, {', '.join(self.AGGREGATE_COLUMNS)} FROM user_aggregates"
+        rows = conn.execute(sql + " WHERE user_id = ?", (int(user_id),)) if user_id is not None else conn.execute(sql)
+        totals = {}
+        for row in rows:
+            record = {c: row[c] for c in self.AGGREGATE_COLUMNS}
+            record['moods'] = json.loads(record['moods'])
+            totals[row['user_id']] = UserAggregates.from_record(row['user_id'], record)
+        return totals
+
+    def _write_aggregates(self, conn, totals):
+        rows = []
+        for user_id, aggregates in totals.items():
+            record = aggregates.to_record()
+            record['moods'] = json.dumps(record['moods'], ensure_ascii=False)
+            rows.append([user_id] + [record[c] for c in self.AGGREGATE_COLUMNS])
+        conn.executemany(
+            f"INSERT OR REPLACE INTO user_aggregates (user_id, {', '.join(self.AGGREGATE_COLUMNS)}) "
+            f"VALUES ({', '.join('?' for _ in range(len(self.AGGREGATE_COLUMNS) + 1))})",
+            rows,
+        )
+
+    def get_aggregates(self, user_id):
+        return self._cached('user_aggregates', user_id, lambda: (
+            self._read_aggregates(self._connect(), user_id).get(int(user_id)) or UserAggregates(user_id)))
+
+    def check_aggregates(self, repair=False):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rebuilt = aggregate_screen_time(self._query_frame(
+                f"SELECT {', '.join(SCREEN_TIME_COLUMNS)} FROM daily_screen_time ORDER BY user_id, date",
+                (),
+                SCREEN_TIME_COLUMNS,
+                SCREEN_TIME_SCHEMA,
+            ))
+            found = _compare_aggregates(self._read_aggregates(conn), rebuilt)
+            if repair and found:
+                conn.execute("DELETE FROM user_aggregates")
+                self._write_aggregates(conn, rebuilt)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        if repair:
+            for user_id, _, _ in found:
+                self._invalidate('user_aggregates', user_id)
+        return found
+
+    def get_notes(self, user_id):
+        return self._cached('daily_notes', user_id, lambda: self._query_frame(
+            "SELECT user_id, date, notes FROM daily_notes WHERE user_id = ? ORDER BY date",
+            (int(user_id),),
+            NOTE_COLUMNS,
+            NOTES_SCHEMA,
+        )).copy()
+
+    def get_achievements(self, user_id):
+        return self._cached('user_achievements', user_id, lambda: self._query_frame(
+            f"SELECT {', '.join(ACHIEVEMENT_COLUMNS)} FROM user_achievements WHERE user_id = ?",
+            (int(user_id),),
+            ACHIEVEMENT_COLUMNS,
+            ACHIEVEMENT_SCHEMA,
+        )).copy()
+
+    def add_achievement(self, achievement):
+        self.add_achievements([achievement])
+
+    def add_achievements(self, achievements):
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                f"INSERT INTO user_achievements ({', '.join(ACHIEVEMENT_COLUMNS)}) VALUES (?, ?, ?, ?)",
+                [(int(a['user_id']), a['achievement_id'], a['earned_date'], a['achievement_name'])
+                 for a in achievements],
+            )
+        for achievement in achievements:
+            self._invalidate('user_achievements', achievement['user_id'])
+
+# --- Backend Selection ---
+
+_storage = None
+_storage_lock = threading.Lock()
+_coalescer = None
+
+def create_storage(kind=None, data_dir=None):
+    """
+    Create a storage backend.
+
+    Args:
+        kind (str): "csv" or "sqlite"; defaults to the DETOX_STORAGE variable
+        data_dir (str): Directory holding the data files
+
+    Returns:
+        StorageBackend: The configured backend
+    """
+    kind = (kind or os.environ.get("DETOX_STORAGE", "csv")).lower()
+    data_dir = data_dir or os.environ.get("DETOX_DATA_DIR", ".")
+    if kind == "sqlite":
+        db_path = os.environ.get("DETOX_DB_PATH", os.path.join(data_dir, DB_FILE))
+        return SQLiteBackend(db_path, data_dir=data_dir)
+    if kind == "csv":
+        return CSVBackend(data_dir)
+    raise ValueError(f"Unknown storage backend: {kind}")
+
+def get_storage():
+    """Return the process-wide storage backend, creating it on first use."""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = create_storage()
+                set_records(_storage)
+    return _storage
+
+def set_storage(backend):
+    """Replace the process-wide storage backend (used by tools and scripts)."""
+    global _storage, _coalescer
+    with _storage_lock:
+        if _coalescer is not None:
+            _coalescer.close()
+            _coalescer = None
+        _storage = backend
+        set_records(backend)
+
+def get_coalescer():
+    """
+    Return the process-wide write coalescer, or None when batching is off.
+
+    Returns:
+        WriteCoalescer: Batches writes for the current storage backend
+    """
+    global _coalescer
+    interval_ms, max_batch = batch_settings()
+    if interval_ms <= 0:
+        return None
+    if _coalescer is None:
+        storage = get_storage()
+        with _storage_lock:
+            if _coalescer is None:
+                _coalescer = WriteCoalescer({
+                    'screen_time': storage.save_screen_entries,
+                    'profiles': storage.save_profiles,
+                    'achievements': storage.add_achievements,
+                }, interval_ms, max_batch)
+    return _coalescer
+
+def _submit_write(kind, records, write_many):
+    """Send records through the coalescer as one group, or straight to storage if batching is off."""
+    coalescer = get_coalescer()
+    if coalescer is None:
+        write_many(records)
+    else:
+        coalescer.submit_many(kind, records)
+
+# --- Rerun Unit of Work ---
+
+class UnitOfWork:
+    """
+    Identity map for one page rerun.
+
+    A page script starts one with begin_rerun(); from then on the
+    page-facing functions below load each user's profile, screen time,
+    notes and achievements from the backend at most once and hand back the
+    copy held here. Writes made through those functions go to storage as
+    usual and are applied to the held copies too, so the rest of the rerun
+    sees them without reading the tables again.
+
+    A value can also be prefetched: its loader starts on a worker thread
+    and the first get() waits for it, so several tables load in parallel.
+    """
+
+    def __init__(self):
+        self._loaded = {}
+        self._pending = {}
+
+    def prefetch(self, key, loader, executor):
+        """
+        Start loading a value on an executor unless it is already held or loading.
+
+        Args:
+            key (tuple): Table name followed by user_id
+            loader (callable): Reads the value from storage
+            executor (concurrent.futures.Executor): Runs the loader
+        """
+        if key not in self._loaded and key not in self._pending:
+            self._pending[key] = executor.submit(loader)
+
+    def _settle(self, key):
+        """Move a finished (or awaited) prefetch into the held values; re-raises its error."""
+        future = self._pending.pop(key, None)
+        if future is not None:
+            self._loaded[key] = future.result()
+
+    def settle(self, table, user_id):
+        """Wait for any prefetch of one user's table, e.g. before writing to it."""
+        for key in [k for k in self._pending if k[0] == table and k[1] == user_id]:
+            self._settle(key)
+
+    def get(self, key, loader):
+        """
+        Return the value held for a key, loading it on first use.
+
+        Args:
+            key (tuple): Table name followed by user_id (and any query arguments)
+            loader (callable): Reads the value from storage
+
+        Returns:
+            object: The held value
+        """
+        self._settle(key)
+        if key not in self._loaded:
+            self._loaded[key] = loader()
+        return self._loaded[key]
+
+    def holds(self, key):
+        return key in self._loaded or key in self._pending
+
+    def update(self, table, user_id, change):
+        """
+        Apply a write to every loaded value of one user's table.
+
+        Args:
+            table (str): Table name, the first element of the keys
+            user_id (int): The user written to
+            change (callable): Takes (key, value) and returns the new value
+        """
+        self.settle(table, user_id)
+        for key, value in list(self._loaded.items()):
+            if key[0] == table and key[1] == user_id:
+                self._loaded[key] = change(key, value)
+
+_rerun = threading.local()
+_prefetch_pool = None
+PREFETCH_THREADS = 3
+
+# How each per-user table is read from a backend
+_TABLE_LOADERS = {
+    'profiles': lambda backend, user_id: backend.get_profile(user_id),
+    'screen_time': lambda backend, user_id: backend.get_screen_time(user_id),
+    'notes': lambda backend, user_id: backend.get_notes(user_id),
+    'achievements': lambda backend, user_id: backend.get_achievements(user_id),
+    'aggregates': lambda backend, user_id: backend.get_aggregates(user_id),
+}
+
+def begin_rerun():
+    """
+    Start a fresh unit of work for the page rerun running on this thread.
+
+    Call it at the top of every page script, before the first storage call,
+    so nothing held from an earlier rerun leaks into this one.
+
+    Returns:
+        UnitOfWork: The new unit of work
+    """
+    _rerun.work = UnitOfWork()
+    return _rerun.work
+
+# Pages that only import records.py start their reruns through it
+set_rerun_hook(begin_rerun)
+
+def _prefetch_executor():
+    """Shared worker threads for prefetching, or None when DETOX_PREFETCH_THREADS=0."""
+    global _prefetch_pool
+    threads = int(os.environ.get("DETOX_PREFETCH_THREADS", PREFETCH_THREADS))
+    if threads <= 0:
+        return None
+    if _prefetch_pool is None:
+        with _storage_lock:
+            if _prefetch_pool is None:
+                _prefetch_pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="prefetch")
+    return _prefetch_pool
+
+def prefetch_user_data(user_id, tables=('profiles', 'screen_time', 'achievements')):
+    """
+    Start reading a user's tables in parallel for the current rerun.
+
+    Call it right after begin_rerun(): the reads run on a small shared
+    thread pool while the page sets up, and the page-facing functions below
+    pick up the results (waiting only for whatever hasn't finished), so the
+    page waits for the slowest read rather than the sum of them. Does
+    nothing outside a rerun, without a user or with prefetching turned off.
+
+    Args:
+        user_id (int): The signed-in user, or None
+        tables (tuple): Which of the user's tables to read
+    """
+    work = getattr(_rerun, 'work', None)
+    executor = _prefetch_executor()
+    if work is None or executor is None or user_id is None:
+        return
+    backend = get_storage()
+    for table in tables:
+        work.prefetch((table, int(user_id)), partial(_TABLE_LOADERS[table], backend, user_id), executor)
+
+def _held(key, loader):
+    """Load through the current unit of work, or straight from storage outside a rerun."""
+    work = getattr(_rerun, 'work', None)
+    return loader() if work is None else work.get(key, loader)
+
+def _held_table(table, user_id):
+    return _held((table, int(user_id)), lambda: _TABLE_LOADERS[table](get_storage(), user_id))
+
+def _write_through(kind, records, write_many, changes):
+    """
+    Write one user's records to storage in one write and apply them to what the current rerun holds.
+
+    Args:
+        kind (str): Coalescer kind of the records
+        records (list): The records to write, all for the same user
+        write_many (callable): Backend batch method writing a list of records
+        changes (dict): Table name -> change(key, value) for the held values
+    """
+    work = getattr(_rerun, 'work', None)
+    user_id = int(records[0]['user_id'])
+    if work is not None:
+        # A read still in flight must not land after the write it would miss
+        for table in changes:
+            work.settle(table, user_id)
+    _submit_write(kind, records, write_many)
+    if work is not None:
+        for table, change in changes.items():
+            work.update(table, user_id, change)
+
+def _date_window(df, start, end):
+    """Rows of a date-ordered frame dated start..end, found by binary search."""
+    days = df['date'].to_numpy()
+    lo = np.searchsorted(days, np.datetime64(start), side='left')
+    hi = np.searchsorted(days, np.datetime64(end), side='right')
+    return df.iloc[lo:hi]
+
+def _overlay_entry(key, frame, entry):
+    """Apply a saved check-in to a held screen time frame (a full history or a date window)."""
+    if len(key) == 4 and not key[2] <= entry['date'] <= key[3]:
+        return frame
+    row = apply_schema(pd.DataFrame([entry], columns=SCREEN_TIME_COLUMNS), SCREEN_TIME_SCHEMA)
+    return apply_schema(_overlay_sorted(frame, row), SCREEN_TIME_SCHEMA)
+
+def _overlay_note(frame, entry):
+    """Apply a saved check-in's note to a held notes frame; an empty note removes the day's note."""
+    frame = frame[frame['date'] != pd.Timestamp(entry['date'])]
+    if pd.isna(entry['notes']) or entry['notes'] == '':
+        return frame
+    row = apply_schema(pd.DataFrame([entry], columns=NOTE_COLUMNS), NOTES_SCHEMA)
+    return apply_schema(_overlay_sorted(frame, row), NOTES_SCHEMA)
+
+# --- Page-Facing Functions ---
+
+def _held_profile(user_id):
+    return _held_table('profiles', user_id)
+
+def _save_profile(profile):
+    _write_through('profiles', [profile], get_storage().save_profiles,
+                   {'profiles': lambda key, held: dict(profile)})
+
+# records.get_user_profile() / save_user_profile() are the one profile API for every page
+set_profile_access(_held_profile, _save_profile)
+
+def _screen_minutes(user_id):
+    return _held_table('screen_time', user_id)
+
+def _notes(user_id):
+    return _held_table('notes', user_id)
+
+def get_user_screen_data(user_id, with_notes=False):
+    """Get all screen time data for a specific user in hours, ordered by date (with notes only if asked)"""
+    screen_data = hours_frame(_screen_minutes(user_id))
+    if with_notes:
+        notes = _notes(user_id)
+        screen_data = screen_data.merge(notes[['date', 'notes']], on='date', how='left')
+    return screen_data
+
+def _rows_version(frame):
+    """Digest of a user's stored screen time rows, the data version their history is kept under."""
+    digest = hashlib.blake2b(digest_size=16)
+    for column in ('date', 'phone_min', 'laptop_min', 'tablet_min'):
+        digest.update(frame[column].to_numpy().tobytes())
+    digest.update(frame['mood'].cat.codes.to_numpy().tobytes())
+    digest.update(json.dumps(list(frame['mood'].cat.categories)).encode('utf-8'))
+    return digest.digest()
+
+def _history_of(frame, user_id):
+    """
+    Build the DailyHistory of a user's stored rows once per version of them.
+
+    The history (with its rolling windows and summary, once computed) is
+    kept in the table cache under a digest of the rows, so every rerun over
+    unchanged data reuses it instead of rebuilding the arrays and figures.
+    Computing the digest still hashes every row.
+    """
+    return table_cache.get(('history', int(user_id)), _rows_version(frame),
+                           lambda: DailyHistory.from_screen_time(frame, int(user_id)))
+
+def get_user_history(user_id):
+    """Get a user's screen time as a DailyHistory (arrays in hours, ordered by date)"""
+    return _held(('history', int(user_id)), lambda: _history_of(_screen_minutes(user_id), user_id))
+
+def get_user_summary(user_id):
+    """Get a user's summary figures (totals, averages, moods, window trends) as a read-only SummaryMetrics; all-time figures are cheaper from get_user_aggregates()"""
+    return get_user_history(user_id).summary()
+
+def get_user_aggregates(user_id):
+    """Get a user's running totals (days logged, device minutes, mood counts, first/last date, logged days) as UserAggregates"""
+    return _held_table('aggregates', user_id)
+
+def get_user_calendar(user_id):
+    """Get the days a user logged as a DayBitmap (streaks, consecutive-day checks, days logged in a range)"""
+    return get_user_aggregates(user_id).calendar
+
+def _iso_day(value):
+    """Normalize a date, datetime or "YYYY-MM-DD" string to the stored date format."""
+    return pd.Timestamp(value).strftime(DATE_FORMAT)
+
+def get_range(user_id, start, end):
+    """Get a user's screen time in hours for the dates start..end (inclusive), ordered by date"""
+    start, end = _iso_day(start), _iso_day(end)
+    work = getattr(_rerun, 'work', None)
+    if work is not None and work.holds(('screen_time', int(user_id))):
+        # The rerun already holds the whole history; cut the window out of it
+        rows = _date_window(_screen_minutes(user_id), start, end)
+    else:
+        rows = _held(('screen_time', int(user_id), start, end),
+                     lambda: get_storage().get_screen_range(user_id, start, end))
+    return hours_frame(rows).reset_index(drop=True)
+
+def get_entry(user_id, date, with_notes=False):
+    """Get a user's screen time for one date as a dict in hours (with its note if asked), or None if nothing was logged"""
+    rows = get_range(user_id, date, date)
+    if rows.empty:
+        return None
+    entry = rows.iloc[-1].to_dict()
+    if with_notes:
+        notes = _notes(user_id)
+        match = notes.loc[notes['date'] == entry['date'], 'notes']
+        entry['notes'] = match.iloc[-1] if not match.empty else ""
+    return entry
+
+def get_user_notes(user_id):
+    """Get a user's check-in notes (user_id, date, notes), ordered by date"""
+    return _notes(user_id)
+
+def save_daily_entry(user_id, phone, laptop, tablet, mood, notes="", date=None):
+    """Save a day's screen time entry (today unless a past date is given), replacing any earlier check-in for that day"""
+    entry = {
+        'user_id': user_id,
+        'date': _iso_day(date) if date is not None else datetime.now().strftime("%Y-%m-%d"),
+        'phone_min': hours_to_minutes(phone),
+        'laptop_min': hours_to_minutes(laptop),
+        'tablet_min': hours_to_minutes(tablet),
+        'mood': mood,
+        'notes': notes
+    }
+    _write_through('screen_time', [entry], get_storage().save_screen_entries, {
+        'screen_time': lambda key, frame: _overlay_entry(key, frame, entry),
+        'notes': lambda key, frame: _overlay_note(frame, entry),
+        'history': lambda key, history: _history_of(_screen_minutes(user_id), user_id),
+        'aggregates': lambda key, totals: get_storage().get_aggregates(user_id),
+    })
+
+def get_user_achievements(user_id):
+    """Get all achievements earned by a specific user"""
+    return _held_table('achievements', user_id)
+
+def award_achievement(user_id, achievement_id, achievement_name):
+    """Award an achievement to a user"""
+    award_achievements(user_id, [(achievement_id, achievement_name)])
+
+def award_achievements(user_id, awards):
+    """Award several achievements to a user with a single write; awards are (achievement_id, achievement_name) pairs"""
+    if not awards:
+        return
+    earned_date = datetime.now().strftime("%Y-%m-%d")
+    achievements = [{
+        'user_id': user_id,
+        'achievement_id': achievement_id,
+        'earned_date': earned_date,
+        'achievement_name': achievement_name
+    } for achievement_id, achievement_name in awards]
+    _write_through('achievements', achievements, get_storage().add_achievements, {
+        'achievements': lambda key, frame: apply_schema(
+            pd.concat([frame, pd.DataFrame(achievements)], ignore_index=True), ACHIEVEMENT_SCHEMA),
+    })
@@ -0,0 +1,130 @@
+"""
+Summary figures of a user's daily history, computed in one pass.
+
+The dashboards, the weekly stats and the export report all show the same
+handful of numbers: days tracked, per-device totals and averages, the
+dominant mood, the last week's averages and the recent trends. summarize()
+derives every one of them from the history's calendar-window prefix sums
+(one cumulative sum over all fields, see trends.py) plus a single count of
+the mood labels, and returns them as a read-only SummaryMetrics.
+
+DailyHistory.summary() computes it once per history, and storage keeps one
+history per version of a user's stored rows, so a rerun over unchanged
+data reuses the same SummaryMetrics without touching the arrays.
+"""
+
+from types import MappingProxyType
+
+import numpy as np
+
+RECENT_DAYS = 3
+WEEK_DAYS = 7
+
+
+class SummaryMetrics:
+    """
+    Read-only summary of one user's history.
+
+    Attributes:
+        days (int): Days logged
+        first_date, last_date (datetime.date): First and latest check-in, None when empty
+        span (int): Calendar days from the first to the latest check-in
+        totals, means (mapping): Field -> hours over all logged days (means NaN when empty)
+        moods (tuple): (mood, days) pairs, most frequent first, ties alphabetical
+        week_days (int): Days logged in the 7 calendar days ending on the latest check-in
+        week_means (mapping): Field -> mean hours over those days
+        week_moods (tuple): (mood, days) pairs for those days, ordered like moods
+        week_trend (float): Week mean minus the mean of the 7 days before it
+        recent_avg (float): Mean total over the last 3 calendar days
+        recent_trend (float): recent_avg minus the mean of every earlier day
+        day_change (float): Latest day's total minus the day before it
+        first_week_avg (float): Mean total over the first 7 calendar days
+
+    Trends and window means are NaN when a window holds no check-in.
+    """
+
+    __slots__ = ('days', 'first_date', 'last_date', 'span', 'totals', 'means', 'moods', 'week_days',
+                 'week_means', 'week_moods', 'week_trend', 'recent_avg', 'recent_trend', 'day_change',
+                 'first_week_avg')
+
+    def __init__(self, **figures):
+        for name in self.__slots__:
+            value = figures[name]
+            if isinstance(value, dict):
+                value = MappingProxyType(value)
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("SummaryMetrics is read-only")
+
+    def __delattr__(self, name):
+        raise AttributeError("SummaryMetrics is read-only")
+
+    @property
+    def empty(self):
+        return self.days == 0
+
+    def dominant_mood(self, default=None):
+        """Most frequent mood over all days, or default when none was logged."""
+        return self.moods[0][0] if self.moods else default
+
+    def week_mood(self, default=None):
+        """Most frequent mood of the last calendar week, or default when none was logged."""
+        return self.week_moods[0][0] if self.week_moods else default
+
+    def __repr__(self):
+        return f"SummaryMetrics(days={self.days}, means={dict(self.means)}, moods={self.moods})"
+
+
+def _ranked(labels, counts):
+    """(label, count) pairs with a non-zero count, most frequent first, ties alphabetical."""
+    order = np.lexsort((labels, -counts))
+    return tuple((str(labels[i]), int(counts[i])) for i in order if counts[i])
+
+
+def _moods(mood, dates, week_start):
+    """Mood counts over all days and over the days from week_start on, from one labelling pass."""
+    logged = np.array([isinstance(value, str) and value != '' for value in mood], dtype=bool)
+    if not logged.any():
+        return (), ()
+    labels, codes = np.unique(mood[logged].astype(str), return_inverse=True)
+    counts = np.bincount(codes, minlength=len(labels))
+    in_week = dates[logged].astype('datetime64[D]') >= week_start
+    week_counts = np.bincount(codes[in_week], minlength=len(labels))
+    return _ranked(labels, counts), _ranked(labels, week_counts)
+
+
+def summarize(history):
+    """
+    Compute every summary figure of a history.
+
+    Args:
+        history (DailyHistory): The user's check-ins
+
+    Returns:
+        SummaryMetrics: The figures; NaN averages and no moods when empty
+    """
+    windows = history.rolling()
+    span = max(windows.span, 0)
+    days = windows.count(span)
+    totals = {field: windows.total(field, span) for field in windows.fields}
+    last_day = np.datetime64(windows.last_day, 'D')
+    moods, week_moods = _moods(history.mood, history.dates, last_day - (WEEK_DAYS - 1))
+    first_day = np.datetime64(windows.first_day, 'D')
+    return SummaryMetrics(
+        days=days,
+        first_date=first_day.astype(object) if days else None,
+        last_date=last_day.astype(object) if days else None,
+        span=span,
+        totals=totals,
+        means={field: total / days if days else float('nan') for field, total in totals.items()},
+        moods=moods,
+        week_days=windows.count(WEEK_DAYS),
+        week_means={field: windows.mean(field, WEEK_DAYS) for field in windows.fields},
+        week_moods=week_moods,
+        week_trend=windows.change('total_screen', WEEK_DAYS, span=WEEK_DAYS),
+        recent_avg=windows.mean('total_screen', RECENT_DAYS),
+        recent_trend=windows.change('total_screen', RECENT_DAYS),
+        day_change=windows.change('total_screen', 1, span=1),
+        first_week_avg=windows.mean('total_screen', WEEK_DAYS, first_day + (WEEK_DAYS - 1)),
+    )
@@ -0,0 +1,47 @@
+"""Tests for the per-user running aggregates."""
+
+import storage
+from aggregates import UserAggregates
+
+
+def row(day, phone=60, laptop=30, tablet=0, mood="😌 Peaceful"):
+    return {'date': day, 'phone_min': phone, 'laptop_min': laptop, 'tablet_min': tablet, 'mood': mood}
+
+
+def test_replace_takes_back_the_old_row():
+    totals = UserAggregates.from_rows(1, [row("2024-01-01"), row("2024-01-02", mood="😴 Tired")])
+    totals.replace(row("2024-01-02", mood="😴 Tired"), row("2024-01-02", phone=120, mood="🎯 Focused"))
+    assert totals.days == 2
+    assert totals.phone_min == 180
+    assert totals.moods == {"😌 Peaceful": 1, "🎯 Focused": 1}
+
+
+def test_replace_with_an_old_mood_missing_from_the_counts():
+    # Counts rebuilt without the old row (or written before the sidecar existed) lack its mood
+    totals = UserAggregates.from_rows(1, [row("2024-01-01", mood=None), row("2024-01-02")])
+    totals.replace(row("2024-01-01", mood="😰 Stressed"), row("2024-01-01", mood="🎯 Focused"))
+    assert totals.days == 2
+    assert totals.moods == {"😌 Peaceful": 1, "🎯 Focused": 1}
+    assert "2024-01-01" in totals.calendar
+
+
+def test_journaled_aggregates_survive_an_interrupted_fold(tmp_path):
+    backend = storage.CSVBackend(str(tmp_path))
+    backend.save_screen_entries([dict(row("2024-01-01"), user_id=1, notes=""),
+                                 dict(row("2024-01-01"), user_id=2, notes="")])
+    backend.save_screen_entry(dict(row("2024-01-02", mood="😴 Tired"), user_id=1, notes=""))
+    backend.save_screen_entry(dict(row("2024-01-02", phone=120), user_id=1, notes=""))
+    journal = tmp_path / ("daily_screen_time.csv" + storage.AGGREGATE_JOURNAL_SUFFIX)
+    folded = journal.read_bytes()
+    backend.compact()
+    # A process stopped after writing the new snapshot but before removing the journal
+    journal.write_bytes(folded)
+
+    reopened = storage.CSVBackend(str(tmp_path))
+    totals = reopened.get_aggregates(1)
+    assert totals.days == 2
+    assert totals.phone_min == 180
+    assert totals.moods == {"😌 Peaceful": 2}
+    reopened.save_screen_entry(dict(row("2024-01-03"), user_id=1, notes=""))
+    assert storage.CSVBackend(str(tmp_path)).get_aggregates(1).days == 3
+    assert reopened.check_aggregates() == []
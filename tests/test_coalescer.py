@@ -0,0 +1,51 @@
+"""Tests for group-committed writes."""
+
+import threading
+
+import pytest
+
+from coalescer import WriteCoalescer
+
+
+def test_a_bad_record_only_fails_its_own_caller():
+    written = []
+
+    def write(records):
+        if any(record == "bad" for record in records):
+            raise ValueError("bad record")
+        written.extend(records)
+
+    # A long interval puts all three callers in the first batch
+    coalescer = WriteCoalescer({'screen_time': write}, interval_ms=200, max_batch=4)
+    errors = {}
+
+    def save(records):
+        try:
+            coalescer.submit_many('screen_time', records)
+        except ValueError as e:
+            errors[records[0]] = e
+
+    threads = [threading.Thread(target=save, args=(records,)) for records in (["a1", "a2"], ["bad"], ["c"])]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    coalescer.close()
+
+    assert list(errors) == ["bad"]
+    assert sorted(written) == ["a1", "a2", "c"]
+    assert coalescer.stats()['batches'] == 1
+
+
+def test_a_failed_batch_from_one_caller_is_not_retried():
+    calls = []
+
+    def write(records):
+        calls.append(records)
+        raise ValueError("disk full")
+
+    coalescer = WriteCoalescer({'achievements': write})
+    with pytest.raises(ValueError):
+        coalescer.submit_many('achievements', ["x", "y"])
+    coalescer.close()
+    assert calls == [["x", "y"]]
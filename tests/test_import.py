@@ -0,0 +1,99 @@
+"""Tests for moving a CSV deployment to the SQLite backend."""
+
+import os
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+import storage
+from schema import export_frame
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def entry(user_id, day, phone=60, mood="😌 Peaceful", notes=""):
+    return {'user_id': user_id, 'date': day, 'phone_min': phone, 'laptop_min': 30, 'tablet_min': 0,
+            'mood': mood, 'notes': notes}
+
+
+def fill(backend, days, start=1):
+    # Stays below JOURNAL_COMPACT_THRESHOLD, so every write is still in a journal
+    for user_id in (1, 2, 3):
+        for day in range(start, start + days):
+            backend.save_screen_entry(entry(user_id, f"2024-01-{day:02d}", phone=user_id * day,
+                                            notes=f"note {user_id}-{day}"))
+    backend.save_screen_entry(entry(1, f"2024-01-{start:02d}", phone=5, mood="😴 Tired", notes="edited"))
+
+
+@pytest.mark.parametrize("layout", ["journal", "partitioned", "binary"])
+def test_import_reads_every_csv_layout(tmp_path, layout):
+    data_dir = str(tmp_path)
+    fill(storage.CSVBackend(data_dir), days=4)
+    if layout == "journal":
+        storage.CSVBackend(data_dir).compact()
+    elif layout == "partitioned":
+        storage.partition_screen_time(data_dir, partitions=4)
+    else:
+        storage.convert_screen_time(data_dir)
+    # Written after the layout change, so they only exist in that layout's journals
+    csv_backend = storage.CSVBackend(data_dir)
+    fill(csv_backend, days=3, start=5)
+
+    sqlite_backend = storage.SQLiteBackend(str(tmp_path / "detox.db"), data_dir=data_dir)
+    for user_id in (1, 2, 3):
+        expected = export_frame(csv_backend.get_screen_time(user_id)).reset_index(drop=True)
+        imported = export_frame(sqlite_backend.get_screen_time(user_id)).reset_index(drop=True)
+        assert len(imported) == 7
+        pd.testing.assert_frame_equal(imported, expected)
+        assert (list(sqlite_backend.get_notes(user_id)['notes'])
+                == list(csv_backend.get_notes(user_id)['notes']))
+        assert sqlite_backend.get_aggregates(user_id) == csv_backend.get_aggregates(user_id)
+    assert sqlite_backend.get_notes(1)['notes'].iloc[0] == "edited"
+
+
+def test_import_leaves_the_csv_files_untouched(tmp_path):
+    data_dir = tmp_path / "csv"
+    data_dir.mkdir()
+    # Written before the notes split and the switch to minutes
+    (data_dir / "daily_screen_time.csv").write_text(
+        "user_id,date,phone,laptop,tablet,mood,notes\n"
+        "1,2024-01-01,1.5,0.5,0,😌 Peaceful,first\n"
+        "1,2024-01-02,2.0,0,0.25,😴 Tired,\n"
+        "2,2024-01-01,0.5,1.0,0,😌 Peaceful,other\n", encoding="utf-8")
+    (data_dir / "daily_notes.csv").write_text(
+        "user_id,date,notes\n1,2024-01-02,kept\n", encoding="utf-8")
+    before = {path.name: path.read_bytes() for path in data_dir.iterdir()}
+
+    sqlite_backend = storage.SQLiteBackend(str(tmp_path / "detox.db"), data_dir=str(data_dir))
+
+    assert {path.name: path.read_bytes() for path in data_dir.iterdir()} == before
+    assert list(sqlite_backend.get_screen_time(1)['phone_min']) == [90, 120]
+    assert list(sqlite_backend.get_notes(1)['notes']) == ["first", "kept"]
+    assert list(sqlite_backend.get_notes(2)['notes']) == ["other"]
+
+
+def test_records_create_the_database_without_pandas(tmp_path):
+    data_dir = tmp_path / "csv"
+    data_dir.mkdir()
+    fill(storage.CSVBackend(str(data_dir)), days=2)
+    (data_dir / "users.csv").write_text("user_id,username,password_hash\n1,sam,x\n", encoding="utf-8")
+    (data_dir / "users.csv.seq").write_text(f"{4:020d}\n", encoding="ascii")
+    db_path = tmp_path / "detox.db"
+    # A fresh interpreter, as for a login page that never imports storage
+    script = ("import sys, records; "
+              f"store = records.create_records('sqlite', {str(data_dir)!r}); "
+              "assert store.find_user('sam')['user_id'] == 1; "
+              "assert 'pandas' not in sys.modules")
+    env = dict(os.environ, DETOX_DB_PATH=str(db_path), PYTHONPATH=REPO_ROOT)
+    subprocess.run([sys.executable, "-c", script], env=env, check=True)
+
+    sqlite_backend = storage.SQLiteBackend(str(db_path), data_dir=str(data_dir))
+    assert len(sqlite_backend.get_screen_time(2)) == 2
+    assert sqlite_backend.get_notes(2)['notes'].iloc[0] == "note 2-1"
+    assert sqlite_backend.get_aggregates(2).days == 2
+    assert sqlite_backend.add_user("alex", "y") == 5
+    # Opening it again doesn't import the rows twice
+    storage.SQLiteBackend(str(db_path), data_dir=str(data_dir))
+    assert len(sqlite_backend.get_screen_time(2)) == 2
@@ -0,0 +1,53 @@
+"""Tests for the page-facing profile functions."""
+
+import pytest
+
+import records
+import storage
+
+
+def test_profile_saved_through_records_is_seen_by_the_rerun(tmp_path, monkeypatch):
+    monkeypatch.setenv("DETOX_BATCH_MS", "0")
+    storage.set_storage(storage.CSVBackend(str(tmp_path)))
+    try:
+        storage.begin_rerun()
+        storage.prefetch_user_data(7, ('profiles',))
+        assert records.get_user_profile(7) is None
+        records.save_user_profile(7, "sam", "7-8 hours", "Balanced", "Focus", "Calm", "1-2 hours")
+        # The rerun's held copy was updated by the write, not just the file
+        assert records.get_user_profile(7)['main_goal'] == "Focus"
+        storage.begin_rerun()
+        assert records.get_user_profile(7)['username'] == "sam"
+    finally:
+        storage.set_storage(None)
+
+
+def test_records_only_page_starts_a_fresh_rerun(tmp_path, monkeypatch):
+    monkeypatch.setenv("DETOX_BATCH_MS", "0")
+    backend = storage.CSVBackend(str(tmp_path))
+    storage.set_storage(backend)
+    try:
+        # An earlier page on this thread held the profile before onboarding finished
+        storage.begin_rerun()
+        assert records.get_user_profile(7) is None
+        backend.save_profile(records.new_profile(7, "sam", "7-8 hours", "Balanced", "Focus", "Calm", "1-2 hours"))
+        # The next page only imports records
+        records.begin_rerun()
+        assert records.get_user_profile(7)['username'] == "sam"
+    finally:
+        storage.set_storage(None)
+
+
+@pytest.mark.parametrize("kind", ["csv", "sqlite"])
+def test_partial_profile_save_keeps_other_columns(tmp_path, kind):
+    if kind == "csv":
+        store = records.CSVRecords(str(tmp_path))
+    else:
+        store = records.SQLiteRecords(str(tmp_path / "detox.db"))
+        store.create(str(tmp_path))
+    store.save_profile(records.new_profile(7, "sam", "7-8 hours", "Balanced", "Focus", "Calm", "1-2 hours"))
+    store.save_profile({'user_id': 7, 'main_goal': "Sleep"})
+    profile = store.get_profile(7)
+    assert profile['main_goal'] == "Sleep"
+    assert profile['username'] == "sam"
+    assert profile['onboarding_complete'] is True
@@ -0,0 +1,22 @@
+"""Tests for date-window reads."""
+
+import pytest
+
+import storage
+
+
+@pytest.mark.parametrize("holds_history", [False, True])
+def test_range_is_indexed_from_zero(tmp_path, monkeypatch, holds_history):
+    monkeypatch.setenv("DETOX_BATCH_MS", "0")
+    storage.set_storage(storage.CSVBackend(str(tmp_path)))
+    try:
+        for day in ("2024-03-01", "2024-03-02", "2024-03-03"):
+            storage.save_daily_entry(5, 1.0, 0.5, 0, "😌 Peaceful", date=day)
+        storage.begin_rerun()
+        if holds_history:
+            storage.get_user_screen_data(5)
+        window = storage.get_range(5, "2024-03-02", "2024-03-03")
+        assert list(window.index) == [0, 1]
+        assert list(window['date'].dt.day) == [2, 3]
+    finally:
+        storage.set_storage(None)
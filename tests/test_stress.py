@@ -0,0 +1,13 @@
+"""Tests for concurrent writers from several processes."""
+
+import pytest
+
+import manage
+
+
+@pytest.mark.parametrize("backend, partitions", [("csv", 0), ("csv", 4), ("sqlite", 0)])
+def test_concurrent_writers_lose_no_checkins(tmp_path, monkeypatch, backend, partitions):
+    monkeypatch.delenv("DETOX_DB_PATH", raising=False)
+    problems = manage.run_stress(backend, str(tmp_path), processes=4, checkins=30, users=3,
+                                 partitions=partitions)
+    assert problems == []
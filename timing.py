@@ -0,0 +1,92 @@
+"""
+Per-page timing instrumentation.
+
+Each page script creates a PageTimer when it starts and marks the points
+that matter, e.g. "data" once the user's tables are in hand and "rendered"
+at the end of the script. Marks are measured from the start of the rerun,
+so "data" is the wait before the page can draw anything that depends on
+stored data. Every mark is also folded into process-wide counters that
+get_page_timings() reports, and with DETOX_SHOW_TIMINGS=1 the pages print
+the current rerun's marks in a caption.
+"""
+
+import os
+import threading
+import time
+
+
+def show_timings():
+    """Return True if pages should display their timings (DETOX_SHOW_TIMINGS=1)."""
+    return os.environ.get("DETOX_SHOW_TIMINGS", "0").lower() in ("1", "true", "yes")
+
+
+class PageTimings:
+    """Thread-safe running totals of page marks, keyed by (page, mark)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {}
+
+    def record(self, page, mark, seconds):
+        with self._lock:
+            count, total, longest, _ = self._totals.get((page, mark), (0, 0.0, 0.0, 0.0))
+            self._totals[(page, mark)] = (count + 1, total + seconds, max(longest, seconds), seconds)
+
+    def clear(self):
+        with self._lock:
+            self._totals.clear()
+
+    def stats(self):
+        """
+        Report the recorded marks.
+
+        Returns:
+            dict: page -> mark -> count, mean_ms, max_ms and last_ms
+        """
+        with self._lock:
+            report = {}
+            for (page, mark), (count, total, longest, last) in self._totals.items():
+                report.setdefault(page, {})[mark] = {
+                    'count': count,
+                    'mean_ms': total * 1000 / count,
+                    'max_ms': longest * 1000,
+                    'last_ms': last * 1000,
+                }
+            return report
+
+
+page_timings = PageTimings()
+
+
+class PageTimer:
+    """Marks taken during one rerun of one page."""
+
+    def __init__(self, page):
+        self.page = page
+        self.started = time.perf_counter()
+        self.marks = {}
+
+    def mark(self, name):
+        """
+        Record the time since the rerun started.
+
+        Args:
+            name (str): What has just finished, e.g. "data" or "rendered"
+
+        Returns:
+            float: Milliseconds since the rerun started
+        """
+        elapsed = time.perf_counter() - self.started
+        self.marks[name] = elapsed
+        page_timings.record(self.page, name, elapsed)
+        return elapsed * 1000
+
+    def summary(self):
+        """One-line description of this rerun's marks, e.g. for st.caption."""
+        marks = ", ".join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in self.marks.items())
+        return f"⏱️ {self.page}: {marks}"
+
+
+def get_page_timings():
+    """Mean/max/last milliseconds of every page mark in this server process."""
+    return page_timings.stats()
@@ -0,0 +1,149 @@
+"""
+Calendar-aware rolling windows over a user's daily history.
+
+Trend figures used to compare row counts (the last 3 or 7 check-ins), so
+a week with two missed days silently stretched to nine calendar days.
+RollingWindows lays a history out on a dense calendar grid, one slot per
+day from the first check-in to the last, with days that weren't logged
+left empty. One cumulative sum per field (and one over the logged-day
+flags) then answers any window in O(1):
+
+    sum(window) = S[end + 1] - S[end + 1 - days]
+    mean(window) = sum(window) / logged days in the window
+
+so a 7-day mean is the mean of the days actually logged in those seven
+calendar days, and a window with no check-ins has no mean (NaN). All
+fields are laid out and summed together, in one pass over the history.
+"""
+
+import numpy as np
+
+WINDOWS = (3, 7, 14, 30)
+
+
+def _day_number(day):
+    """Days since the epoch for a date, datetime, numpy datetime64 or "YYYY-MM-DD" string."""
+    return int(np.datetime64(day, 'D').astype(np.int64))
+
+
+class RollingWindows:
+    """
+    Cumulative sums of a history on a calendar grid.
+
+    Windows end on a given day (by default the last logged day) and cover
+    that day and the days before it. Days outside the grid hold no data,
+    so windows may reach past either end.
+    """
+
+    __slots__ = ('fields', 'first_day', 'last_day', '_sums', '_logged')
+
+    def __init__(self, dates, columns):
+        """
+        Args:
+            dates (numpy.ndarray): Strictly increasing datetime64 days of the rows
+            columns (dict): Field name -> float array of the same length
+        """
+        self.fields = {name: row for row, name in enumerate(columns)}
+        days = dates.astype('datetime64[D]').astype(np.int64)
+        self.first_day = int(days[0]) if len(days) else 0
+        self.last_day = int(days[-1]) if len(days) else -1
+        slots = np.asarray(days - self.first_day, dtype=np.int64) + 1
+        # Column 0 stays zero so every window is a difference of two prefix sums
+        grid = np.zeros((len(columns), self.last_day - self.first_day + 2))
+        logged = np.zeros(grid.shape[1])
+        if len(days):
+            grid[:, slots] = np.vstack([np.asarray(values, dtype=np.float64) for values in columns.values()])
+            logged[slots] = 1
+        self._sums = np.cumsum(grid, axis=1)
+        self._logged = np.cumsum(logged)
+
+    @property
+    def span(self):
+        """Calendar days from the first to the last logged day, inclusive."""
+        return self.last_day - self.first_day + 1
+
+    def _bounds(self, days, day):
+        """Prefix-sum positions (lo, hi) of the window of `days` days ending on `day`."""
+        end = self.last_day if day is None else _day_number(day)
+        limit = len(self._logged) - 1
+        hi = min(max(end - self.first_day + 1, 0), limit)
+        lo = min(max(end - self.first_day + 1 - days, 0), limit)
+        return lo, hi
+
+    def count(self, days, day=None):
+        """
+        Number of logged days in a calendar window.
+
+        Args:
+            days (int): Window length in calendar days
+            day: Last day of the window; defaults to the last logged day
+
+        Returns:
+            int: Days with a check-in
+        """
+        lo, hi = self._bounds(days, day)
+        return int(self._logged[hi] - self._logged[lo])
+
+    def total(self, field, days, day=None):
+        """Sum of a field over the logged days of a calendar window."""
+        lo, hi = self._bounds(days, day)
+        row = self._sums[self.fields[field]]
+        return float(row[hi] - row[lo])
+
+    def mean(self, field, days, day=None):
+        """
+        Mean of a field over the logged days of a calendar window.
+
+        Args:
+            field (str): e.g. total_screen or phone
+            days (int): Window length in calendar days, e.g. one of WINDOWS
+            day: Last day of the window; defaults to the last logged day
+
+        Returns:
+            float: The mean, or NaN if nothing was logged in the window
+        """
+        logged = self.count(days, day)
+        return self.total(field, days, day) / logged if logged else float('nan')
+
+    def mean_before(self, field, days, day=None, span=None):
+        """
+        Mean of a field over the calendar days just before a window.
+
+        Args:
+            field (str): e.g. total_screen
+            days (int): Length of the window being compared
+            day: Last day of that window; defaults to the last logged day
+            span (int): Days before the window to average; None for all of them
+
+        Returns:
+            float: The mean, or NaN if nothing was logged there
+        """
+        end = (self.last_day if day is None else _day_number(day)) - days
+        span = end - self.first_day + 1 if span is None else span
+        if span <= 0:
+            return float('nan')
+        return self.mean(field, span, np.datetime64(end, 'D'))
+
+    def change(self, field, days, day=None, span=None):
+        """Mean of a window minus the mean of the `span` days before it (see mean_before); NaN if either is empty."""
+        return self.mean(field, days, day) - self.mean_before(field, days, day, span)
+
+    def series(self, field, days):
+        """
+        Rolling means for every day of the grid, in one vectorized pass.
+
+        Args:
+            field (str): e.g. total_screen
+            days (int): Window length in calendar days
+
+        Returns:
+            tuple: (datetime64[D] array of days, float array of means, NaN where
+            the window holds no check-in)
+        """
+        hi = np.arange(1, len(self._logged))
+        lo = np.maximum(hi - days, 0)
+        row = self._sums[self.fields[field]]
+        logged = self._logged[hi] - self._logged[lo]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(logged > 0, (row[hi] - row[lo]) / logged, np.nan)
+        return np.arange(self.first_day, self.last_day + 1).astype('datetime64[D]'), means
@@ -10,9 +10,14 @@ This module contains helper functions for:
 
 import pandas as pd
 import matplotlib.pyplot as plt
+from matplotlib.colors import ListedColormap
 import os
 import random
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+
+from history import DailyHistory
+from records import get_user_profile
+from storage import get_user_screen_data, get_user_achievements
 
 # --- Data Management Functions ---
 
@@ -99,7 +104,7 @@ def create_screen_time_chart(user_data, chart_type='line'):
         ax.bar(x, user_data['laptop'], width, label='💻 Laptop', color=colors[1], alpha=0.8)
         ax.bar([i + width for i in x], user_data['tablet'], width, label='📟 Tablet', color=colors[2], alpha=0.8)
         ax.set_xticks(x)
-        ax.set_xticklabels(user_data['date'])
+        ax.set_xticklabels(user_data['date'].dt.strftime('%Y-%m-%d'))
     
     # Style the chart
     ax.set_xlabel('Date', fontsize=12)
@@ -144,6 +149,40 @@ def create_mood_chart(user_data):
     
     return fig
 
+def create_calendar_chart(calendar, year):
+    """
+    Create a year calendar of logged days, one square per day.
+    
+    Args:
+        calendar (daybits.DayBitmap): The user's logged days
+        year (int): Calendar year to show
+        
+    Returns:
+        matplotlib.figure.Figure: The generated chart
+    """
+    weeks = calendar.year_weeks(year)
+    # Weekdays as rows, weeks as columns; days outside the year stay blank
+    cells = [[float('nan') if week[day] is None else float(week[day]) for week in weeks] for day in range(7)]
+    
+    fig, ax = plt.subplots(figsize=(12, 2.4))
+    ax.imshow(cells, cmap=ListedColormap(['#E8F5E9', '#4CAF50']), vmin=0, vmax=1, aspect='equal')
+    
+    first_weekday = date(year, 1, 1).weekday()
+    month_starts = [(date(year, month, 1) - date(year, 1, 1)).days + first_weekday for month in range(1, 13)]
+    ax.set_xticks([start // 7 for start in month_starts])
+    ax.set_xticklabels([date(year, month, 1).strftime('%b') for month in range(1, 13)], fontsize=9)
+    ax.set_yticks([0, 2, 4, 6])
+    ax.set_yticklabels(['Mon', 'Wed', 'Fri', 'Sun'], fontsize=9)
+    ax.tick_params(length=0)
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+    
+    ax.set_title(f'{year} Check-ins', fontsize=14, fontweight='bold', color='#2C6E49')
+    fig.set_facecolor('#F9FFF9')
+    plt.tight_layout()
+    
+    return fig
+
 # --- Activity Suggestion Functions ---
 
 def get_activity_suggestions():
@@ -286,39 +325,44 @@ def validate_screen_time_input(phone, laptop, tablet):
     except (ValueError, TypeError):
         return False, "Please enter valid numbers for screen time"
 
+def as_history(user_data):
+    """
+    Accept either a DailyHistory or a screen time DataFrame.
+    
+    Args:
+        user_data (DailyHistory or pandas.DataFrame): User's screen time data
+        
+    Returns:
+        DailyHistory: The same data as arrays
+    """
+    return user_data if isinstance(user_data, DailyHistory) else DailyHistory.from_frame(user_data)
+
 def calculate_weekly_stats(user_data):
     """
     Calculate weekly statistics from user data.
     
     Args:
-        user_data (pandas.DataFrame): User's screen time data
+        user_data (DailyHistory or pandas.DataFrame): User's screen time data
         
     Returns:
         dict: Weekly statistics
     """
-    if user_data.empty:
+    summary = as_history(user_data).summary()
+    if summary.empty:
         return {}
     
-    recent_week = user_data.tail(7) if len(user_data) >= 7 else user_data
-    
-    stats = {
-        'avg_daily_total': recent_week['total_screen'].mean(),
-        'avg_phone': recent_week['phone'].mean(),
-        'avg_laptop': recent_week['laptop'].mean(),
-        'avg_tablet': recent_week['tablet'].mean(),
-        'days_tracked': len(recent_week),
-        'most_common_mood': recent_week['mood'].mode().iloc[0] if not recent_week['mood'].mode().empty else "Unknown"
+    # Calendar weeks ending on the latest check-in; missed days don't count
+    week = summary.week_means
+    return {
+        'avg_daily_total': week['total_screen'],
+        'avg_phone': week['phone'],
+        'avg_laptop': week['laptop'],
+        'avg_tablet': week['tablet'],
+        'days_tracked': summary.week_days,
+        'most_common_mood': summary.week_mood(default="Unknown"),
+        # Trend against the 7 days before, if any were logged
+        'trend': 0 if pd.isna(summary.week_trend) else summary.week_trend
     }
-    
-    # Calculate trend
-    if len(user_data) >= 14:
-        previous_week = user_data.iloc[-14:-7]['total_screen'].mean()
-        current_week = recent_week['total_screen'].mean()
-        stats['trend'] = current_week - previous_week
-    else:
-        stats['trend'] = 0
-    
-    return stats
 
 # --- Insight Generation Functions ---
 
@@ -327,7 +371,7 @@ def generate_insight_messages(user_data, profile):
     Generate personalized insight messages based on user data patterns.
     
     Args:
-        user_data (pandas.DataFrame): User's tracking data
+        user_data (DailyHistory or pandas.DataFrame): User's tracking data
         profile (dict): User's profile information
         
     Returns:
@@ -335,6 +379,7 @@ def generate_insight_messages(user_data, profile):
     """
     insights = []
     
+    user_data = as_history(user_data)
     if user_data.empty:
         return ["🌱 Welcome to your digital wellness journey! Start tracking to unlock personalized insights."]
     
@@ -378,10 +423,11 @@ def prepare_export_data(user_id):
     Returns:
         dict: Dictionary containing all user data
     """
+    profile = get_user_profile(user_id)
     export_data = {
-        'profile': load_user_data(user_id, 'user_profiles.csv'),
-        'screen_time': load_user_data(user_id, 'daily_screen_time.csv'),
-        'achievements': load_user_data(user_id, 'user_achievements.csv') if os.path.exists('user_achievements.csv') else pd.DataFrame()
+        'profile': pd.DataFrame([profile]) if profile else pd.DataFrame(),
+        'screen_time': get_user_screen_data(user_id),
+        'achievements': get_user_achievements(user_id)
     }
     
     return export_data